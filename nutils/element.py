@@ -39,7 +39,7 @@ class Reference(types.Singleton):
   'reference element'
 
   __slots__ = 'ndims',
-  __cache__ = 'connectivity', 'edgechildren', 'ribbons', 'volume', 'centroid', '_linear_bernstein', 'getpoints'
+  __cache__ = 'connectivity', 'edgechildren', 'ribbons', 'volume', 'centroid', '_linear_bernstein', 'getpoints', '_getpoints_compressed'
 
   @types.apply_annotations
   def __init__(self, ndims:int):
@@ -155,8 +155,22 @@ class Reference(types.Singleton):
     return points.coords, getattr(points, 'weights', None)
 
   def getpoints(self, ischeme, degree):
+    if ischeme == 'compressed':
+      return self.getpoints('gauss', degree)
     raise Exception('unsupported ischeme for {}: {!r}'.format(self.__class__.__name__, ischeme))
 
+  def _getpoints_compressed(self, degree):
+    # Gauss scheme compressed to the number of polynomials of `degree`, for
+    # references that are formed by many sub-elements. Compression requires
+    # non-negative weights, which are not guaranteed by all simplex schemes,
+    # in which case schemes of up to two degrees higher are tried before
+    # falling back on the uncompressed gauss scheme.
+    for gaussdegree in range(degree, degree+3):
+      gauss = self.getpoints('gauss', gaussdegree)
+      if numpy.greater_equal(gauss.weights, 0).all():
+        return points.compress(gauss, degree)
+    return self.getpoints('gauss', degree)
+
   def with_children(self, child_refs):
     child_refs = tuple(child_refs)
     if not any(child_refs):
@@ -964,6 +978,8 @@ class WithChildrenReference(Reference):
   def getpoints(self, ischeme, degree):
     if ischeme == 'vertex':
       return self.baseref.getpoints(ischeme, degree)
+    if ischeme == 'compressed':
+      return self._getpoints_compressed(degree)
     if ischeme == 'bezier':
       childpoints = [points.TransformPoints(ref.getpoints('bezier', degree//2+1), trans) for trans, ref in self.children if ref]
       return points.ConcatPoints(childpoints, points.find_duplicates(childpoints))
@@ -1120,6 +1136,8 @@ class MosaicReference(Reference):
   def getpoints(self, ischeme, degree):
     if ischeme == 'vertex':
       return self.baseref.getpoints(ischeme, degree)
+    if ischeme == 'compressed':
+      return self._getpoints_compressed(degree)
     subpoints = [subvol.getpoints(ischeme, degree) for subvol in self.subrefs]
     dups = points.find_duplicates(subpoints) if ischeme == 'bezier' else ()
     return points.ConcatPoints(subpoints, dups)
@@ -18,8 +18,8 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
-from . import util, warnings
-import contextlib, numpy, os, treelog as log
+from . import util, numeric, warnings
+import contextlib, numpy, os, sys, itertools, concurrent.futures, treelog as log
 
 @contextlib.contextmanager
 @util.positional_only
@@ -174,4 +174,342 @@ def vtk(name, cells, points, kwargs=...):
         vtk.write(vtkndim[array.ndim].format(dname, vtkdtype[array.dtype]).encode('ascii'))
         array.tofile(vtk)
 
+@util.positional_only
+def vtu(name, cells, points, *, piece=None, kwargs=...):
+  '''Export data to a VTK XML file.
+
+  This method writes an unstructured grid in the `VTK XML format`_, with all
+  array data appended in raw binary form in native byte order. In contrast to
+  :func:`vtk`, arrays are written without conversion, and besides simplices
+  the mesh can consist of tensor product cells.
+
+  The cell type follows from the shape of the ``cells`` array. A two
+  dimensional array defines simplices by mapping vertices into the list of
+  points, similar to :func:`vtk`. A three or four dimensional array defines
+  quadrilaterals or hexahedra by a structured grid of points per cell, for
+  instance the :attr:`~nutils.sample.Sample.grid` of a ``bezier`` sample.
+  Grids of two points per direction result in linear cells; larger grids are
+  written as higher order Lagrange cells.
+
+  Beyond the mandatory file name, cells, and vertex coordinates, any
+  additional data sets can be provided as keyword arguments, where the keys
+  are the names by which the arrays are stored. The data can be either vertex
+  or cell data, with the distinction made based on the length of the array.
+
+  Large data sets can be written in parallel by letting every process write
+  its own piece of the mesh. Of the resulting ``.vtu`` files, the first piece
+  is accompanied by a ``.pvtu`` file that combines all pieces.
+
+  .. _`VTK XML format`: https://www.vtk.org/VTK/img/file-formats.pdf
+
+  Args
+  ----
+  name : :class:`str`
+    Destination file name (without vtu extension).
+  cells : :class:`int` array
+    Triangulation or structured grid of points per cell.
+  points : :class:`float` array
+    Vertex coordinates.
+  piece : :class:`tuple` of two :class:`int`\\s, optional
+    Index of this piece and total number of pieces.
+  **kwargs :
+    Cell and/or point data
+  '''
+
+  cells = numpy.asarray(cells)
+  points = numpy.asarray(points)
+  if cells.ndim < 2 or points.ndim != 2:
+    raise Exception('invalid cells or points array')
+  npoints, ndims = points.shape
+  if ndims > 3:
+    raise Exception('invalid point dimension: {}'.format(ndims))
+  ncells = len(cells)
+
+  if cells.ndim == 2:
+    celltype = {1: 1, 2: 3, 3: 5, 4: 10}.get(cells.shape[1]) # VTK_VERTEX, VTK_LINE, VTK_TRIANGLE, VTK_TETRA
+    if celltype is None:
+      raise Exception('invalid number of simplex vertices: {}'.format(cells.shape[1]))
+  else:
+    order = cells.shape[1]-1
+    if order < 1 or any(n != order+1 for n in cells.shape[2:]) or cells.ndim > 4:
+      raise Exception('invalid cell grid: {}'.format(cells.shape[1:]))
+    if order == 1:
+      celltype = {3: 9, 4: 12}[cells.ndim] # VTK_QUAD, VTK_HEXAHEDRON
+    else:
+      celltype = {3: 70, 4: 72}[cells.ndim] # VTK_LAGRANGE_QUADRILATERAL, VTK_LAGRANGE_HEXAHEDRON
+    cells = cells.reshape(ncells, -1)[:,_vtkgridorder(cells.ndim-1, order)]
+  nverts = cells.shape[1]
+
+  if ndims < 3:
+    points = numpy.concatenate([points, numpy.zeros((npoints, 3-ndims), dtype=points.dtype)], axis=1)
+
+  pointdata = []
+  celldata = []
+  for dname, array in kwargs.items():
+    array = numpy.asarray(array)
+    if len(array) == npoints:
+      pointdata.append((dname, array))
+    elif len(array) == ncells:
+      celldata.append((dname, array))
+    else:
+      raise Exception('data length matches neither points nor cells: {}'.format(dname))
+
+  arrays = [('Points', points),
+            ('Cells', 'connectivity', cells.ravel()),
+            ('Cells', 'offsets', numpy.arange(nverts, (ncells+1)*nverts, nverts, dtype=cells.dtype)),
+            ('Cells', 'types', numpy.full(ncells, celltype, dtype=numpy.uint8))]
+  arrays.extend(('PointData', dname, array) for dname, array in pointdata)
+  arrays.extend(('CellData', dname, array) for dname, array in celldata)
+
+  sections = []
+  offset = 0
+  for section, group in itertools.groupby(arrays, key=lambda item: item[0]):
+    items = []
+    for item in group:
+      array = _vtuarray(item[-1])
+      attrs = 'type="{}"'.format(_vtudtype(array))
+      if len(item) == 3:
+        attrs += ' Name="{}"'.format(item[1])
+      if array.ndim > 1:
+        attrs += ' NumberOfComponents="{}"'.format(numpy.prod(array.shape[1:], dtype=int))
+      items.append((attrs, offset, array))
+      offset += 8 + array.nbytes
+    sections.append((section, items))
+
+  xmlheader = '<?xml version="1.0"?>\n<VTKFile type="{}" version="2.2" byte_order="{}" header_type="UInt64">\n'
+  byteorder = 'LittleEndian' if sys.byteorder == 'little' else 'BigEndian'
+
+  if piece is None:
+    name_vtu = name + '.vtu'
+  else:
+    ipiece, npieces = piece
+    if not 0 <= ipiece < npieces:
+      raise Exception('invalid piece {} of {}'.format(ipiece, npieces))
+    name_vtu = '{}_{}.vtu'.format(name, ipiece)
+    if ipiece == 0:
+      with log.userfile(name + '.pvtu', 'w') as pvtu:
+        pvtu.write(xmlheader.format('PUnstructuredGrid', byteorder))
+        pvtu.write('<PUnstructuredGrid GhostLevel="0">\n')
+        for section, items in sections:
+          if section != 'Cells':
+            pvtu.write('<P{}>\n'.format(section))
+            for attrs, offset, array in items:
+              pvtu.write('<PDataArray {}/>\n'.format(attrs))
+            pvtu.write('</P{}>\n'.format(section))
+        for i in range(npieces):
+          pvtu.write('<Piece Source="{}_{}.vtu"/>\n'.format(os.path.basename(name), i))
+        pvtu.write('</PUnstructuredGrid>\n</VTKFile>\n')
+
+  with log.userfile(name_vtu, 'wb') as vtu:
+    vtu.write(xmlheader.format('UnstructuredGrid', byteorder).encode('ascii'))
+    vtu.write('<UnstructuredGrid>\n<Piece NumberOfPoints="{}" NumberOfCells="{}">\n'.format(npoints, ncells).encode('ascii'))
+    for section, items in sections:
+      vtu.write('<{}>\n'.format(section).encode('ascii'))
+      for attrs, offset, array in items:
+        vtu.write('<DataArray {} format="appended" offset="{}"/>\n'.format(attrs, offset).encode('ascii'))
+      vtu.write('</{}>\n'.format(section).encode('ascii'))
+    vtu.write(b'</Piece>\n</UnstructuredGrid>\n<AppendedData encoding="raw">\n_')
+    for section, items in sections:
+      for attrs, offset, array in items:
+        numpy.array(array.nbytes, dtype=numpy.uint64).tofile(vtu)
+        array.tofile(vtu)
+    vtu.write(b'\n</AppendedData>\n</VTKFile>\n')
+
+@contextlib.contextmanager
+def xdmf(name, cells, points, *, pack=None):
+  '''Time series export, context manager.
+
+  Returns a writer for a series of data sets on a fixed mesh, in the form of
+  an `XDMF`_ file that describes the data and a single binary file that holds
+  it. The mesh is written once upon entry; every call to the writer's
+  ``write`` method appends the data sets of one time step, which are passed as
+  keyword arguments similar to :func:`vtk` and :func:`vtu`:
+
+  .. code-block:: python
+
+      with export.xdmf('flow', bezier.tri, bezier.eval(geom)) as series:
+        for t, u in timestepper:
+          series.write(t, u=bezier.eval(u))
+
+  The data is copied upon calling ``write`` and written to disk on a
+  background thread, such that the computation of the next time step overlaps
+  with the output of the current. At most one step is pending at any time.
+
+  In contrast to the other export functions, the files are not passed to the
+  logger but written to the file system directly, such that the series can be
+  inspected while the simulation is running.
+
+  .. _`XDMF`: https://www.xdmf.org/index.php/XDMF_Model_and_Format
+
+  Args
+  ----
+  name : :class:`str`
+    Destination path (without xdmf extension).
+  cells : :class:`int` array
+    Triangulation or structured grid of points per cell, see :func:`vtu`.
+    Grids of more than two points per direction are subdivided in linear
+    cells.
+  points : :class:`float` array
+    Vertex coordinates.
+  pack : :class:`dict`, optional
+    Keyword arguments ``atol``, ``rtol`` and ``dtype`` for
+    :func:`nutils.numeric.pack`, which if specified is used to compress all
+    floating point data. The packed integers are stored as is, alongside the
+    tolerances required by :func:`nutils.numeric.unpack`. Since packing
+    preserves order and sign, the integer data remains suitable for
+    thresholds and contours in viewers.
+  '''
+
+  with open(name + '.bin', 'wb') as fbin, open(name + '.xdmf', 'w') as fxml, \
+      concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+    series = _XdmfSeries(os.path.basename(name) + '.bin', fbin, fxml, executor, cells, points, pack)
+    yield series
+    series.flush()
+
+class _XdmfSeries:
+
+  topologytypes = {1: 'Polyvertex', 2: 'Polyline', 3: 'Triangle', 4: 'Tetrahedron'}, {2: 'Quadrilateral', 3: 'Hexahedron'}
+
+  def __init__(self, binname, fbin, fxml, executor, cells, points, pack):
+    cells = numpy.asarray(cells)
+    points = numpy.asarray(points)
+    if cells.ndim < 2 or points.ndim != 2 or points.shape[1] > 3:
+      raise Exception('invalid cells or points array')
+    if cells.ndim == 2:
+      topologytype = self.topologytypes[0].get(cells.shape[1])
+      if topologytype is None:
+        raise Exception('invalid number of simplex vertices: {}'.format(cells.shape[1]))
+    else:
+      ndims = cells.ndim-1
+      topologytype = self.topologytypes[1].get(ndims)
+      if topologytype is None or cells.shape[1] < 2 or any(n != cells.shape[1] for n in cells.shape[2:]):
+        raise Exception('invalid cell grid: {}'.format(cells.shape[1:]))
+      if cells.shape[1] > 2: # subdivide in linear cells
+        cells = numpy.stack([cells[(slice(None),)+offset] for offset in itertools.product((slice(0,-1), slice(1,None)), repeat=ndims)], axis=-1)
+      cells = cells.reshape(-1, 2**ndims)[:,_vtkgridorder(ndims, 1)]
+    if points.shape[1] == 1:
+      points = numpy.concatenate([points, numpy.zeros_like(points)], axis=1)
+    self.npoints = len(points)
+    self.ncells = len(cells)
+    self.binname = binname
+    self.fbin = fbin
+    self.fxml = fxml
+    self.executor = executor
+    self.pack = pack
+    self.offset = 0
+    self.steps = []
+    self.mesh = '<Topology TopologyType="{}" NumberOfElements="{}" NodesPerElement="{}">{}</Topology>\n<Geometry GeometryType="{}">{}</Geometry>\n'.format(
+      topologytype, self.ncells, cells.shape[1], self._append(cells), 'XY' if points.shape[1] == 2 else 'XYZ', self._append(points))
+    self._updatexml()
+    self.pending = None
+
+  @util.positional_only
+  def write(self, time, kwargs=...):
+    '''Append data sets for a single time step.'''
+
+    data = []
+    for dname, array in kwargs.items():
+      array = numpy.asarray(array)
+      if len(array) == self.npoints:
+        center = 'Node'
+      elif len(array) == self.ncells:
+        center = 'Cell'
+      else:
+        raise Exception('data length matches neither points nor cells: {}'.format(dname))
+      if self.pack is not None and array.dtype.kind == 'f':
+        array = numeric.pack(array, **self.pack)
+        packed = True
+      else:
+        array = numpy.array(array) # copy, as the array may be modified while written
+        packed = False
+      data.append((dname, center, array, packed))
+    self.flush()
+    self.pending = self.executor.submit(self._writestep, float(time), data)
+
+  def flush(self):
+    '''Wait for pending output to be written.'''
+
+    if self.pending is not None:
+      pending, self.pending = self.pending, None
+      pending.result()
+
+  def _writestep(self, time, data):
+    attributes = []
+    for dname, center, array, packed in data:
+      if array.ndim == 1:
+        attributetype = 'Scalar'
+      elif array.ndim == 2:
+        attributetype = 'Vector'
+      elif array.shape[1:] == (3,3) and numpy.equal(array, array.swapaxes(1,2)).all():
+        attributetype = 'Tensor6'
+        array = array[:,[0,0,0,1,1,2],[0,1,2,1,2,2]] # upper triangle in row major order
+      else:
+        attributetype = 'Tensor' if array.shape[1:] == (3,3) else 'Matrix'
+        array = array.reshape(len(array), -1)
+      dataitem = self._append(array)
+      if packed: # record the tolerances required by numeric.unpack
+        dataitem += '<Information Name="atol" Value="{!r}"/><Information Name="rtol" Value="{!r}"/>'.format(self.pack['atol'], self.pack['rtol'])
+      attributes.append('<Attribute Name="{}" Center="{}" AttributeType="{}">{}</Attribute>\n'.format(dname, center, attributetype, dataitem))
+    self.steps.append((time, ''.join(attributes)))
+    self.fbin.flush()
+    self._updatexml()
+
+  def _append(self, array):
+    array = _vtuarray(array)
+    numbertype = {'i': 'Int', 'u': 'UInt', 'f': 'Float'}[array.dtype.kind]
+    if numbertype != 'Float' and array.dtype.itemsize < 4:
+      numbertype = numbertype[:-3] + {1: 'Char', 2: 'Short'}[array.dtype.itemsize]
+    dataitem = '<DataItem Format="Binary" NumberType="{}" Precision="{}" Endian="{}" Seek="{}" Dimensions="{}">{}</DataItem>'.format(
+      numbertype, array.dtype.itemsize, 'Little' if sys.byteorder == 'little' else 'Big', self.offset, ' '.join(map(str, array.shape)), self.binname)
+    array.tofile(self.fbin)
+    self.offset += array.nbytes
+    return dataitem
+
+  def _updatexml(self):
+    self.fxml.seek(0)
+    self.fxml.truncate()
+    self.fxml.write('<?xml version="1.0"?>\n<Xdmf Version="2.0">\n<Domain>\n<Grid Name="series" GridType="Collection" CollectionType="Temporal">\n')
+    for time, attributes in self.steps:
+      self.fxml.write('<Grid Name="mesh" GridType="Uniform">\n<Time Value="{!r}"/>\n{}{}</Grid>\n'.format(time, self.mesh, attributes))
+    self.fxml.write('</Grid>\n</Domain>\n</Xdmf>\n')
+    self.fxml.flush()
+
+def _vtuarray(array):
+  # return a native, contiguous array of supported dtype, avoiding copies where possible
+  if array.dtype == bool:
+    array = array.view(numpy.uint8)
+  if array.dtype.kind not in 'iuf' or array.dtype.itemsize not in (1, 2, 4, 8):
+    raise Exception('invalid data type: {}'.format(array.dtype))
+  return numpy.ascontiguousarray(array, dtype=array.dtype.newbyteorder('='))
+
+def _vtudtype(array):
+  return {'i': 'Int', 'u': 'UInt', 'f': 'Float'}[array.dtype.kind] + str(8*array.dtype.itemsize)
+
+def _vtkgridorder(ndims, order):
+  # Return the indices into a raveled structured grid of (order+1)**ndims
+  # points, in the point order of VTK's linear and Lagrange cells: vertices,
+  # edges, faces and interior, with every edge and face traversed in
+  # increasing directions.
+
+  n = order + 1
+  inner = range(1, order)
+  if ndims == 2:
+    corners = (0,0), (order,0), (order,order), (0,order)
+    ijk = list(corners)
+    ijk += [(i,0) for i in inner] + [(order,j) for j in inner] + [(i,order) for i in inner] + [(0,j) for j in inner]
+    ijk += [(i,j) for j in inner for i in inner]
+  elif ndims == 3:
+    corners = (0,0), (order,0), (order,order), (0,order)
+    ijk = [(i,j,k) for k in (0,order) for i, j in corners]
+    for k in 0, order:
+      ijk += [(i,0,k) for i in inner] + [(order,j,k) for j in inner] + [(i,order,k) for i in inner] + [(0,j,k) for j in inner]
+    ijk += [(i,j,k) for i, j in corners for k in inner]
+    ijk += [(i,j,k) for i in (0,order) for k in inner for j in inner]
+    ijk += [(i,j,k) for j in (0,order) for k in inner for i in inner]
+    ijk += [(i,j,k) for k in (0,order) for j in inner for i in inner]
+    ijk += [(i,j,k) for k in inner for j in inner for i in inner]
+  else:
+    raise Exception('invalid grid dimension: {}'.format(ndims))
+  return numpy.ravel_multi_index(numpy.array(ijk).T, (n,)*ndims)
+
 # vim:sw=2:sts=2:et
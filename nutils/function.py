@@ -2942,7 +2942,7 @@ class Basis(Array):
   '''
 
   __slots__ = 'ndofs', 'nelems', 'index', 'coords'
-  __cache__ = '_computed_support'
+  __cache__ = '_elemdofs', '_computed_support'
 
   @types.apply_annotations
   def __init__(self, ndofs:types.strictint, nelems:types.strictint, index:asarray, coords:asarray):
@@ -2960,13 +2960,43 @@ class Basis(Array):
     numpy.add.at(inflated, (slice(None), self.get_dofs(index)), values)
     return inflated
 
+  @property
+  def _elemdofs(self):
+    '''Element to dof incidence in compressed row format.
+
+    A pair of arrays ``offsets`` and ``dofs`` such that
+    ``dofs[offsets[ielem]:offsets[ielem+1]]`` equals ``get_dofs(ielem)``.
+    Subclasses should redefine this property if the incidence can be formed
+    without an element loop.'''
+
+    dofs = [self.get_dofs(ielem) for ielem in range(self.nelems)]
+    offsets = numpy.cumsum([0, *map(len, dofs)])
+    return types.frozenarray(offsets, copy=False), types.frozenarray(numpy.concatenate(dofs) if dofs else numpy.zeros(0, dtype=int), dtype=int, copy=False)
+
+  def _get_elemdofs(self, ielems):
+    '''Element to dof incidence of selected elements in compressed row format.
+
+    A pair of arrays ``offsets`` and ``dofs`` such that
+    ``dofs[offsets[i]:offsets[i+1]]`` equals ``get_dofs(ielems[i])``.
+    Subclasses should redefine this method if the incidence of a few elements
+    can be formed without forming :attr:`_elemdofs` for all elements.'''
+
+    offsets, dofs = self._elemdofs
+    starts = numpy.take(offsets, ielems)
+    stops = numpy.take(offsets, numpy.add(ielems, 1))
+    return numpy.concatenate([[0], numpy.cumsum(stops - starts)]), numpy.take(dofs, numeric.ranges(starts, stops))
+
   @property
   def _computed_support(self):
-    support = [set() for i in range(self.ndofs)]
-    for ielem in range(self.nelems):
-      for dof in self.get_dofs(ielem):
-        support[dof].add(ielem)
-    return tuple(types.frozenarray(numpy.fromiter(sorted(ielems), dtype=int), copy=False) for ielems in support)
+    '''Dof to element incidence in compressed row format.
+
+    The transpose of :attr:`_elemdofs`, with the elements per dof unique and
+    sorted.'''
+
+    offsets, dofs = self._elemdofs
+    ielems = numpy.repeat(numpy.arange(self.nelems), numpy.diff(offsets))
+    dofs, ielems = divmod(numpy.unique(dofs * self.nelems + ielems), self.nelems)
+    return types.frozenarray(numpy.searchsorted(dofs, numpy.arange(self.ndofs+1)), copy=False), types.frozenarray(ielems, copy=False)
 
   def get_support(self, dof):
     '''Return the support of basis function ``dof``.
@@ -2988,7 +3018,9 @@ class Basis(Array):
     '''
 
     if numeric.isint(dof):
-      return self._computed_support[dof]
+      offsets, ielems = self._computed_support
+      dof = numeric.normdim(self.ndofs, dof)
+      return ielems[offsets[dof]:offsets[dof+1]]
     elif numeric.isintarray(dof):
       if dof.ndim != 1:
         raise IndexError('dof has invalid number of dimensions')
@@ -2997,10 +3029,8 @@ class Basis(Array):
       dof = numpy.unique(dof)
       if dof[0] < 0 or dof[-1] >= self.ndofs:
         raise IndexError('dof out of bounds')
-      if self.get_support == __class__.get_support.__get__(self, __class__):
-        return numpy.unique([ielem for ielem in range(self.nelems) if numpy.in1d(self.get_dofs(ielem), dof, assume_unique=True).any()])
-      else:
-        return numpy.unique(numpy.fromiter(itertools.chain.from_iterable(map(self.get_support, dof)), dtype=int))
+      offsets, ielems = self._computed_support
+      return numpy.unique(numpy.take(ielems, numeric.ranges(numpy.take(offsets, dof), numpy.take(offsets, dof+1))))
     elif numeric.isboolarray(dof):
       if dof.shape != (self.ndofs,):
         raise IndexError('dof has invalid shape')
@@ -3038,7 +3068,8 @@ class Basis(Array):
       ielem = numpy.unique(ielem)
       if ielem[0] < 0 or ielem[-1] >= self.nelems:
         raise IndexError('ielem out of bounds')
-      return numpy.unique(numpy.fromiter(itertools.chain.from_iterable(map(self.get_dofs, ielem)), dtype=int))
+      offsets, dofs = self._get_elemdofs(ielem)
+      return numpy.unique(dofs)
     elif numeric.isboolarray(ielem):
       if ielem.shape != (self.nelems,):
         raise IndexError('ielem has invalid shape')
@@ -3088,6 +3119,70 @@ class Basis(Array):
   def _derivative(self, var, seen):
     return self._asinflate._derivative(var, seen)
 
+  def reordered(self, order=None):
+    '''Renumber the basis functions.
+
+    Renumbering the basis functions changes the sparsity pattern of assembled
+    matrices, but not the functions spanned by the basis. If no ``order`` is
+    specified, the reverse Cuthill-McKee ordering is used, which reduces the
+    bandwidth of the matrices and thereby the fill-in of direct solvers, and
+    which improves memory locality during assembly.
+
+    Parameters
+    ----------
+    order : array of :class:`int`\\s, optional
+        Permutation of ``range(ndofs)`` such that function ``i`` of the
+        renumbered basis is function ``order[i]`` of this basis.
+
+    Returns
+    -------
+    :class:`ReorderedBasis`
+    '''
+
+    return ReorderedBasis(self, self._reverse_cuthill_mckee() if order is None else order)
+
+  def _reverse_cuthill_mckee(self):
+    '''Reverse Cuthill-McKee ordering of the basis functions.
+
+    Two basis functions are adjacent if they share an element in their
+    support. The breadth-first search is performed level by level, with the
+    neighbours of a level ordered by the position of their first visited
+    neighbour and then by their degree, which yields the same ordering as the
+    traditional one node at a time formulation. Every connected component is
+    started from a pseudo-peripheral function, found by one additional
+    breadth-first search from a function of minimum degree.'''
+
+    eoffsets, edofs = self._elemdofs
+    soffsets, selems = self._computed_support
+    sizes = numpy.diff(soffsets)
+    # Estimate the degree of a function by the total number of functions of
+    # the elements in its support, rather than forming the adjacency graph.
+    degree = numpy.bincount(numpy.repeat(numpy.arange(self.ndofs), sizes), weights=numpy.diff(eoffsets)[selems], minlength=self.ndofs)
+
+    def levels(start, visited):
+      frontier = numpy.array([start])
+      visited[start] = True
+      while len(frontier):
+        yield frontier
+        ielems = selems[numeric.ranges(soffsets[frontier], soffsets[frontier+1])]
+        parents = numpy.repeat(numpy.repeat(numpy.arange(len(frontier)), sizes[frontier]), numpy.diff(eoffsets)[ielems])
+        dofs = edofs[numeric.ranges(eoffsets[ielems], eoffsets[ielems+1])]
+        new = ~visited[dofs]
+        dofs, first = numpy.unique(dofs[new], return_index=True) # returns the first occurrence, which has the lowest parent
+        parents = parents[new][first]
+        frontier = dofs[numpy.lexsort([dofs, degree[dofs], parents])]
+        visited[frontier] = True
+
+    order = []
+    visited = numpy.zeros(self.ndofs, dtype=bool)
+    while not visited.all():
+      unvisited, = (~visited).nonzero()
+      start = unvisited[numpy.argmin(degree[unvisited])]
+      *_, last = levels(start, visited.copy())
+      start = last[numpy.argmin(degree[last])]
+      order.extend(levels(start, visited))
+    return types.frozenarray(numpy.concatenate(order)[::-1] if order else numpy.zeros(0, dtype=int), copy=False)
+
   def __getitem__(self, index):
     if numeric.isintarray(index) and index.ndim == 1 and numpy.all(numpy.greater(numpy.diff(index), 0)):
       return MaskedBasis(self, index)
@@ -3153,6 +3248,11 @@ class PlainBasis(Basis):
   def get_coefficients(self, ielem):
     return self._coeffs[ielem]
 
+  @property
+  def _elemdofs(self):
+    offsets = numpy.cumsum([0, *map(len, self._dofs)])
+    return types.frozenarray(offsets, copy=False), types.frozenarray(numpy.concatenate(self._dofs) if self._dofs else numpy.zeros(0, dtype=int), dtype=int, copy=False)
+
   def f_ndofs(self, index):
     ndofs = numpy.fromiter(map(len, self._dofs), dtype=int, count=len(self._dofs))
     return get(types.frozenarray(ndofs, copy=False), 0, index)
@@ -3201,6 +3301,10 @@ class DiscontBasis(Basis):
   def get_ndofs(self, ielem):
     return self._offsets[ielem+1] - self._offsets[ielem]
 
+  @property
+  def _elemdofs(self):
+    return self._offsets, types.frozenarray(numpy.arange(self.ndofs), copy=False)
+
   def get_coefficients(self, ielem):
     return self._coeffs[ielem]
 
@@ -3255,6 +3359,72 @@ class MaskedBasis(Basis):
       raise IndexError('dof out of bounds')
     return self._parent.get_support(self._indices[dof])
 
+  @property
+  def _elemdofs(self):
+    offsets, dofs = self._parent._elemdofs
+    mask = numeric.sorted_contains(self._indices, dofs)
+    offsets = numpy.concatenate([[0], numpy.cumsum(mask)])[offsets]
+    return types.frozenarray(offsets, copy=False), numeric.sorted_index(self._indices, dofs[mask])
+
+class ReorderedBasis(Basis):
+  '''A renumbering of another :class:`Basis`.
+
+  Parameters
+  ----------
+  parent : :class:`Basis`
+      The basis to renumber.
+  order : array of :class:`int`\\s
+      Permutation of ``range(len(parent))`` such that function ``i`` of this
+      basis is function ``order[i]`` of ``parent``.
+  '''
+
+  __slots__ = '_parent', '_order', '_inverse'
+
+  @types.apply_annotations
+  def __init__(self, parent:strictbasis, order:types.frozenarray[types.strictint]):
+    if order.shape != (parent.ndofs,):
+      raise ValueError('`order` should have shape ({},) but got {}'.format(parent.ndofs, order.shape))
+    inverse = numpy.full(parent.ndofs, -1)
+    inverse[order] = numpy.arange(parent.ndofs)
+    if numpy.less(inverse, 0).any():
+      raise ValueError('`order` is not a permutation')
+    self._parent = parent
+    self._order = order
+    self._inverse = types.frozenarray(inverse, copy=False)
+    super().__init__(parent.ndofs, parent.nelems, parent.index, parent.coords)
+
+  def get_dofs(self, ielem):
+    if not numeric.isint(ielem):
+      return super().get_dofs(ielem)
+    return types.frozenarray(numpy.take(self._inverse, self._parent.get_dofs(ielem)), copy=False)
+
+  def get_coeffshape(self, ielem):
+    return self._parent.get_coeffshape(ielem)
+
+  def get_coefficients(self, ielem):
+    return self._parent.get_coefficients(ielem)
+
+  def f_ndofs(self, index):
+    return self._parent.f_ndofs(index)
+
+  def f_dofs(self, index):
+    return take(self._inverse, self._parent.f_dofs(index), axis=0)
+
+  def f_coefficients(self, index):
+    return self._parent.f_coefficients(index)
+
+  def get_support(self, dof):
+    if numeric.isboolarray(dof):
+      return super().get_support(dof)
+    if numeric.isintarray(dof) and dof.ndim == 1 and numpy.any(numpy.less(dof, 0)):
+      raise IndexError('dof out of bounds')
+    return self._parent.get_support(self._order[dof])
+
+  @property
+  def _elemdofs(self):
+    offsets, dofs = self._parent._elemdofs
+    return offsets, types.frozenarray(numpy.take(self._inverse, dofs), copy=False)
+
 class StructuredBasis(Basis):
   '''A basis for class:`nutils.transformseq.StructuredTransforms`.
 
@@ -3308,6 +3478,25 @@ class StructuredBasis(Basis):
       dofs = numpy.add.outer(dofs*ndofs_i, dofs_i)
     return types.frozenarray(dofs.ravel(), dtype=types.strictint, copy=False)
 
+  @property
+  def _elemdofs(self):
+    offsets, dofs = self._get_elemdofs(numpy.arange(self.nelems))
+    return types.frozenarray(offsets, copy=False), types.frozenarray(dofs, copy=False)
+
+  def _get_elemdofs(self, ielems):
+    # The dofs of an element are the outer product of the dofs per dimension,
+    # which is formed one dimension at a time in compressed row format.
+    indices = numpy.unravel_index(ielems, self._transforms_shape)
+    counts = numpy.ones(len(ielems), dtype=int)
+    dofs = numpy.zeros(len(ielems), dtype=int)
+    for start_dofs_i, stop_dofs_i, ndofs_i, index_i in zip(self._start_dofs, self._stop_dofs, self._dofs_shape, indices):
+      starts_i = numpy.take(start_dofs_i, index_i)
+      counts_i = numpy.take(stop_dofs_i, index_i) - starts_i
+      n = numpy.repeat(counts_i, counts) # number of new dofs per existing dof
+      dofs = numpy.repeat(dofs * ndofs_i, n) + (numpy.repeat(numpy.repeat(starts_i, counts), n) + numeric.ranges(numpy.zeros_like(n), n)) % ndofs_i
+      counts = counts * counts_i
+    return numpy.concatenate([[0], numpy.cumsum(counts)]), dofs
+
   def get_ndofs(self, ielem):
     indices = self._get_indices(ielem)
     ndofs = 1
@@ -3316,7 +3505,28 @@ class StructuredBasis(Basis):
     return ndofs
 
   def get_coefficients(self, ielem):
-    return functools.reduce(numeric.poly_outer_product, map(operator.getitem, self._coeffs, self._get_indices(ielem)))
+    return functools.reduce(numeric.poly_outer_product, self.get_tensor_coefficients(ielem))
+
+  def get_tensor_coefficients(self, ielem):
+    '''Return the coefficients per dimension of the basis functions with support on element ``ielem``.
+
+    The outer product of the returned arrays, as formed by
+    :func:`nutils.numeric.poly_outer_product`, equals the array returned by
+    :meth:`get_coefficients`.
+
+    Parameters
+    ----------
+    ielem : :class:`int`
+        Element number.
+
+    Returns
+    -------
+    coefficients : :class:`tuple` of :class:`nutils.types.frozenarray` objects
+        Per dimension an array of coefficients with shape
+        ``(nlocaldofs_i, degree_i+1)``.
+    '''
+
+    return tuple(map(operator.getitem, self._coeffs, self._get_indices(ielem)))
 
   def f_coefficients(self, index):
     coeffs = []
@@ -3336,6 +3546,8 @@ class StructuredBasis(Basis):
     return Constant(ndofs)
 
   def get_support(self, dof):
+    if numeric.isintarray(dof) and dof.ndim == 1 and len(dof) and numpy.greater_equal(dof, 0).all() and numpy.less(dof, self.ndofs).all():
+      return self._get_support_union(numpy.unique(dof))
     if not numeric.isint(dof):
       return super().get_support(dof)
     dof = numeric.normdim(self.ndofs, dof)
@@ -3356,6 +3568,32 @@ class StructuredBasis(Basis):
     assert dof == 0
     return types.frozenarray(functools.reduce(numpy.add.outer, reversed(supports)).ravel(), copy=False, dtype=types.strictint)
 
+  def _get_support_union(self, dofs):
+    # The support of a dof is the outer product of the supports per dimension,
+    # which is formed one dimension at a time for all dofs simultaneously as
+    # pairs of a position in ``dofs`` and a (partial) element index.
+    ipos = numpy.arange(len(dofs))
+    ielems = numpy.zeros(len(dofs), dtype=int)
+    for start_dofs_i, stop_dofs_i, ndofs_i, ntrans_i, dofs_i in zip(self._start_dofs, self._stop_dofs, self._dofs_shape, self._transforms_shape, numpy.unravel_index(dofs, self._dofs_shape)):
+      ipos_i = []
+      ielems_i = []
+      while True: # periodic dofs have support on elements with stop dofs beyond ndofs_i
+        mask = numpy.less(dofs_i, stop_dofs_i[-1])
+        if not mask.any():
+          break
+        start_ielems = numpy.searchsorted(stop_dofs_i, dofs_i[mask], side='right')
+        stop_ielems = numpy.searchsorted(start_dofs_i, dofs_i[mask], side='right')
+        ipos_i.append(numpy.repeat(numpy.where(mask)[0], stop_ielems - start_ielems))
+        ielems_i.append(numeric.ranges(start_ielems, stop_ielems))
+        dofs_i = dofs_i + ndofs_i
+      ipos_i = numpy.concatenate(ipos_i)
+      ielems_i = numpy.concatenate(ielems_i)[numpy.argsort(ipos_i, kind='stable')]
+      offsets_i = numpy.concatenate([[0], numpy.cumsum(numpy.bincount(ipos_i, minlength=len(dofs)))])
+      n = numpy.diff(offsets_i)[ipos]
+      ielems = numpy.repeat(ielems * ntrans_i, n) + ielems_i[numeric.ranges(offsets_i[ipos], offsets_i[ipos] + n)]
+      ipos = numpy.repeat(ipos, n)
+    return numpy.unique(ielems)
+
 class PrunedBasis(Basis):
   '''A subset of another :class:`Basis`.
 
@@ -3393,6 +3631,14 @@ class PrunedBasis(Basis):
       raise IndexError('dof out of bounds')
     return numeric.sorted_index(self._transmap, self._parent.get_support(self._dofmap[dof]), missing='mask')
 
+  @property
+  def _elemdofs(self):
+    offsets, dofs = self._parent._elemdofs
+    starts = numpy.take(offsets, self._transmap)
+    stops = numpy.take(offsets, self._transmap+1)
+    offsets = numpy.concatenate([[0], numpy.cumsum(stops - starts)])
+    return types.frozenarray(offsets, copy=False), types.frozenarray(numpy.searchsorted(self._dofmap, numpy.take(dofs, numeric.ranges(starts, stops))), copy=False)
+
   def f_ndofs(self, index):
     return self._parent.f_ndofs(get(self._transmap, 0, index))
 
@@ -22,13 +22,14 @@
 The mesh module provides mesh generators: methods that return a topology and an
 accompanying geometry function. Meshes can either be generated on the fly, e.g.
 :func:`rectilinear`, or read from external an externally prepared file,
-:func:`gmsh`, and converted to nutils format. Note that no mesh writers are
-provided at this point.
+:func:`gmsh`, and converted to nutils format. Any topology and geometry can
+furthermore be stored in a binary checkpoint file using :func:`save`, to be
+restored by :func:`load` in a subsequent run.
 """
 
 from . import topology, function, util, element, numeric, transform, transformseq, warnings, types, cache
 from .elementseq import References
-import numpy, os, itertools, re, math, treelog as log, io, contextlib
+import numpy, os, itertools, re, math, treelog as log, io, contextlib, pickle
 _ = numpy.newaxis
 
 # MESH GENERATORS
@@ -444,16 +445,13 @@ def parsegmsh(mshdata):
   nnodes = vnodes[:,-1].max()+1
 
   vtags, btags, ptags = {}, {}, {}
-  edge_vertices = numpy.arange(ndims+1).repeat(ndims).reshape(ndims, ndims+1)[:,::-1].T # nedges x ndims
   for nd, name, ielems in tags:
     if nd == ndims:
       vtags[name] = numpy.array(ielems)
     elif nd == ndims-1:
-      edgenodes = bnodes[ielems]
-      nodemask = numeric.asboolean(edgenodes.ravel(), size=nnodes, ordered=False)
-      ielems, = (nodemask[vnodes].sum(axis=1) >= ndims).nonzero() # all elements sharing at least ndims edgenodes
-      edgemap = {tuple(b): (ielem, iedge) for ielem, a in zip(ielems, vnodes[ielems[:,_,_], edge_vertices[_,:,:]]) for iedge, b in enumerate(a)}
-      btags[name] = numpy.array([edgemap[tuple(sorted(n))] for n in edgenodes])
+      btags[name] = _match_edges(vnodes, bnodes[ielems], nnodes)
+      if numpy.less(btags[name], 0).any():
+        raise ValueError('boundary group {!r} contains edges that are not part of the volume mesh'.format(name))
     elif nd == 0:
       ptags[name] = pnodes[ielems][...,0]
 
@@ -463,6 +461,30 @@ def parsegmsh(mshdata):
 
   return dict(nodes=vnodes, cnodes=cnodes, coords=coords, tags=vtags, btags=btags, ptags=ptags)
 
+def _match_edges(vnodes, edgenodes, nnodes):
+  # Return the [element, edge] numbers of the edges with nodes `edgenodes` in
+  # the simplices with sorted nodes `vnodes`, or -1 for edges that are not
+  # found. Edges that are listed more than once, as happens for repeated tags
+  # in gmsh files, are returned only once, at their first occurrence.
+  ndims = vnodes.shape[1] - 1
+  edgenodes = numpy.sort(edgenodes, axis=1)
+  edgenodes = edgenodes[numpy.sort(numpy.unique(edgenodes, axis=0, return_index=True)[1])]
+  nodemask = numeric.asboolean(edgenodes.ravel(), size=nnodes, ordered=False)
+  ielems, = (nodemask[vnodes].sum(axis=1) >= ndims).nonzero() # all elements sharing at least ndims edgenodes
+  edge_vertices = numpy.arange(ndims+1).repeat(ndims).reshape(ndims, ndims+1)[:,::-1].T # nedges x ndims
+  elemedges = vnodes[ielems[:,_,_], edge_vertices[_,:,:]].reshape(-1, ndims) # sorted nodes of all candidate edges
+  # match edges by lexicographically sorting candidate and tagged node
+  # tuples together; for edges shared by two candidates the last wins
+  allnodes = numpy.concatenate([elemedges, edgenodes], axis=0)
+  order = numpy.lexsort(allnodes.T[::-1])
+  sortednodes = allnodes[order]
+  inverse = numpy.empty(len(order), dtype=int)
+  inverse[order] = numpy.concatenate([[False], numpy.not_equal(sortednodes[1:], sortednodes[:-1]).any(axis=1)]).cumsum()
+  iedges = numpy.full(len(order), -1)
+  numpy.maximum.at(iedges, inverse[:len(elemedges)], numpy.arange(len(elemedges)))
+  iedges = iedges[inverse[len(elemedges):]]
+  return numpy.where(numpy.less(iedges, 0)[:,_], -1, numpy.stack([ielems[iedges // (ndims+1)], iedges % (ndims+1)], axis=1))
+
 @log.withcontext
 @types.apply_annotations
 def gmsh(fname:util.binaryfile, name='gmsh'):
@@ -549,34 +571,54 @@ def simplex(nodes, cnodes, coords, tags, btags, ptags, name='simplex'):
   basis = function.PlainBasis([coeffs] * nelems, cnodes, nverts, topo.f_index, topo.f_coords)
   geom = (basis[:,_] * coords).sum(0)
 
-  connectivity = topo.connectivity
+  connectivity = numpy.asarray(topo.connectivity)
+  edgetransforms = topo.transforms.edges(topo.references)
+  ptrans = tuple(transform.Matrix(linear=numpy.zeros(shape=(ndims,0)), offset=offset) for offset in numpy.eye(ndims+1)[:,1:])
+
+  def edgetopo(ielems, iedges, ioppelems=None, ioppedges=None):
+    keep = numpy.not_equal(numpy.arange(ndims+1), iedges[:,_])
+    simplices = nodes[ielems][keep].reshape(len(ielems), ndims)
+    transforms = edgetransforms[ielems*(ndims+1)+iedges]
+    opposites = transforms if ioppelems is None else edgetransforms[ioppelems*(ndims+1)+ioppedges]
+    return topology.SimplexTopology(simplices, transforms, opposites)
+
+  def pointtopo(ielems, ivertices):
+    ptransforms = transformseq.PlainTransforms([topo.transforms[ielem] + (ptrans[ivertex],) for ielem, ivertex in zip(ielems.tolist(), ivertices.tolist())], 0)
+    preferences = References.uniform(element.getsimplex(0), len(ptransforms))
+    return topology.Topology(preferences, ptransforms, ptransforms)
+
+  # Convert the btags to arrays of element, edge and opposing element, edge
+  # numbers, where the opposing numbers are -1 for edges on the boundary.
+  edges = {}
+  for name, elems_edges in btags.items():
+    ielems, iedges = numpy.asarray(elems_edges, dtype=int).reshape(-1, 2).T
+    ioppelems = connectivity[ielems, iedges]
+    ioppedges = numpy.equal(connectivity[ioppelems], ielems[:,_]).argmax(axis=1)
+    ioppedges[ioppelems == -1] = -1
+    edges[name] = ielems, iedges, ioppelems, ioppedges
 
   bgroups = {}
   igroups = {}
-  for name, elems_edges in btags.items():
-    bitems = [], [], None
-    iitems = [], [], []
-    for ielem, iedge in elems_edges:
-      ioppelem = connectivity[ielem, iedge]
-      simplices, transforms, opposites = bitems if ioppelem == -1 else iitems
-      simplices.append(tuple(nodes[ielem][:iedge])+tuple(nodes[ielem][iedge+1:]))
-      transforms.append(topo.transforms[ielem] + (transform.SimplexEdge(ndims, iedge),))
-      if opposites is not None:
-        opposites.append(topo.transforms[ioppelem] + (transform.SimplexEdge(ndims, tuple(connectivity[ioppelem]).index(ielem)),))
-    for groups, (simplices, transforms, opposites) in (bgroups, bitems), (igroups, iitems):
-      if simplices:
-        transforms = transformseq.PlainTransforms(transforms, ndims-1)
-        opposites = transforms if opposites is None else transformseq.PlainTransforms(opposites, ndims-1)
-        groups[name] = topology.SimplexTopology(simplices, transforms, opposites)
+  for name, (ielems, iedges, ioppelems, ioppedges) in edges.items():
+    isbnd = ioppelems == -1
+    if isbnd.any():
+      bgroups[name] = edgetopo(ielems[isbnd], iedges[isbnd])
+    if not isbnd.all():
+      isiface = ~isbnd
+      igroups[name] = edgetopo(ielems[isiface], iedges[isiface], ioppelems[isiface], ioppedges[isiface])
 
   pgroups = {}
+  pelems = {}
   if ptags:
-    ptrans = [transform.Matrix(linear=numpy.zeros(shape=(ndims,0)), offset=offset) for offset in numpy.eye(ndims+1)[:,1:]]
-    pmap = {inode: numpy.array(numpy.equal(nodes, inode).nonzero()).T for inode in set.union(*map(set, ptags.values()))}
+    # Sorting the flat nodes array stably groups all occurrences of a node by
+    # element, such that the (element, vertex) pairs of any list of nodes are
+    # obtained by concatenating ranges of the sorted order.
+    nodeorder = numpy.argsort(nodes.ravel(), kind='stable')
+    sortednodes = nodes.ravel()[nodeorder]
     for pname, inodes in ptags.items():
-      ptransforms = transformseq.PlainTransforms([topo.transforms[ielem] + (ptrans[ivertex],) for inode in inodes for ielem, ivertex in pmap[inode]], 0)
-      preferences = References.uniform(element.getsimplex(0), len(ptransforms))
-      pgroups[pname] = topology.Topology(preferences, ptransforms, ptransforms)
+      inodes = numpy.asarray(inodes, dtype=int)
+      pelems[pname] = numpy.divmod(nodeorder[numeric.ranges(numpy.searchsorted(sortednodes, inodes, side='left'), numpy.searchsorted(sortednodes, inodes, side='right'))], ndims+1)
+      pgroups[pname] = pointtopo(*pelems[pname])
 
   vgroups = {}
   for name, ielems in tags.items():
@@ -585,42 +627,31 @@ def simplex(nodes, cnodes, coords, tags, btags, ptags, name='simplex'):
       continue
     transforms = topo.transforms[ielems]
     vtopo = topology.SimplexTopology(nodes[ielems], transforms, transforms)
-    keep = numpy.zeros(nelems, dtype=bool)
+    keep = numpy.zeros(nelems+1, dtype=bool) # the extra trailing entry is indexed by ioppelems == -1
     keep[ielems] = True
     vbgroups = {}
     vigroups = {}
-    for bname, elems_edges in btags.items():
-      bitems = [], [], []
-      iitems = [], [], []
-      for ielem, iedge in elems_edges:
-        ioppelem = connectivity[ielem, iedge]
-        if ioppelem == -1:
-          keepopp = False
-        else:
-          keepopp = keep[ioppelem]
-          ioppedge = tuple(connectivity[ioppelem]).index(ielem)
-        if keepopp and keep[ielem]:
-          simplices, transforms, opposites = iitems
-        elif keepopp or keep[ielem]:
-          simplices, transforms, opposites = bitems
-          if keepopp:
-            ielem, iedge, ioppelem, ioppedge = ioppelem, ioppedge, ielem, iedge
+    for bname, (bielems, biedges, bioppelems, bioppedges) in edges.items():
+      keepelem = keep[bielems]
+      keepopp = keep[bioppelems]
+      isiface = keepelem & keepopp
+      if isiface.any():
+        vigroups[bname] = edgetopo(bielems[isiface], biedges[isiface], bioppelems[isiface], bioppedges[isiface])
+      isbnd = keepelem ^ keepopp
+      if isbnd.any():
+        # orient the edges such that the kept element comes first
+        swap = keepopp[isbnd]
+        bielems, biedges, bioppelems, bioppedges = bielems[isbnd], biedges[isbnd], bioppelems[isbnd], bioppedges[isbnd]
+        bielems, bioppelems = numpy.where(swap, bioppelems, bielems), numpy.where(swap, bielems, bioppelems)
+        biedges, bioppedges = numpy.where(swap, bioppedges, biedges), numpy.where(swap, biedges, bioppedges)
+        if numpy.equal(bioppelems, -1).any():
+          vbgroups[bname] = edgetopo(bielems, biedges)
         else:
-          continue
-        simplices.append(tuple(nodes[ielem][:iedge])+tuple(nodes[ielem][iedge+1:]))
-        transforms.append(topo.transforms[ielem] + (transform.SimplexEdge(ndims, iedge),))
-        if ioppelem != -1:
-          opposites.append(topo.transforms[ioppelem] + (transform.SimplexEdge(ndims, ioppedge),))
-      for groups, (simplices, transforms, opposites) in (vbgroups, bitems), (vigroups, iitems):
-        if simplices:
-          transforms = transformseq.PlainTransforms(transforms, ndims-1)
-          opposites = transformseq.PlainTransforms(opposites, ndims-1) if len(opposites) == len(transforms) else transforms
-          groups[bname] = topology.SimplexTopology(simplices, transforms, opposites)
+          vbgroups[bname] = edgetopo(bielems, biedges, bioppelems, bioppedges)
     vpgroups = {}
-    for pname, inodes in ptags.items():
-      ptransforms = transformseq.PlainTransforms([topo.transforms[ielem] + (ptrans[ivertex],) for inode in inodes for ielem, ivertex in pmap[inode] if keep[ielem]], 0)
-      preferences = References.uniform(element.getsimplex(0), len(ptransforms))
-      vpgroups[pname] = topology.Topology(preferences, ptransforms, ptransforms)
+    for pname, (pielems, pivertices) in pelems.items():
+      pkeep = keep[pielems]
+      vpgroups[pname] = pointtopo(pielems[pkeep], pivertices[pkeep])
     vgroups[name] = vtopo.withgroups(bgroups=vbgroups, igroups=vigroups, pgroups=vpgroups)
 
   return topo.withgroups(vgroups=vgroups, bgroups=bgroups, igroups=igroups, pgroups=pgroups), geom
@@ -698,4 +729,144 @@ def unitsquare(nelems, etype):
 
   return topo, function.rootcoords(2) / nelems
 
+# CHECKPOINTS
+
+_checkpoint_magic = b'NUTILSMESH\0'
+_checkpoint_version = 1
+_checkpoint_align = 64
+
+class _CheckpointPickler(pickle.Pickler):
+  # Pickler that stores the data of numerical arrays out-of-band, such that it
+  # can be memory mapped by _CheckpointUnpickler. Arrays that are referenced
+  # more than once are stored only once.
+
+  def __init__(self, file, minsize):
+    self._minsize = minsize
+    self._pids = {}
+    self.arrays = []
+    self.nbytes = 0
+    super().__init__(file, protocol=4)
+
+  def persistent_id(self, obj):
+    if type(obj) is types.frozenarray:
+      kind = 'frozenarray'
+    elif type(obj) is numpy.ndarray:
+      kind = 'ndarray'
+    elif type(obj) is tuple and len(obj) > 1 and all(type(item) is types.frozenarray for item in obj):
+      # tuples of distinct, equally shaped arrays, such as the per-element
+      # dofs of a PlainBasis, are stored as a single stacked array
+      kind = 'tuple'
+    else:
+      return None
+    try:
+      return self._pids[id(obj)][0]
+    except KeyError:
+      pass
+    if kind == 'tuple':
+      if len(set((item.dtype, item.shape) for item in obj)) != 1 or len(set(map(id, obj))) != len(obj):
+        return None
+      array = numpy.stack(obj)
+    else:
+      array = numpy.asarray(obj)
+    if array.dtype.hasobject or array.nbytes < self._minsize:
+      return None
+    pid = kind, array.dtype.str, array.shape, self.nbytes
+    self._pids[id(obj)] = pid, obj # keep obj alive to guarantee a unique id
+    self.arrays.append(array)
+    self.nbytes += -(-array.nbytes // _checkpoint_align) * _checkpoint_align
+    return pid
+
+class _CheckpointUnpickler(pickle.Unpickler):
+
+  def __init__(self, file, data):
+    self._data = data
+    super().__init__(file)
+
+  def persistent_load(self, pid):
+    kind, dtype, shape, offset = pid
+    dtype = numpy.dtype(dtype)
+    array = self._data[offset:offset+dtype.itemsize*util.product(shape, 1)].view(dtype).reshape(shape)
+    if kind == 'frozenarray':
+      return types.frozenarray(array, copy=False)
+    if kind == 'tuple':
+      return tuple(types.frozenarray(item, copy=False) for item in array)
+    return array.copy() # plain arrays are writeable, unlike the memory map
+
+@types.apply_annotations
+def save(fname:str, topo:topology.stricttopology, geom:function.asarray, *, minsize:types.strictint=1024):
+  '''Save topology and geometry to a binary checkpoint file.
+
+  The topology and geometry are stored in a single file, which can be read
+  back using :func:`load`. The object structure is serialized using
+  :mod:`pickle`, while the data of all numerical arrays of at least
+  ``minsize`` bytes, such as connectivity tables, element index arrays and
+  geometry coefficients, is written in binary form to an aligned section at
+  the end of the file. Upon loading this section is memory mapped, such that
+  large meshes are available in a fraction of the time it takes to rebuild
+  them.
+
+  Args
+  ----
+  fname : :class:`str`
+      Path of the checkpoint file.
+  topo : :class:`nutils.topology.Topology`
+      Topology to be saved.
+  geom : :class:`nutils.function.Array`
+      Geometry function, or any other function defined on ``topo``.
+  minsize : :class:`int`
+      Minimum size in bytes for an array to be stored out-of-band.
+  '''
+
+  with io.BytesIO() as buf:
+    pickler = _CheckpointPickler(buf, minsize)
+    pickler.dump((topo, geom))
+    header = buf.getvalue()
+  with open(fname, 'wb') as f:
+    f.write(_checkpoint_magic)
+    f.write(_checkpoint_version.to_bytes(4, 'little'))
+    f.write(len(header).to_bytes(8, 'little'))
+    f.write(header)
+    f.write(bytes(-f.tell() % _checkpoint_align))
+    for array in pickler.arrays:
+      f.write(numpy.ascontiguousarray(array).tobytes())
+      f.write(bytes(-array.nbytes % _checkpoint_align))
+  log.info('saved {} with {} binary arrays totalling {} bytes'.format(fname, len(pickler.arrays), pickler.nbytes))
+
+@types.apply_annotations
+def load(fname:str):
+  '''Load topology and geometry from a binary checkpoint file.
+
+  Read a file that was written by :func:`save`. The array data is memory
+  mapped and therefore read from disk only when it is accessed. Since the
+  object structure is restored by :mod:`pickle`, checkpoint files should only
+  be loaded from trusted sources.
+
+  Args
+  ----
+  fname : :class:`str`
+      Path of the checkpoint file.
+
+  Returns
+  -------
+  topo : :class:`nutils.topology.Topology`
+      Saved topology.
+  geom : :class:`nutils.function.Array`
+      Saved geometry.
+  '''
+
+  with open(fname, 'rb') as f:
+    if f.read(len(_checkpoint_magic)) != _checkpoint_magic:
+      raise ValueError('{} is not a nutils checkpoint file'.format(fname))
+    version = int.from_bytes(f.read(4), 'little')
+    if version != _checkpoint_version:
+      raise ValueError('unsupported checkpoint version {} in {}'.format(version, fname))
+    header = f.read(int.from_bytes(f.read(8), 'little'))
+    offset = f.tell() + (-f.tell() % _checkpoint_align)
+    f.seek(0, io.SEEK_END)
+    size = f.tell()
+  data = numpy.memmap(fname, dtype=numpy.uint8, mode='r', offset=offset).view(numpy.ndarray) if size > offset else numpy.zeros(0, dtype=numpy.uint8)
+  with io.BytesIO(header) as buf:
+    topo, geom = _CheckpointUnpickler(buf, data).load()
+  return topo, geom
+
 # vim:sw=2:sts=2:et
@@ -450,6 +450,22 @@ def accumulate(data, index, shape):
   numpy.add.at(retval, tuple(index), data)
   return retval
 
+def ranges(starts, stops):
+  '''concatenate integer ranges.
+
+  Returns the concatenation of ``arange(start, stop)`` for all pairs of
+  ``starts`` and ``stops``, equivalent with:
+
+  >>> def ranges(starts, stops):
+  ...   return numpy.concatenate([numpy.arange(start, stop) for start, stop in zip(starts, stops)])
+  '''
+
+  starts = numpy.asarray(starts, dtype=int)
+  counts = numpy.maximum(numpy.asarray(stops, dtype=int) - starts, 0)
+  assert starts.ndim == counts.ndim == 1
+  offsets = numpy.cumsum(counts)
+  return numpy.arange(offsets[-1] if len(offsets) else 0) + numpy.repeat(starts - offsets + counts, counts)
+
 def _sorted_index_mask(sorted_array, values):
   values = numpy.asarray(values)
   assert sorted_array.ndim == 1 and values.ndim == 1
@@ -98,7 +98,7 @@ def shempty(shape, dtype=float):
   else:
     assert all(numeric.isint(sh) for sh in shape)
   dtype = numpy.dtype(dtype)
-  size = util.product(map(int, shape), int(dtype.itemsize))
+  size = util.product(builtins.map(int, shape), int(dtype.itemsize))
   if size == 0 or _maxprocs.value == 1:
     return numpy.empty(shape, dtype)
   # `mmap(-1,...)` will allocate *anonymous* memory.  Although linux' man page
@@ -139,6 +139,41 @@ def ctxrange(name, nitems):
   with fork(nitems), treelog.iter.wrap(_pct(name, nitems), rng) as wrprng:
     yield wrprng
 
+def map(func, items, name='mapping'):
+  '''parallel equivalent of ``list(map(func, items))``
+
+  The items are distributed over forked processes by means of a shared
+  counter. Return values computed in secondary processes are sent to the main
+  process via pipes, which requires them to be picklable.
+  '''
+
+  items = tuple(items)
+  nprocs = min(_maxprocs.value, len(items)) if hasattr(os, 'fork') else 1
+  rng = range(len(items)) # shared range, must be created pre-fork
+  pipes = [multiprocessing.Pipe(duplex=False) for iproc in builtins.range(1, nprocs)] # idem
+  results = [None] * len(items)
+  with fork(nprocs) as procid, treelog.iter.wrap(_pct(name, len(items)), rng) as indices:
+    # Close all connections but our own send end, such that a failure in any
+    # process is detected by the main process rather than leaving it waiting
+    # for send ends that are held open by other (blocking) children.
+    for iproc, (recvconn, sendconn) in enumerate(pipes, start=1):
+      if procid:
+        recvconn.close()
+      if iproc != procid:
+        sendconn.close()
+    computed = [(index, func(items[index])) for index in indices]
+    if procid:
+      pipes[procid-1][1].send(computed)
+    else:
+      for recvconn, sendconn in pipes:
+        try:
+          computed.extend(recvconn.recv())
+        except EOFError: # failure in child process, raised by fork
+          pass
+      for index, result in computed:
+        results[index] = result
+  return results
+
 def _pct(name, n):
   '''helper function for ctxrange'''
 
@@ -27,7 +27,7 @@ and :class:`SimplexGaussPoints` that reflect the variety of elements in the
 '''
 
 from . import types, transform, numeric, util
-import numpy, functools, itertools, warnings, math
+import numpy, functools, itertools, math
 _ = numpy.newaxis
 
 class Points(types.Singleton):
@@ -96,6 +96,20 @@ class Points(types.Singleton):
       return types.frozenarray([[0]])
     raise Exception('tri not defined for {}'.format(self))
 
+  @property
+  def grid(self):
+    '''Structured grid of points.
+
+    An integer array with ``ndims`` axes that maps a regular grid into the list
+    of points, such that ``grid[i,j]`` is the index of the point with the
+    ``i``-th coordinate in the first and the ``j``-th coordinate in the second
+    direction. Only defined for tensor products of one dimensional points.
+    '''
+
+    if self.ndims == 0 and self.npoints == 1:
+      return types.frozenarray(0)
+    raise Exception('grid not defined for {}'.format(self))
+
   @property
   def hull(self):
     '''Triangulation of the exterior hull.
@@ -152,7 +166,7 @@ class CoordsUniformPoints(CoordsPoints):
 class TensorPoints(Points):
   '''Tensor product of two Points instances.'''
 
-  __cache__ = 'coords', 'weights', 'tri', 'hull'
+  __cache__ = 'coords', 'weights', 'tri', 'hull', 'grid'
 
   @types.apply_annotations
   def __init__(self, points1:strictpoints, points2:strictpoints):
@@ -197,6 +211,11 @@ class TensorPoints(Points):
       return types.frozenarray(hull, copy=False)
     return super().hull
 
+  @property
+  def grid(self):
+    grid1 = self.points1.grid[(...,)+(_,)*self.points2.ndims]
+    return types.frozenarray(grid1 * self.points2.npoints + self.points2.grid, copy=False)
+
   def product(self, other):
     return self.points1.product(self.points2.product(other))
 
@@ -250,6 +269,12 @@ class SimplexBezierPoints(CoordsUniformPoints):
       return super().tri
     return types.frozenarray(tri, copy=False)
 
+  @property
+  def grid(self):
+    if self.ndims == 1:
+      return types.frozenarray(numpy.arange(self.n), copy=False)
+    return super().grid
+
 class TransformPoints(Points):
   '''Affinely transformed Points.'''
 
@@ -273,6 +298,10 @@ class TransformPoints(Points):
   def tri(self):
     return self.points.tri
 
+  @property
+  def grid(self):
+    return self.points.grid
+
   @property
   def hull(self):
     return self.points.hull
@@ -368,6 +397,33 @@ def gauss(n):
   x, w = numpy.linalg.eigh(numpy.diagflat(d,-1)) # eigh operates (by default) on lower triangle
   return types.frozenarray((x+1) * .5, copy=False), types.frozenarray(w[0]**2, copy=False)
 
+@functools.lru_cache(8)
+def gaussjacobi(n, alpha):
+  # like gauss, for weight function (1-x)**alpha
+  k = numpy.arange(n) + 1
+  a = 2*k + alpha
+  d = k * (k+alpha) / (a * numpy.sqrt(a**2/4-.25))
+  a = 2*numpy.arange(n+1) + alpha
+  c = -alpha**2 / (a * (a+2)) if alpha else numpy.zeros(n+1)
+  x, w = numpy.linalg.eigh(numpy.diagflat(c) + numpy.diagflat(d,-1)) # eigh operates (by default) on lower triangle
+  return types.frozenarray((x+1) * .5, copy=False), types.frozenarray(w[0]**2 / (alpha+1), copy=False)
+
+def conical(ndims, degree):
+  '''Conical product quadrature for simplex.
+
+  Collapses the simplex onto a hypercube and combines Gauss-Jacobi rules of
+  ``degree//2+1`` points per direction. The rule is exact for any degree and
+  has positive weights, but requires more points than the symmetric rules of
+  :func:`gauss2` and :func:`gauss3`.'''
+
+  coords = numpy.zeros((1,0))
+  weights = numpy.ones(1)
+  for idim in range(ndims):
+    x, w = gaussjacobi(degree//2, idim)
+    coords = numpy.concatenate([numpy.repeat(x[:,_,_], len(coords), axis=1), (1-x)[:,_,_] * coords], axis=2).reshape(-1, idim+1)
+    weights = (w[:,_] * weights).ravel()
+  return types.frozenarray(coords, copy=False), types.frozenarray(weights, copy=False)
+
 def gauss1(degree):
   '''Gauss quadrature for line.'''
 
@@ -378,7 +434,10 @@ def gauss1(degree):
 def gauss2(degree):
   '''Gauss quadrature for triangle.
 
-  Reference: http://www.cs.rpi.edu/~flaherje/pdf/fea6.pdf'''
+  Rules up to degree 7 are taken from
+  http://www.cs.rpi.edu/~flaherje/pdf/fea6.pdf. Rules of degree 8 to 20 are
+  fully symmetric with positive weights and interior points, computed by node
+  elimination; higher degrees fall back on :func:`conical`.'''
 
   assert isinstance(degree, int) and degree >= 0
 
@@ -409,10 +468,160 @@ def gauss2(degree):
     (J, [0.479308067841924,0.260345966079038], 0.175615257433204),
     (J, [0.869739794195568,0.065130102902216], 0.053347235608839),
     (K, [0.638444188569809,0.312865496004875,0.048690315425316], 0.077113760890257),
-  ]
-
-  if degree > 6:
-    warnings.warn('inexact integration for polynomial of degree {}'.format(degree))
+  ] if degree == 7 else [
+    (I, [1/3], 0.14431560767778687),
+    (J, [0.08141482341455375,0.4592925882927231], 0.0950916342672846),
+    (J, [0.6588613844964796,0.1705693077517602], 0.10321737053471816),
+    (J, [0.8989055433659381,0.05054722831703097], 0.032458497623198065),
+    (K, [0.008394777409957706,0.26311282963463795,0.7284923929554044], 0.027230314174435104),
+  ] if degree == 8 else [
+    (I, [1/3], 0.09713579628279906),
+    (J, [0.020634961602524537,0.48968251919873773], 0.03133470022713889),
+    (J, [0.1258208170141264,0.4370895914929368], 0.07782754100477426),
+    (J, [0.6235929287619345,0.18820353561903275], 0.07964773892721037),
+    (J, [0.9105409732110945,0.04472951339445273], 0.02557767565869799),
+    (K, [0.03683841205473626,0.22196298916076573,0.741198598784498], 0.043283539377289376),
+  ] if degree == 9 else [
+    (I, [1/3], 0.08321973698644991),
+    (J, [0.6741737642518129,0.16291311787409357], 0.05265194946824409),
+    (J, [0.9429929994232241,0.028503500288387926], 0.01095128834026848),
+    (K, [0.029307604504579424,0.36336261699457095,0.6073297785008496], 0.0353949477915383),
+    (K, [0.03368569868061,0.1533030551695616,0.8130112461498283], 0.029322864095652042),
+    (K, [0.1468115053939305,0.33669587527823047,0.516492619327839], 0.056277279710811826),
+  ] if degree == 10 else [
+    (I, [1/3], 0.08619794012590398),
+    (J, [0.008728334441059249,0.4956358327794704], 0.01704139832252653),
+    (J, [0.12284424947778161,0.4385778752611092], 0.06772242255649093),
+    (J, [0.5806183713678759,0.2096908143160621], 0.07082454975197545),
+    (J, [0.7976269521553454,0.10118652392232733], 0.038499614238640234),
+    (J, [0.9437980941827143,0.028100952908642854], 0.010156372168504334),
+    (K, [0.006184050107805102,0.14792079372587463,0.8458951561663203], 0.00975135004221729),
+    (K, [0.04579977970916042,0.28722108615900466,0.666979134131835], 0.04042681475106311),
+  ] if degree == 11 else [
+    (J, [0.02359249810891695,0.4882037509455415], 0.02426683808145205),
+    (J, [0.11977670268281371,0.44011164865859315], 0.04991833492806089),
+    (J, [0.45707498597014784,0.2714625070149261], 0.06254121319590278),
+    (J, [0.7814843446812918,0.10925782765935413], 0.028486052068877523),
+    (J, [0.9507072731273288,0.024646363436335583], 0.007931642509973646),
+    (K, [0.02138249025617055,0.12727971723358947,0.85133779251024], 0.015083677576511446),
+    (K, [0.023034156355267177,0.29165567973834094,0.6853101639063919], 0.02178358503860758),
+    (K, [0.11629601967792662,0.2554542286385172,0.6282497516835561], 0.04322736365941423),
+  ] if degree == 12 else [
+    (I, [1/3], 0.06796003658683158),
+    (J, [0.021846107094921297,0.48907694645253935], 0.02399440192889465),
+    (J, [0.14611717148039927,0.42694141425980037], 0.05560196753045333),
+    (J, [0.5572554274163343,0.22137228629183286], 0.058278485119199995),
+    (J, [0.9569806377823137,0.021509681108843166], 0.006052337103539137),
+    (K, [0.005126389102382324,0.2725158177734294,0.7223577931241882], 0.009590681003543246),
+    (K, [0.024370186901093827,0.1109220428034632,0.864707770295443], 0.014965401105165638),
+    (K, [0.0680122435542066,0.3084417608921181,0.6235459955536753], 0.03464127614084834),
+    (K, [0.08789548303219713,0.1635974010678507,0.7485071158999521], 0.024179039811593913),
+  ] if degree == 13 else [
+    (J, [0.022072179275642756,0.4889639103621786], 0.021883581369428935),
+    (J, [0.16471056131909223,0.4176447193404539], 0.032788353544125355),
+    (J, [0.4530449433823228,0.2734775283088386], 0.051774104507291474),
+    (J, [0.6455889351749131,0.17720553241254344], 0.042162588736992974),
+    (J, [0.8764002338182546,0.061799883090872705], 0.014433699669776737),
+    (J, [0.9612180775025979,0.01939096124870106], 0.00492340360240009),
+    (K, [0.0012683309328721118,0.11897449769695678,0.8797571713701711], 0.005010228838500686),
+    (K, [0.014646950055654417,0.2983728821362579,0.6869801678080877], 0.014436308113533846),
+    (K, [0.05712475740364803,0.17226668782135565,0.7706085547749963], 0.024665753212563705),
+    (K, [0.09291624935697182,0.33686145979634513,0.5702222908466831], 0.038571510787060725),
+  ] if degree == 14 else [
+    (J, [0.4142547017661129,0.29287264911694355], 0.030127325559042267),
+    (J, [0.6154835932615841,0.19225820336920793], 0.032794905294174614),
+    (J, [0.8180529329919273,0.09097353350403635], 0.020226703541583395),
+    (K, [0.014400460387335778,0.40298926455584577,0.5826102750568185], 0.013045867141892117),
+    (K, [0.015802523878944926,0.23468063027651845,0.7495168458445367], 0.012441776967038114),
+    (K, [0.01756444778970312,0.10082518813677259,0.8816103640735243], 0.009844659236872775),
+    (K, [0.017822112856484607,0.021554436024443416,0.960623451119072], 0.0025186860133433243),
+    (K, [0.0737806849579185,0.37748979187626197,0.5487295231658196], 0.027309919075996895),
+    (K, [0.08151090588224705,0.21627307362786763,0.7022160204898853], 0.025959634309460317),
+    (K, [0.17188614636963914,0.3379616443315939,0.4901522092987669], 0.03397165672466299),
+  ] if degree == 15 else [
+    (I, [1/3], 0.04557206270227441),
+    (J, [0.013799000778961568,0.4931004996105192], 0.009714778366018225),
+    (J, [0.08088765684074839,0.4595561715796258], 0.03165878215900859),
+    (J, [0.6138042989755088,0.19309785051224562], 0.02553023821841248),
+    (J, [0.7286738628427754,0.13566306857861235], 0.01962694004827392),
+    (J, [0.8750464392278015,0.06247678038609929], 0.011799466844501444),
+    (J, [0.9664302749226712,0.016784862538664406], 0.003713988825839328),
+    (K, [0.009101236245156604,0.09195800429395665,0.8989407594608867], 0.005366358287635757),
+    (K, [0.010389930145672764,0.2219101430738615,0.7676999267804657], 0.007530066997724169),
+    (K, [0.018028597174715572,0.35574481334134944,0.626226589483935], 0.012559133175079411),
+    (K, [0.05158550559350444,0.16414292247622195,0.7842715719302736], 0.015537558131330929),
+    (K, [0.08307952814946241,0.2877906193483394,0.6291298525021982], 0.02815222031166101),
+    (K, [0.19100234563314697,0.3267423127472637,0.4822553416195894], 0.03890388874849594),
+  ] if degree == 16 else [
+    (J, [0.06880425676221935,0.4655978716188903], 0.025019450950497374),
+    (J, [0.16579311127680152,0.41710344436159924], 0.02731092652810211),
+    (J, [0.42858699512682663,0.2857065024365867], 0.037716237152795325),
+    (J, [0.6392837674672585,0.18035811626637077], 0.026312630588017923),
+    (J, [0.8666918730408062,0.06665406347959693], 0.012459000802305477),
+    (J, [0.9704890166784919,0.014755491660754077], 0.0027738875776376357),
+    (K, [0.011575175903180671,0.0725054707990025,0.9159193532978168], 0.004584348401735857),
+    (K, [0.013135870834002741,0.2717918700553548,0.7150722591106424], 0.008692214501001163),
+    (K, [0.013229672760086988,0.4154754592952289,0.5712948679446841], 0.010398439955839514),
+    (K, [0.016017642362119444,0.15919228747279268,0.8247900701650879], 0.00797830020592955),
+    (K, [0.0673493778673612,0.3062815917461865,0.6263690303864523], 0.022487772546691088),
+    (K, [0.07804234056828246,0.16872251349525955,0.753235145936458], 0.020557898320454484),
+    (K, [0.1575054779268699,0.29921894247697045,0.5432755795961597], 0.026171625935336944),
+  ] if degree == 17 else [
+    (I, [1/3], 0.0363557353014267),
+    (J, [0.02483939685026093,0.48758030157486953], 0.012046647633999694),
+    (J, [0.07638098718710151,0.46180950640644924], 0.018949171506778793),
+    (J, [0.20008874386484776,0.3999556280675761], 0.033304470033390085),
+    (J, [0.515470594971456,0.242264702514272], 0.03647508940894366),
+    (J, [0.8161045157567137,0.09194774212164314], 0.016559159952003306),
+    (J, [0.9223394878226289,0.038830256088685566], 0.007129326019718971),
+    (K, [0.0005483600420423151,0.027090910995161966,0.9723607289627957], 0.0012229481269610913),
+    (K, [0.0038976110334733864,0.3956834343322695,0.6004189546342571], 0.00453053450225708),
+    (K, [0.00529833518660975,0.2357721849581918,0.7589294798551984], 0.005010660874579731),
+    (K, [0.013462016741444982,0.1081957937910332,0.8783421894675218], 0.006840110119607195),
+    (K, [0.04026028346990803,0.3197516245253773,0.6399880920047146], 0.01774748910202045),
+    (K, [0.045804915859860705,0.18382270792546396,0.7703723762146754], 0.0137596162349422),
+    (K, [0.12058769516392452,0.33349352944988087,0.5459187753861946], 0.025482175311824427),
+    (K, [0.12269675737192748,0.20634925743383806,0.6709539851942344], 0.023781910900152838),
+  ] if degree == 18 else [
+    (I, [1/3], 0.02950644020205657),
+    (J, [0.006941622961939453,0.4965291885190303], 0.0056076101222398735),
+    (J, [0.03827534700182045,0.4808623264990898], 0.012508353813424704),
+    (J, [0.1918164276618871,0.40409178616905644], 0.03041795586515688),
+    (J, [0.4710973154115713,0.26445134229421435], 0.02801593671136131),
+    (J, [0.7021561159139107,0.14892194204304465], 0.021970064925616185),
+    (J, [0.9243832900082981,0.037808354995850925], 0.006748228039155526),
+    (K, [0.001108596755239832,0.024887118381076268,0.974004284863684], 0.0010983778348667504),
+    (K, [0.009983453517948195,0.3436804485066087,0.6463360979754431], 0.007354846734811177),
+    (K, [0.010227053246901985,0.09951120489476303,0.890261741858335], 0.0049036477103890485),
+    (K, [0.012894083019124841,0.20841876746737775,0.7786871495134974], 0.008143781407526597),
+    (K, [0.04791732281203306,0.3460358912741417,0.6060467859138252], 0.012143253147919425),
+    (K, [0.05857779733934243,0.12041116871323099,0.8210110339474266], 0.013184019750107896),
+    (K, [0.06708073356807093,0.23123296212287725,0.7016863043090519], 0.017436761626907923),
+    (K, [0.10095872831577002,0.38420646086743465,0.5148348108167953], 0.01898883204646964),
+    (K, [0.15426411187770328,0.2673546124151232,0.5783812757071735], 0.025861331635514996),
+  ] if degree == 19 else [
+    (I, [1/3], 0.027542700233539066),
+    (J, [0.04632355514874531,0.47683822242562734], 0.013727389031179153),
+    (J, [0.10574668637560536,0.4471266568121973], 0.017780445944256124),
+    (J, [0.214646590271517,0.3926767048642415], 0.027240588549993713),
+    (J, [0.49188447317302986,0.25405776341348507], 0.028077834751235133),
+    (J, [0.6215347707517491,0.18923261462412544], 0.016318903762932397),
+    (J, [0.7697920816622457,0.11510395916887715], 0.0160674533404057),
+    (J, [0.9311954227387413,0.03440228863062934], 0.004205204598022404),
+    (K, [0.005155805209694053,0.016847043175521412,0.9779971516147845], 0.0008046506214748544),
+    (K, [0.005969106129728785,0.069900036000068,0.9241308578702032], 0.0024900529628940015),
+    (K, [0.008866203938575866,0.16178395113648836,0.8293498449249358], 0.004926900669990002),
+    (K, [0.009682927899320513,0.4201406500592747,0.5701764220414048], 0.007261301300110041),
+    (K, [0.01092873390199198,0.28132122852023744,0.7077500375777706], 0.007236416095973374),
+    (K, [0.042153244162471126,0.0995066630448808,0.8583400927926481], 0.008840096613508873),
+    (K, [0.05063037199305555,0.20030125382205188,0.7490683741848926], 0.013046325560998186),
+    (K, [0.05500232437402876,0.3342101863005108,0.6107874893254605], 0.017237936081958338),
+    (K, [0.1139457816906565,0.22375679730900233,0.6622974210003412], 0.01584296916626387),
+    (K, [0.1404290177225671,0.3254740656015471,0.5340969166758858], 0.022680657565559453),
+  ] if degree <= 20 else None
+
+  if icw is None:
+    return conical(2, degree)
 
   return types.frozenarray(numpy.concatenate([numpy.take(c,i) for i, c, w in icw]), copy=False), \
          types.frozenarray(numpy.concatenate([[w/2] * len(i) for i, c, w in icw]), copy=False)
@@ -421,7 +630,10 @@ def gauss2(degree):
 def gauss3(degree):
   '''Gauss quadrature for tetrahedron.
 
-  Reference http://www.cs.rpi.edu/~flaherje/pdf/fea6.pdf'''
+  Rules up to degree 8 are taken from
+  http://www.cs.rpi.edu/~flaherje/pdf/fea6.pdf. Rules of degree 9 to 13 are
+  fully symmetric with positive weights and interior points, computed by node
+  elimination; higher degrees fall back on :func:`conical`.'''
 
   assert isinstance(degree, int) and degree >= 0
 
@@ -429,6 +641,7 @@ def gauss3(degree):
   J = [1,1,1],[0,1,1],[1,1,0],[1,0,1]
   K = [0,1,1],[1,0,1],[1,1,0],[1,0,0],[0,1,0],[0,0,1]
   L = [0,1,1],[1,0,1],[1,1,0],[2,1,1],[1,2,1],[1,1,2],[1,0,2],[0,2,1],[2,1,0],[1,2,0],[0,1,2],[2,0,1]
+  M = tuple(itertools.permutations(range(4), 3))
 
   icw = [
     (I, [1/4], 1),
@@ -466,16 +679,146 @@ def gauss3(degree):
     (K, [0.3162695526014501,0.1837304473985499], 0.0829803830550589),
     (L, [0.0229177878448171,0.2319010893971509,0.5132800333608811], 0.0254426245481023),
     (L, [0.7303134278075384,0.0379700484718286,0.1937464752488044], 0.0134324384376852),
-  ]
-
-  if degree > 7:
-    warnings.warn('inexact integration for polynomial of degree {}'.format(degree))
+  ] if degree == 8 else [
+    (I, [.25], 0.05775354432502165),
+    (J, [0.05702178688864956,0.3143260710371168], 0.03927561597926345),
+    (J, [0.5402415281839308,0.15325282393868975], 0.04439176544260221),
+    (J, [0.895184512186421,0.034938495937859665], 0.004380628826973721),
+    (K, [0.010071139653703542,0.48992886034629646], 0.004134274556777338),
+    (K, [0.0894276318884521,0.4105723681115479], 0.031066708872072177),
+    (L, [0.18294626026132232,0.04039206406941678,0.7362696115998442], 0.01245782913387225),
+    (M, [0.010709681785211554,0.14243401922542034,0.2845056318390756,0.5623506671502925], 0.009556440187502332),
+  ] if degree == 9 else [
+    (J, [0.033911389804263226,0.32202953673191226], 0.023051653094607872),
+    (J, [0.4343318141789454,0.18855606194035154], 0.021773985109440338),
+    (J, [0.9208063241125434,0.026397891962485553], 0.0020458275027388684),
+    (K, [0.026809448957697712,0.4731905510423023], 0.007352551932321854),
+    (K, [0.14679527500831613,0.35320472499168387], 0.03019316580508441),
+    (L, [0.16229182296498929,0.09532065895260962,0.6470668591297914], 0.008954128611459368),
+    (L, [0.7953297565180304,0.09633432286259305,0.012001597756783555], 0.004798037340930928),
+    (M, [0.014862315623480837,0.02715238185880821,0.2263344952257304,0.7316508072919806], 0.002188390414115117),
+    (M, [0.02855906894635713,0.13412805143077988,0.29649605797199274,0.5408168216508702], 0.01540385289087369),
+  ] if degree == 10 else [
+    (I, [.25], 0.03543689256767438),
+    (J, [0.011343775263034317,0.3295520749123219], 0.0076227623269951115),
+    (J, [0.47369564099488937,0.17543478633503687], 0.018042859277123516),
+    (J, [0.9022623938222673,0.03257920205924426], 0.0034068538653681812),
+    (L, [0.30589264429100144,0.1028531184893287,0.48840111873034114], 0.014786798307039495),
+    (L, [0.5798509165062838,0.028059478364605005,0.3640301267645062], 0.006515362890319626),
+    (L, [0.6775762441693994,0.13893849097118421,0.04454677388823214], 0.011646264478515673),
+    (M, [0.010064094677698643,0.04642047219897732,0.16526640075926627,0.7782490323640578], 0.002756723942675599),
+    (M, [0.01667872707285675,0.14545408120112133,0.31253576135410577,0.5253314303719161], 0.00862847690501665),
+    (M, [0.0819915270256748,0.23245844229533197,0.2915941178779081,0.3939559128010851], 0.007485303212469336),
+  ] if degree == 11 else [
+    (J, [0.004787878712008697,0.33173737376266377], 0.005792917303267479),
+    (J, [0.3896024288303802,0.20346585705653994], 0.025708459002488374),
+    (J, [0.7530011457117891,0.08233295142940361], 0.004930955252099694),
+    (J, [0.9596417249061808,0.013452758364606375], 0.0003779328125668155),
+    (K, [0.016535387856677186,0.4834646121433228], 0.002791189954629804),
+    (K, [0.06231582185225443,0.4376841781477456], 0.01067815665250739),
+    (L, [0.08371077935096623,0.35838397451843473,0.19952127161216432], 0.015423680083851678),
+    (L, [0.6887722026457631,0.026356284362161374,0.25851522862991416], 0.005090089062685558),
+    (L, [0.7216409594712244,0.1301242710538914,0.01811049842099277], 0.006197486065446733),
+    (M, [0.005243045278821807,0.11848936062492817,0.3284301723468598,0.5478374217493902], 0.0038058163887041527),
+    (M, [0.021434926596831216,0.021560944730751548,0.09835678718531192,0.8586473414871053], 0.001212341989475214),
+    (M, [0.03443139234197426,0.18923721662537085,0.2804769638658005,0.4958544271668543], 0.0065693508146525935),
+    (M, [0.09760781520132601,0.09807986860111151,0.22568368268232125,0.5786286335152413], 0.007221149154321347),
+  ] if degree == 12 else [
+    (I, [.25], 0.018301508034893985),
+    (J, [0.01552800266019938,0.3281573324466002], 0.006378022307782003),
+    (J, [0.7381652980743685,0.0872782339752105], 0.009650246022672667),
+    (J, [0.9999945614587309,1.8128470897130307e-06], 7.328351088921386e-05),
+    (K, [0.00038130295195021313,0.4996186970480498], 0.00017116741349183312),
+    (K, [0.06325256968672688,0.4367474303132731], 0.011846401121202112),
+    (K, [0.16512901384530143,0.33487098615469857], 0.014490088719829647),
+    (L, [0.07173230721951555,0.3613676108301164,0.20553247112025158], 0.012062979849893964),
+    (L, [0.5002672432950983,0.19866324943861585,0.10240625782766999], 0.012280307107402903),
+    (L, [0.7297417000492253,0.13121559323144893,0.007827113487876791], 0.003527198730296991),
+    (L, [0.7429547110677526,0.024784110285051786,0.20747706836214386], 0.0035649552984314643),
+    (M, [0.0026782203733800697,0.04721973014792934,0.3695378209523652,0.5805642285263254], 0.0020568187167480834),
+    (M, [0.012596170349431501,0.02983250660015399,0.07954040634741906,0.8780309167029954], 0.0009436263814480744),
+    (M, [0.013681075457590576,0.17050439183649058,0.3133333773114862,0.5024811553944326], 0.005605925794841774),
+    (M, [0.047092069436483586,0.10855404962414388,0.24117296406493052,0.6031809168744421], 0.007269506158640556),
+  ] if degree <= 13 else None
+
+  if icw is None:
+    return conical(3, degree)
 
   return types.frozenarray(numpy.concatenate([numpy.take(c,i) for i, c, w in icw]), copy=False), \
          types.frozenarray(numpy.concatenate([[w/6] * len(i) for i, c, w in icw]), copy=False)
 
 gaussn = None, gauss1, gauss2, gauss3
 
+def compress(points, degree):
+  '''Reduce the number of quadrature points.
+
+  Returns a subset of ``points`` with new, non-negative weights that
+  integrates all polynomials up to total degree ``degree`` identically to
+  ``points``, using no more points than there are such polynomials. Following
+  Carathéodory's theorem, points are eliminated along null vectors of the
+  moment matrix until the remaining points are independent. To limit the
+  cost, elimination is applied recursively to clusters of points, which
+  removes at least half of the clusters in every round. If ``points`` does not
+  contain more points than polynomials it is returned as is.
+
+  Args
+  ----
+  points : :class:`Points`
+      Quadrature points with non-negative weights.
+  degree : :class:`int`
+      Polynomial degree up to which integrals are preserved.
+
+  Returns
+  -------
+  :class:`Points`
+  '''
+
+  weights = numpy.array(points.weights, dtype=float)
+  if numpy.less(weights, 0).any():
+    raise ValueError('compression requires non-negative weights')
+  powers = numpy.array([p for p in itertools.product(range(degree+1), repeat=points.ndims) if sum(p) <= degree], dtype=int).reshape(-1, points.ndims)
+  if points.npoints <= len(powers):
+    return points
+  # monomials in coordinates scaled to [-1,1] for the sake of conditioning
+  coords = numpy.asarray(points.coords)
+  lower = coords.min(axis=0)
+  upper = coords.max(axis=0)
+  scaled = (2 * coords - lower - upper) / numpy.maximum(upper - lower, numpy.finfo(float).tiny)
+  moments = numpy.prod(scaled[:,_,:]**powers, axis=2) # npoints x npowers
+  selected, = numpy.greater(weights, 0).nonzero()
+  while len(selected) > len(powers):
+    # Divide the selected points in contiguous clusters, the weights of which
+    # are scaled uniformly by the elimination of the cluster moments.
+    nclusters = min(2*len(powers), len(selected))
+    starts = numpy.arange(nclusters) * len(selected) // nclusters
+    clusterweights = numpy.add.reduceat(weights[selected], starts)
+    clustermoments = numpy.add.reduceat(weights[selected,_] * moments[selected], starts) / clusterweights[:,_]
+    scale = (_caratheodory(clustermoments, clusterweights) / clusterweights).repeat(numpy.diff(numpy.append(starts, len(selected))))
+    weights[selected] *= scale
+    selected = selected[numpy.greater(scale, 0)]
+  return CoordsWeightsPoints(coords[selected], weights[selected])
+
+def _caratheodory(moments, weights):
+  # Eliminate points along the null vectors of `moments.T`, which leaves
+  # `moments.T @ weights` unchanged. Every step zeros the weight for which the
+  # ratio with the null vector is smallest, keeping all weights non-negative,
+  # and removes this point from the remaining null vectors.
+  weights = weights.copy()
+  u, s, vh = numpy.linalg.svd(moments.T)
+  rank = numpy.greater(s, s[0] * 1e-12).sum()
+  null = vh[rank:].T.copy()
+  for j in range(null.shape[1]):
+    z = null[:,j]
+    if not numpy.greater(z, 0).any():
+      z = -z
+    positive, = numpy.greater(z, 0).nonzero()
+    i = positive[numpy.argmin(weights[positive] / z[positive])]
+    weights -= (weights[i] / z[i]) * z
+    weights[i] = 0
+    numpy.maximum(weights, 0, out=weights)
+    null[:,j+1:] -= numpy.outer(z / z[i], null[i,j+1:])
+  return weights
+
 def find_duplicates(allpoints):
   coords = {}
   for i, points in enumerate(allpoints):
@@ -44,7 +44,7 @@ class PointsSequence(types.Singleton):
   '''
 
   __slots__ = 'ndims'
-  __cache__ = 'npoints', 'tri', 'hull'
+  __cache__ = 'npoints', 'tri', 'hull', 'coords', 'offsets'
 
   @staticmethod
   def from_iter(value: Iterable[Points], ndims: int) -> 'PointsSequence':
@@ -304,6 +304,29 @@ class PointsSequence(types.Singleton):
       else:
         return _balanced_chain(selfitems + otheritems)
 
+  @property
+  def offsets(self) -> numpy.ndarray:
+    '''Offsets of the points of every item in the concatenated point list.
+
+    A one-dimensional integer array of length ``len(self)+1``, such that the
+    points of item ``i`` are numbered ``offsets[i]`` through ``offsets[i+1]``.
+    '''
+
+    offsets = numpy.empty(len(self)+1, dtype=int)
+    offsets[0] = 0
+    numpy.cumsum(numpy.fromiter((points.npoints for points in self), dtype=int, count=len(self)), out=offsets[1:])
+    offsets.flags.writeable = False
+    return offsets
+
+  @property
+  def coords(self) -> numpy.ndarray:
+    '''Concatenated coordinates of all points.
+
+    A two-dimensional float array with ``ndims`` columns and ``npoints`` rows.
+    '''
+
+    return self._concat(lambda points: points.coords, (self.ndims,), float, shift=False)
+
   @property
   def tri(self) -> numpy.ndarray:
     '''Triangulation of interior.
@@ -312,14 +335,7 @@ class PointsSequence(types.Singleton):
     row defines a simplex by mapping vertices into the list of points.
     '''
 
-    tri = []
-    offset = 0
-    for points in self:
-      tri.append(points.tri + offset)
-      offset += points.npoints
-    tri = numpy.concatenate(tri) if tri else numpy.zeros((0,self.ndims+1), int)
-    tri.flags.writeable = False
-    return tri
+    return self._concat(lambda points: points.tri, (self.ndims+1,), int, shift=True)
 
   @property
   def hull(self) -> numpy.ndarray:
@@ -331,14 +347,21 @@ class PointsSequence(types.Singleton):
     triangulations originating from separate elements are disconnected.
     '''
 
-    hull = []
-    offset = 0
-    for points in self:
-      hull.append(points.hull + offset)
-      offset += points.npoints
-    hull = numpy.concatenate(hull) if hull else numpy.zeros((0,self.ndims), int)
-    hull.flags.writeable = False
-    return hull
+    return self._concat(lambda points: points.hull, (self.ndims,), int, shift=True)
+
+  def _concat(self, get, shape, dtype, shift):
+    # Concatenate `get(points)` for all items. The data is obtained once for
+    # every distinct points object and gathered in a single concatenation; if
+    # `shift` is true the point offset of every item is added to its data.
+    unique = {}
+    inverse = numpy.fromiter((unique.setdefault(points, len(unique)) for points in self), dtype=int, count=len(self))
+    values = [numpy.asarray(get(points), dtype=dtype).reshape((-1,)+shape) for points in unique]
+    concat = numpy.concatenate([values[i] for i in inverse]) if len(self) else numpy.empty((0,)+shape, dtype=dtype)
+    if shift:
+      counts = numpy.array([len(v) for v in values], dtype=int).take(inverse)
+      concat += numpy.repeat(self.offsets[:-1], counts).reshape((-1,)+(1,)*len(shape))
+    concat.flags.writeable = False
+    return concat
 
 class _Empty(PointsSequence):
 
@@ -373,7 +396,7 @@ class _Plain(PointsSequence):
 class _Uniform(PointsSequence):
 
   __slots__ = 'item', 'length'
-  __cache__ = 'tri', 'hull'
+  __cache__ = 'tri', 'hull', 'coords', 'offsets'
 
   def __init__(self, item, length):
     assert length >= 0, 'length should be nonnegative'
@@ -432,6 +455,18 @@ class _Uniform(PointsSequence):
   def hull(self) -> numpy.ndarray:
     return self._mk_indices(self.item.hull)
 
+  @property
+  def coords(self) -> numpy.ndarray:
+    coords = numpy.tile(self.item.coords, (len(self), 1))
+    coords.flags.writeable = False
+    return coords
+
+  @property
+  def offsets(self) -> numpy.ndarray:
+    offsets = numpy.arange(len(self)+1) * self.item.npoints
+    offsets.flags.writeable = False
+    return offsets
+
 class _Take(PointsSequence):
 
   __slots__ = 'parent', 'indices'
@@ -464,7 +499,7 @@ class _Take(PointsSequence):
 class _Repeat(PointsSequence):
 
   __slots__ = 'parent', 'count'
-  __cache__ = 'tri', 'hull'
+  __cache__ = 'tri', 'hull', 'coords', 'offsets'
 
   def __init__(self, parent, count):
     assert count >= 0, 'count should be nonnegative'
@@ -510,6 +545,19 @@ class _Repeat(PointsSequence):
   def hull(self) -> numpy.ndarray:
     return self._mk_indices(self.parent.hull)
 
+  @property
+  def coords(self) -> numpy.ndarray:
+    coords = numpy.tile(self.parent.coords, (self.count, 1))
+    coords.flags.writeable = False
+    return coords
+
+  @property
+  def offsets(self) -> numpy.ndarray:
+    parent = self.parent.offsets
+    offsets = numpy.concatenate([(parent[:-1] + numpy.arange(self.count)[:,numpy.newaxis] * self.parent.npoints).ravel(), [self.npoints]])
+    offsets.flags.writeable = False
+    return offsets
+
 class _Product(PointsSequence):
 
   __slots__ = 'sequence1', 'sequence2'
@@ -541,7 +589,7 @@ class _Product(PointsSequence):
 class _Chain(PointsSequence):
 
   __slots__ = 'sequence1', 'sequence2'
-  __cache__ = 'tri', 'hull'
+  __cache__ = 'tri', 'hull', 'coords', 'offsets'
 
   def __init__(self, sequence1, sequence2):
     assert sequence1.ndims == sequence2.ndims, 'cannot chain sequences with different ndims'
@@ -592,6 +640,14 @@ class _Chain(PointsSequence):
     hull2 = self.sequence2.hull
     return types.frozenarray(numpy.concatenate([hull1, hull2 + self.sequence1.npoints]), copy=False)
 
+  @property
+  def coords(self) -> types.frozenarray:
+    return types.frozenarray(numpy.concatenate([self.sequence1.coords, self.sequence2.coords]), copy=False)
+
+  @property
+  def offsets(self) -> types.frozenarray:
+    return types.frozenarray(numpy.concatenate([self.sequence1.offsets, self.sequence2.offsets[1:] + self.sequence1.npoints]), copy=False)
+
 def _unchain(seq: PointsSequence) -> Iterator[PointsSequence]:
   if isinstance(seq, _Chain):
     yield from _unchain(seq.sequence1)
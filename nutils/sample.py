@@ -46,6 +46,7 @@ efficiently combine common substructures.
 from . import types, points, util, function, parallel, numeric, matrix, transformseq, sparse
 from .pointsseq import PointsSequence
 import numpy, numbers, collections.abc, os, treelog as log, abc
+_ = numpy.newaxis
 
 graphviz = os.environ.get('NUTILS_GRAPHVIZ')
 
@@ -73,11 +74,11 @@ class Sample(types.Singleton):
   '''
 
   __slots__ = 'nelems', 'transforms', 'points', 'ndims'
-  __cache__ = 'allcoords'
+  __cache__ = 'allcoords', '_flatindex'
 
   @staticmethod
   @types.apply_annotations
-  def new(transforms:types.tuple[transformseq.stricttransforms], points:types.strict[PointsSequence], index:types.tuple[types.frozenarray[int]]=None):
+  def new(transforms:types.tuple[transformseq.stricttransforms], points:types.strict[PointsSequence], index=None):
     '''Create a new :class:`Sample`.
 
     Parameters
@@ -87,16 +88,27 @@ class Sample(types.Singleton):
         contain points.
     points : :class:`~nutils.pointsseq.PointsSequence`
         Points sequence.
-    index : :class:`tuple` of integer arrays, optional
+    index : :class:`tuple` of integer arrays, or integer array, optional
         List of indices matching ``transforms``, defining the order on which
-        points show up in the evaluation. If absent the indices will be strict
-        increasing.
+        points show up in the evaluation, or a single array with the
+        concatenation thereof. Indices may be shared between elements, in
+        which case the point is evaluated by the first element only. The
+        number of points of the sample equals the largest index plus one. If
+        absent the indices will be strict increasing.
     '''
 
     if index is None:
       return _DefaultIndex(transforms, points)
-    else:
-      return _CustomIndex(transforms, points, index)
+    if not isinstance(index, numpy.ndarray):
+      index = tuple(index)
+      if len(index) != len(points):
+        raise ValueError('expected an `index` with {} items but got {}'.format(len(points), len(index)))
+      if not all(len(i) == p.npoints for i, p in zip(index, points)):
+        raise ValueError('lengths of indices does not match number of points per element')
+      index = numpy.concatenate(index) if index else numpy.zeros(0, dtype=int)
+    elif len(index) != points.npoints:
+      raise ValueError('expected an `index` with {} points but got {}'.format(points.npoints, len(index)))
+    return _CustomIndex(transforms, points, types.frozenarray(index, dtype=int))
 
   def __init__(self, transforms, points):
     '''
@@ -133,6 +145,19 @@ class Sample(types.Singleton):
 
     raise NotImplementedError
 
+  def _getslice(self, ielem):
+    '''Return a slice of `Sample.points[ielem]` in results of `Sample.eval`
+    if these points are contiguous and do not overlap with those of other
+    elements, or an index array otherwise.'''
+
+    return self.getindex(ielem)
+
+  def _getowned(self, ielem):
+    '''Return a boolean mask of `Sample.points[ielem]` that are written to
+    results of `Sample.eval` by this element, or None if all points are.'''
+
+    return None
+
   def _prepare_funcs(self, funcs):
     return [function.asarray(func).prepare_eval(ndims=self.ndims) for func in funcs]
 
@@ -170,11 +195,23 @@ class Sample(types.Singleton):
     if arguments is None:
       arguments = {}
 
+    # Integrands of dimension zero or one that consist of dense blocks only,
+    # such as volumes, norms and error functionals, are reduced directly by
+    # _integrate_dense without forming sparse data per element. The remaining
+    # integrands follow the generic path below, after which the results are
+    # merged in the original order.
+
+    allfuncs = self._prepare_funcs(funcs)
+    isdense = [func.ndim < 2 and all(all(map(_isfullrange, ind, func.shape)) for ind, f in function.blocks(func)) for func in allfuncs]
+    reduced = iter(self._integrate_dense([func for func, dense in zip(allfuncs, isdense) if dense], arguments) if any(isdense) else [])
+    funcs = [func for func, dense in zip(allfuncs, isdense) if not dense]
+    if not funcs:
+      return [sparse.fromarray(next(reduced)) for func in allfuncs]
+
     # Functions may consist of several blocks, such as originating from
     # chaining. Here we make a list of all blocks consisting of triplets of
     # argument id, evaluable index, and evaluable values.
 
-    funcs = self._prepare_funcs(funcs)
     blocks = [(ifunc, function.Tuple(ind).optimized_for_numpy, f.optimized_for_numpy) for ifunc, func in enumerate(funcs) for ind, f in function.blocks(func)]
     block2func, indices, values = zip(*blocks) if blocks else ([],[],[])
 
@@ -187,7 +224,8 @@ class Sample(types.Singleton):
 
     offsets = numpy.empty((len(blocks), self.nelems+1), dtype=numpy.uint64)
     sizefunc = function.Tuple([f.size for ifunc, ind, f in blocks]).optimized_for_numpy
-    for ielem, transforms in enumerate(zip(*self.transforms)):
+    elemtransforms = tuple(zip(*self.transforms)) # retrieved once for both element loops
+    for ielem, transforms in enumerate(elemtransforms):
       offsets[:,ielem+1] = sizefunc.eval(_transforms=transforms, **arguments)
 
     # In the second step the block sizes are accumulated to form offsets. Since
@@ -215,14 +253,155 @@ class Sample(types.Singleton):
 
       for ielem in ielems:
         points = self.points[ielem]
-        for iblock, (intdata, *indices) in enumerate(eval(_transforms=tuple(t[ielem] for t in self.transforms), _points=points.coords, **arguments)):
+        for iblock, (intdata, *indices) in enumerate(eval(_transforms=elemtransforms[ielem], _points=points.coords, **arguments)):
           data = datas[block2func[iblock]][offsets[iblock,ielem]:offsets[iblock,ielem+1]].reshape(intdata.shape[1:])
           numpy.einsum('p,p...->...', points.weights, intdata, out=data['value'])
           td = trailingdims[iblock]
           for idim, ii in enumerate(indices):
             data['index']['i'+str(idim)] = ii.reshape(ii.shape[1:]+(1,)*td[idim]) # note: this could be implemented using newaxis, but reshape appears to be faster
 
-    return datas
+    datas = iter(datas)
+    return [sparse.fromarray(next(reduced)) if dense else next(datas) for dense in isdense]
+
+  def _integrate_dense(self, funcs, arguments):
+    # Integrate dense functions without forming sparse data. The elements are
+    # divided in consecutive chunks, each of which sums the integrals of its
+    # elements in a local array and stores the result in its own row of a
+    # small shared array, such that no locks are required. The rows are summed
+    # at the end.
+
+    blocks = [(ifunc, f.optimized_for_numpy) for ifunc, func in enumerate(funcs) for ind, f in function.blocks(func)]
+    block2func, values = zip(*blocks) if blocks else ([],[])
+    nchunks = min(self.nelems, 64)
+    bounds = numpy.linspace(0, self.nelems, nchunks+1).astype(int)
+    partials = [parallel.shzeros((nchunks,)+func.shape) for func in funcs]
+    elemtransforms = tuple(zip(*self.transforms))
+
+    with function.Tuple(values).session(graphviz) as eval, \
+         parallel.ctxrange('integrating', nchunks) as ichunks:
+
+      for ichunk in ichunks:
+        elemsums = [numpy.zeros((bounds[ichunk+1]-bounds[ichunk],)+func.shape) for func in funcs]
+        for i, ielem in enumerate(range(bounds[ichunk], bounds[ichunk+1])):
+          points = self.points[ielem]
+          for ifunc, intdata in zip(block2func, eval(_transforms=elemtransforms[ielem], _points=points.coords, **arguments)):
+            elemsums[ifunc][i] += numpy.einsum('p,p...->...', points.weights, intdata)
+        for partial, elemsum in zip(partials, elemsums):
+          partial[ichunk] = elemsum.sum(0) # pairwise summation for accuracy
+
+    return [partial.sum(0) for partial in partials]
+
+  @types.apply_annotations
+  def integrate_bilinear(self, basis:function.asarray, geometry:function.asarray, mass:function.asarray=None, stiffness:function.asarray=None, arguments:types.frozendict[str,types.frozenarray]=None):
+    '''Integrate a bilinear form of mass and stiffness type.
+
+    Computes the matrix
+
+    .. math:: A_{ij} = \\int m \\phi_i \\phi_j + \\nabla \\phi_i \\cdot K \\nabla \\phi_j,
+
+    with :math:`\\phi` the ``basis``, :math:`m` the ``mass`` coefficient and
+    :math:`K` the ``stiffness`` coefficient, which is either a scalar or a
+    matrix. For a :class:`~nutils.function.StructuredBasis` that is sampled in
+    tensorial points, such as the ``gauss`` scheme of a structured topology,
+    the integral is sum factorized: the basis is evaluated per dimension and the
+    quadrature is contracted one dimension at a time, which reduces the cost
+    per element from :math:`O(p^{3d})` to :math:`O(p^{2d+1})` for degree
+    :math:`p` in :math:`d` dimensions. In all other situations the form is
+    integrated via :meth:`integrate`.
+
+    Args
+    ----
+    basis : :class:`nutils.function.Array`
+        The basis.
+    geometry : :class:`nutils.function.Array`
+        The geometry.
+    mass : :class:`nutils.function.Array`, optional
+        Scalar coefficient of the mass term.
+    stiffness : :class:`nutils.function.Array`, optional
+        Scalar or matrix coefficient of the stiffness term.
+    arguments : :class:`dict` (default: None)
+        Optional arguments for function evaluation.
+
+    Returns
+    -------
+    :class:`nutils.matrix.Matrix`
+    '''
+
+    if mass is None and stiffness is None:
+      raise ValueError('at least one of mass and stiffness should be specified')
+    if mass is not None and mass.ndim != 0:
+      raise ValueError('mass coefficient should be a scalar')
+    if stiffness is not None and stiffness.ndim == 0:
+      stiffness = stiffness * function.eye(geometry.shape[0])
+    if stiffness is not None and stiffness.shape != geometry.shape*2:
+      raise ValueError('stiffness coefficient should be a scalar or a square matrix matching the geometry')
+    if arguments is None:
+      arguments = {}
+
+    factors = [_tensorfactors(elempoints) for elempoints in self.points]
+    if not isinstance(basis, function.StructuredBasis) or geometry.shape != (self.ndims,) or basis.coords.shape != (self.ndims,) or any(f is None for f in factors):
+      return self._integrate_bilinear(basis, geometry, mass, stiffness, arguments)
+
+    # The mass coefficient and the stiffness coefficient pulled back to the
+    # element coordinates are evaluated in all points, along with the element
+    # index and local coordinates of the basis that select the per dimension
+    # basis functions.
+
+    grad = function.localgradient(geometry, self.ndims)
+    invgrad = function.inverse(grad)
+    detgrad = abs(function.determinant(grad))
+    weights = []
+    terms = []
+    if mass is not None:
+      weights.append(mass * detgrad)
+      terms.append((None, None))
+    if stiffness is not None:
+      weights.extend((invgrad[i,:] * (stiffness * invgrad[j,_,:]).sum(-1)).sum() * detgrad for i in range(self.ndims) for j in range(self.ndims))
+      terms.extend((i, j) for i in range(self.ndims) for j in range(self.ndims))
+    evaluable = function.Tuple([function.asarray(f).prepare_eval(ndims=self.ndims) for f in (basis.index, basis.coords, *weights)]).optimized_for_numpy
+
+    tables = {}
+    values = []
+    dofs = []
+    with evaluable.session(graphviz) as eval, log.iter.fraction('integrating', range(self.nelems)) as ielems:
+      for ielem in ielems:
+        elempoints = self.points[ielem]
+        index, coords, *elemweights = eval(_transforms=tuple(t[ielem] for t in self.transforms), _points=elempoints.coords, **arguments)
+        if coords.shape != elempoints.coords.shape or not numpy.equal(coords, elempoints.coords).all():
+          return self._integrate_bilinear(basis, geometry, mass, stiffness, arguments)
+        index = numpy.ravel(index)[0]
+        elemtables = []
+        for coeffs, points1d in zip(basis.get_tensor_coefficients(index), factors[ielem]):
+          try:
+            table = tables[coeffs, points1d]
+          except KeyError:
+            table = tables[coeffs, points1d] = _polytables(coeffs, points1d.coords)
+          elemtables.append(table)
+        shape = tuple(points1d.npoints for points1d in factors[ielem])
+        elemmatrix = 0
+        for (i, j), w in zip(terms, elemweights):
+          w = (numpy.broadcast_to(w, elempoints.weights.shape) * elempoints.weights).reshape(shape)
+          elemmatrix += _sumfactorize(w, [values1d if idim != i else grad1d for idim, (values1d, grad1d) in enumerate(elemtables)], [values1d if idim != j else grad1d for idim, (values1d, grad1d) in enumerate(elemtables)])
+        values.append(elemmatrix.ravel())
+        elemdofs = basis.get_dofs(index)
+        dofs.append(numpy.stack(numpy.broadcast_arrays(elemdofs[:,_], elemdofs[_,:]), axis=-1).reshape(-1, 2))
+
+    data = numpy.empty(sum(map(len, values)), dtype=sparse.dtype((basis.ndofs, basis.ndofs)))
+    data['value'] = numpy.concatenate(values)
+    dofs = numpy.concatenate(dofs)
+    data['index']['i0'] = dofs[:,0]
+    data['index']['i1'] = dofs[:,1]
+    return _convert(data, inplace=True)
+
+  def _integrate_bilinear(self, basis, geometry, mass, stiffness, arguments):
+    # generic counterpart of integrate_bilinear
+    integrand = 0
+    if mass is not None:
+      integrand += function.outer(basis) * mass
+    if stiffness is not None:
+      dbasis = basis.grad(geometry)
+      integrand += (dbasis[:,_,:,_] * dbasis[_,:,_,:] * stiffness).sum([2,3])
+    return self.integrate(integrand * function.J(geometry), arguments=arguments)
 
   def integral(self, func):
     '''Create Integral object for postponed integration.
@@ -251,21 +430,138 @@ class Sample(types.Singleton):
 
     funcs = self._prepare_funcs(funcs)
     retvals = [parallel.shzeros((self.npoints,)+func.shape, dtype=func.dtype) for func in funcs]
+    block2func, isdense, isunique, evaluables = self._eval_blocks(funcs)
 
-    with function.Tuple(function.Tuple([i, *ind, f]).optimized_for_numpy for i, func in enumerate(funcs) for ind, f in function.blocks(func)).session(graphviz) as eval, \
+    with function.Tuple(evaluables).session(graphviz) as eval, \
          parallel.ctxrange('evaluating', self.nelems) as ielems:
 
       for ielem in ielems:
-        for ifunc, *inds, data in eval(_transforms=tuple(t[ielem] for t in self.transforms), _points=self.points[ielem].coords, **arguments):
-          numpy.add.at(retvals[ifunc], numpy.ix_(self.getindex(ielem), *[ind.ravel() for (ind,) in inds]), data.reshape([data.shape[0]] + [ind.size for ind in inds]))
+        self._eval_accumulate(retvals, ielem, block2func, isdense, isunique, eval(_transforms=tuple(t[ielem] for t in self.transforms), _points=self.points[ielem].coords, **arguments))
 
     return retvals
 
+  def _eval_accumulate(self, retvals, ielem, block2func, isdense, isunique, values):
+    # write the evaluated blocks of element `ielem` to the results of `eval`
+    index = self._getslice(ielem)
+    owned = self._getowned(ielem)
+    if owned is not None:
+      index = self.getindex(ielem)[owned]
+    for ifunc, dense, unique, (data, *inds) in zip(block2func, isdense, isunique, values):
+      if owned is not None and len(data) == len(owned): # skip values that do not depend on the points
+        data = data[owned]
+      if not dense:
+        numpy.add.at(retvals[ifunc], numpy.ix_(index if owned is not None else self.getindex(ielem), *[ind.ravel() for (ind,) in inds]), data.reshape([data.shape[0]] + [ind.size for ind in inds]))
+      elif not isinstance(index, slice) and owned is None:
+        numpy.add.at(retvals[ifunc], index, data)
+      elif unique:
+        retvals[ifunc][index] = data
+      else:
+        retvals[ifunc][index] += data
+
+  def _eval_blocks(self, funcs):
+    # Blocks that span the entire function shape are flagged as dense, in
+    # which case the indices are not evaluated and the data is written to the
+    # point range of the element directly. If moreover the dense block is the
+    # only block of its function, and the sample guarantees that points of
+    # different elements do not overlap, accumulation is skipped altogether.
+    # Points that are shared between elements are written only by the element
+    # that owns them, which makes the indices of different elements disjoint.
+
+    blocks = []
+    for ifunc, func in enumerate(funcs):
+      funcblocks = function.blocks(func)
+      for ind, f in funcblocks:
+        dense = all(map(_isfullrange, ind, func.shape))
+        blocks.append((ifunc, dense, dense and len(funcblocks) == 1, function.Tuple([f] if dense else [f, *ind]).optimized_for_numpy))
+    return zip(*blocks) if blocks else ([],[],[],[])
+
+  @util.positional_only
+  @types.apply_annotations
+  def eval_chunks(self, funcs, *, chunksize:int=65536, arguments:argdict=...):
+    '''Evaluate function in chunks of points.
+
+    Generator variant of :meth:`eval` that does not allocate the result for
+    all points at once, but yields it in chunks of consecutive elements, in
+    element order, of approximately ``chunksize`` points each. Every chunk is
+    a pair ``(index, values)``, where ``values`` contains the function values
+    in the points ``index`` of the result of :meth:`eval`. The index is a
+    :class:`slice` if these points form a contiguous range, and an integer
+    array otherwise. Points that are shared between elements are yielded only
+    once. This allows large samples to be processed with bounded memory, for
+    instance to compute the maximum of a function::
+
+        max(values.max() for index, values in sample.eval_chunks(func))
+
+    Args
+    ----
+    funcs : :class:`nutils.function.Array` object or :class:`tuple` thereof.
+        The function(s) to evaluate. If a tuple is given, ``values`` is a
+        tuple of arrays as well.
+    chunksize : :class:`int`
+        Number of points per chunk. Elements are never split over chunks, so
+        a chunk contains at least one element.
+    arguments : :class:`dict` (default: None)
+        Optional arguments for function evaluation.
+
+    Yields
+    ------
+    index : :class:`slice` or :class:`numpy.ndarray`
+        Indices of the points in the chunk.
+    values : :class:`numpy.ndarray` or :class:`tuple` thereof
+        Function values of shape ``(len(index),)+func.shape``.
+    '''
+
+    if chunksize < 1:
+      raise ValueError('chunksize should be positive')
+    ismultiple = isinstance(funcs, (list, tuple))
+    chunks = self._eval_chunks(self._prepare_funcs(funcs if ismultiple else [funcs]), chunksize, arguments)
+    return ((index, tuple(values)) for index, values in chunks) if ismultiple else ((index, values) for index, (values,) in chunks)
+
+  def _eval_chunks(self, funcs, chunksize, arguments):
+    block2func, isdense, isunique, evaluables = self._eval_blocks(funcs)
+    with function.Tuple(evaluables).session(graphviz) as eval:
+      ielem = 0
+      while ielem < self.nelems:
+        # collect the owned point indices of consecutive elements until the
+        # chunk is full, and concatenate the element values in this order
+        elems = []
+        npoints = 0
+        while ielem < self.nelems:
+          owned = self._getowned(ielem)
+          index = self.getindex(ielem)
+          if owned is not None:
+            index = index[owned]
+          if elems and npoints + len(index) > chunksize:
+            break
+          elems.append((ielem, owned, slice(npoints, npoints+len(index)), index))
+          npoints += len(index)
+          ielem += 1
+        retvals = [numpy.zeros((npoints,)+func.shape, dtype=func.dtype) for func in funcs]
+        for ielem_, owned, chunkslice, index in elems:
+          for ifunc, dense, unique, (data, *inds) in zip(block2func, isdense, isunique, eval(_transforms=tuple(t[ielem_] for t in self.transforms), _points=self.points[ielem_].coords, **arguments)):
+            if owned is not None and len(data) == len(owned): # skip values that do not depend on the points
+              data = data[owned]
+            if not dense:
+              numpy.add.at(retvals[ifunc], numpy.ix_(numpy.arange(chunkslice.start, chunkslice.stop), *[ind.ravel() for (ind,) in inds]), data.reshape([data.shape[0]] + [ind.size for ind in inds]))
+            elif unique:
+              retvals[ifunc][chunkslice] = data
+            else:
+              retvals[ifunc][chunkslice] += data
+        index = numpy.concatenate([index for ielem_, owned, chunkslice, index in elems])
+        if len(index) and numpy.equal(numpy.diff(index), 1).all():
+          index = slice(int(index[0]), int(index[-1])+1)
+        yield index, retvals
+
+  @property
+  def _flatindex(self):
+    # concatenation of all indices, mapping the concatenated points of
+    # `self.points` onto the points in results of `Sample.eval`
+    return types.frozenarray(numpy.concatenate(self.index), copy=False)
+
   @property
   def allcoords(self):
     coords = numpy.empty([self.npoints, self.ndims])
-    for ielem, points in enumerate(self.points):
-      coords[self.getindex(ielem)] = points.coords
+    coords[self._flatindex] = self.points.coords
     return types.frozenarray(coords, copy=False)
 
   def basis(self):
@@ -274,7 +570,7 @@ class Sample(types.Singleton):
 
     index, tail = function.TransformsIndexWithTail(self.transforms[0], function.TRANS)
     I = function.Elemwise(self.index, index, dtype=int)
-    B = function.Sampled(function.ApplyTransforms(tail), expect=function.take(self.allcoords, I, axis=0))
+    B = function.Sampled(function.ApplyTransforms(tail), expect=function.Elemwise(tuple(points.coords for points in self.points), index, dtype=float))
     return function._inflate(B, dofmap=I, length=self.npoints, axis=0)
 
   def asfunction(self, array):
@@ -308,7 +604,23 @@ class Sample(types.Singleton):
     row defines a simplex by mapping vertices into the list of points.
     '''
 
-    return numpy.concatenate([self.getindex(ielem).take(points.tri) for ielem, points in enumerate(self.points)])
+    return self._flatindex.take(self.points.tri)
+
+  @property
+  def grid(self):
+    '''Structured grids of interior.
+
+    An integer array with ``ndims+1`` axes, of which the first enumerates the
+    elements and the remaining axes map a regular grid of points into the list
+    of points, in the order of the coordinate directions. Only defined for
+    samples of tensor product elements with equal point counts, such as the
+    ``bezier`` sample of a structured topology.
+    '''
+
+    grids = [self.getindex(ielem).take(points.grid) for ielem, points in enumerate(self.points)]
+    if any(grid.shape != grids[0].shape for grid in grids[1:]):
+      raise Exception('elements have differently shaped grids')
+    return numpy.stack(grids)
 
   @property
   def hull(self):
@@ -317,10 +629,11 @@ class Sample(types.Singleton):
     A two-dimensional integer array with ``ndims`` columns, of which every row
     defines a simplex by mapping vertices into the list of points. Note that
     the hull often does contain internal element boundaries as the
-    triangulations originating from separate elements are disconnected.
+    triangulations originating from separate elements are disconnected,
+    unless the sample is conforming.
     '''
 
-    return numpy.concatenate([self.getindex(ielem).take(points.hull) for ielem, points in enumerate(self.points)])
+    return self._flatindex.take(self.points.hull)
 
   def subset(self, mask):
     '''Reduce the number of points.
@@ -341,7 +654,8 @@ class Sample(types.Singleton):
     subset : :class:`Sample`
     '''
 
-    selection = types.frozenarray([ielem for ielem in range(self.nelems) if mask[self.getindex(ielem)].any()])
+    ielems = numpy.repeat(numpy.arange(self.nelems), numpy.diff(self.points.offsets)) # element index of every point in self.points
+    selection = types.frozenarray(numpy.unique(ielems[numpy.asarray(mask, dtype=bool)[self._flatindex]]))
     transforms = tuple(transform[selection] for transform in self.transforms)
     return Sample.new(transforms, self.points.take(selection))
 
@@ -350,15 +664,26 @@ strictsample = types.strict[Sample]
 class _DefaultIndex(Sample):
 
   __slots__ = ()
-  __cache__ = 'offsets'
+  __cache__ = 'offsets', '_flatindex', 'allcoords'
 
   @property
   def offsets(self):
-    return numpy.cumsum([0]+[p.npoints for p in self.points])
+    return self.points.offsets
+
+  @property
+  def _flatindex(self):
+    return types.frozenarray(numpy.arange(self.npoints), copy=False)
+
+  @property
+  def allcoords(self):
+    return types.frozenarray(self.points.coords)
 
   def getindex(self, ielem):
     return numpy.arange(self.offsets[ielem], self.offsets[ielem+1])
 
+  def _getslice(self, ielem):
+    return slice(self.offsets[ielem], self.offsets[ielem+1])
+
   @property
   def tri(self):
     return self.points.tri
@@ -370,21 +695,54 @@ class _DefaultIndex(Sample):
 class _CustomIndex(Sample):
 
   __slots__ = '_index'
+  __cache__ = 'index', 'npoints', '_owned'
 
   def __init__(self, transforms, points, index):
+    # `index` is the concatenation of the indices of all elements, which
+    # avoids forming an array per element for samples with many elements
     self._index = index
-    if len(index) != len(points):
-      raise ValueError('expected an `index` with {} items but got {}'.format(len(points), len(index)))
-    if not all(len(i) == p.npoints for i, p in zip(self._index, points)):
-      raise ValueError('lengths of indices does not match number of points per element')
     super().__init__(transforms, points)
 
   @property
   def index(self):
-    return self._index
+    return tuple(types.frozenarray(index, copy=False) for index in numpy.split(self._index, self.points.offsets[1:-1]))
 
   def getindex(self, ielem):
-    return self._index[ielem]
+    return self._index[self.points.offsets[ielem]:self.points.offsets[ielem+1]]
+
+  @property
+  def _flatindex(self):
+    return self._index
+
+  @property
+  def npoints(self):
+    return int(self._flatindex.max()) + 1 if len(self._flatindex) else 0
+
+  @property
+  def _owned(self):
+    # mask of the concatenated points of `self.points` that selects the first
+    # occurrence of every index, or None if no indices are shared
+    first = numpy.unique(self._flatindex, return_index=True)[1]
+    if len(first) == len(self._flatindex):
+      return None
+    owned = numpy.zeros(len(self._flatindex), dtype=bool)
+    owned[first] = True
+    return types.frozenarray(owned, copy=False)
+
+  def _getowned(self, ielem):
+    if self._owned is None:
+      return None
+    owned = self._owned[self.points.offsets[ielem]:self.points.offsets[ielem+1]]
+    return None if owned.all() else owned
+
+  @property
+  def hull(self):
+    hull = super().hull
+    if self._owned is None:
+      return hull
+    # faces that occur more than once are shared between elements
+    inverse, counts = numpy.unique(numpy.sort(hull, axis=1), axis=0, return_inverse=True, return_counts=True)[1:]
+    return types.frozenarray(hull[numpy.equal(counts[inverse], 1)], copy=False)
 
 class Integral(types.Singleton):
   '''Postponed integration.
@@ -596,6 +954,105 @@ def eval_integrals_sparse(*integrals: types.tuple[strictintegral], **arguments:
 
   return [sparse.add(retval) for retval in retvals]
 
+@util.positional_only
+@types.apply_annotations
+def eval_samples(samples:types.tuple[strictsample], funcs, arguments:argdict=...):
+  '''Evaluate functions on multiple samples.
+
+  Evaluates the same function(s) on all samples in one pass, which is
+  equivalent to ``[sample.eval(funcs, **arguments) for sample in samples]`` but
+  prepares the functions only once and evaluates elements that are shared
+  between samples once for the concatenated points. This is particularly
+  efficient for many small samples on the same topology, such as those
+  obtained via :meth:`nutils.topology.Topology.locate`.
+
+  Args
+  ----
+  samples : :class:`tuple` of :class:`Sample` objects
+      Samples of equal dimension.
+  funcs : :class:`nutils.function.Array` object or :class:`tuple` thereof.
+      The function(s) to evaluate.
+  arguments : :class:`dict` (default: None)
+      Optional arguments for function evaluation.
+
+  Returns
+  -------
+  results : :class:`list`
+      For every sample the result of :meth:`Sample.eval`.
+  '''
+
+  if len(set((sample.ndims, len(sample.transforms)) for sample in samples)) > 1:
+    raise ValueError('samples should have equal dimensions')
+  ismultiple = isinstance(funcs, (list, tuple))
+  if not samples:
+    return []
+  funcs = samples[0]._prepare_funcs(funcs if ismultiple else [funcs])
+  retvals = [[parallel.shzeros((sample.npoints,)+func.shape, dtype=func.dtype) for func in funcs] for sample in samples]
+  block2func, isdense, isunique, evaluables = samples[0]._eval_blocks(funcs)
+
+  # Elements are grouped by transforms, such that elements that are shared
+  # between samples are evaluated once for the concatenation of their points.
+
+  groups = {}
+  for isample, sample in enumerate(samples):
+    for ielem in range(sample.nelems):
+      groups.setdefault(tuple(t[ielem] for t in sample.transforms), []).append((isample, ielem))
+  groups = tuple(groups.items())
+
+  with function.Tuple(evaluables).session(graphviz) as eval, \
+       parallel.ctxrange('evaluating', len(groups)) as igroups:
+
+    for igroup in igroups:
+      transforms, members = groups[igroup]
+      allpoints = [samples[isample].points[ielem] for isample, ielem in members]
+      offsets = numpy.cumsum([0] + [elempoints.npoints for elempoints in allpoints])
+      values = eval(_transforms=transforms, _points=numpy.concatenate([elempoints.coords for elempoints in allpoints]) if len(allpoints) > 1 else allpoints[0].coords, **arguments)
+      for (isample, ielem), start, stop in zip(members, offsets[:-1], offsets[1:]):
+        # values that do not depend on the points have a point axis of length one
+        elemvalues = [(data if len(allpoints) == 1 or len(data) == 1 else data[start:stop], *inds) for data, *inds in values]
+        samples[isample]._eval_accumulate(retvals[isample], ielem, block2func, isdense, isunique, elemvalues)
+
+  return retvals if ismultiple else [retval for retval, in retvals]
+
+def _isfullrange(index, length):
+  '''Test if ``index`` is a constant evaluable that equals ``arange(length)``.'''
+
+  return index.ndim == 1 and index.shape[0] == length and index.isconstant and numpy.equal(numpy.ravel(index.eval()), numpy.arange(length)).all()
+
+def _tensorfactors(elempoints):
+  '''Return the one-dimensional factors of tensorial points, or ``None``.'''
+
+  if elempoints.ndims == 1:
+    return elempoints,
+  if isinstance(elempoints, points.TensorPoints):
+    factors1 = _tensorfactors(elempoints.points1)
+    factors2 = _tensorfactors(elempoints.points2)
+    if factors1 and factors2:
+      return factors1 + factors2
+
+def _polytables(coeffs, coords):
+  '''Evaluate one-dimensional polynomials and their derivatives in ``coords``.'''
+
+  dcoeffs = coeffs[:,1:] * numpy.arange(1, coeffs.shape[1])
+  return numeric.poly_eval(coeffs[_], coords), numeric.poly_eval(dcoeffs[_], coords)
+
+def _sumfactorize(weights, left, right):
+  '''Contract tensorial quadrature weights with tensor product functions.
+
+  Computes the matrix ``A[i,j] = sum_q weights[q] prod_k left[k][q_k,i_k]
+  right[k][q_k,j_k]``, with ``i`` and ``j`` the raveled multi-indices
+  ``(i_0,..,i_n)`` and ``(j_0,..,j_n)``, by contracting the quadrature one
+  dimension at a time, starting from the last.'''
+
+  ndims = len(left)
+  result = weights
+  for idim in reversed(range(ndims)):
+    result = numpy.tensordot(result, left[idim][:,:,_] * right[idim][:,_,:], axes=[[idim],[0]])
+  # result has axes i_n,j_n,..,i_0,j_0
+  result = result.transpose([2*(ndims-1-idim) for idim in range(ndims)] + [2*(ndims-1-idim)+1 for idim in range(ndims)])
+  n = numpy.prod(result.shape[:ndims], dtype=int)
+  return result.reshape(n, -1)
+
 def _convert(data, inplace=False):
   '''Convert a two-dimensional sparse object to an appropriate object.
 
@@ -47,7 +47,7 @@ class Topology(types.Singleton):
   'topology base class'
 
   __slots__ = 'references', 'transforms', 'opposites', 'ndims'
-  __cache__ = 'border_transforms', 'boundary', 'interfaces'
+  __cache__ = 'border_transforms', 'boundary', 'interfaces', '_bboxgrid'
 
   @types.apply_annotations
   def __init__(self, references:types.strict[References], transforms:transformseq.stricttransforms, opposites:transformseq.stricttransforms):
@@ -181,15 +181,98 @@ class Topology(types.Singleton):
     f = getattr(self, 'basis_' + name)
     return f(*args, **kwargs)
 
-  def sample(self, ischeme, degree):
-    'Create sample.'
+  def sample(self, ischeme, degree, *, conforming=False):
+    '''Create sample.
 
+    Args
+    ----
+    ischeme : :class:`str` or callable
+        Sample scheme, such as ``'gauss'`` or ``'bezier'``.
+    degree : :class:`int`
+        Sample degree.
+    conforming : :class:`bool` (default: False)
+        If true, points that coincide on the interfaces of neighbouring
+        elements share a single index, such that they are evaluated only once
+        and :attr:`~nutils.sample.Sample.tri` forms a connected triangulation.
+        Points on periodic interfaces are not merged, as functions such as the
+        geometry are generally discontinuous across the periodic seam.
+        Only supported for the ``'bezier'`` scheme.
+
+    Returns
+    -------
+    :class:`nutils.sample.Sample`
+    '''
+
+    if conforming and ischeme != 'bezier':
+      raise ValueError('conforming samples require the bezier scheme, got {!r}'.format(ischeme))
     points = PointsSequence.from_iter((ischeme(reference, degree) for reference in self.references), self.ndims) if callable(ischeme) \
         else self.references.getpoints(ischeme, degree)
     transforms = self.transforms,
     if len(self.transforms) == 0 or self.opposites != self.transforms:
       transforms += self.opposites,
-    return Sample.new(transforms, points)
+    return Sample.new(transforms, points, self._conforming_index(points, degree) if conforming else None)
+
+  def _conforming_index(self, points, degree):
+    # Return the concatenated indices for the bezier `points` of all elements,
+    # such that points with equal labels share an index, numbered in order of
+    # appearance.
+    _, first, inverse = numpy.unique(self._conforming_labels(points, degree), return_index=True, return_inverse=True)
+    renumber = numpy.empty(len(first), dtype=int)
+    renumber[numpy.argsort(first)] = numpy.arange(len(first))
+    return renumber[inverse]
+
+  def _conforming_labels(self, points, degree):
+    # Return an integer label for every bezier point that is equal for points
+    # that coincide on interfaces. Every point is keyed by its element and its
+    # quantized local coordinates, as are the bezier points of the interfaces
+    # mapped into the elements on either side. Keys that are tied by an
+    # interface are merged by label propagation, except for interfaces through
+    # a periodic seam, recognized by both sides mapping to distinct
+    # coordinates of the same root.
+    elems = [numpy.repeat(numpy.arange(len(self)), numpy.diff(points.offsets))]
+    coords = [points.coords]
+    if self.ndims and len(self):
+      interfaces = self.interfaces
+      ipoints = interfaces.references.getpoints('bezier', degree)
+      ioffsets = ipoints.offsets
+      seamless = numpy.array([trans[0] != opp[0] or numpy.allclose(transform.apply(trans, ref.centroid), transform.apply(opp, ref.centroid))
+        for trans, opp, ref in zip(interfaces.transforms, interfaces.opposites, interfaces.references)], dtype=bool)
+      for itransforms in interfaces.transforms, interfaces.opposites:
+        ielems, tails = self.transforms.index_with_tail_many(itransforms)
+        groups = {}
+        for i, (tail, p) in enumerate(zip(tails, ipoints)):
+          if tail is not None:
+            groups.setdefault((tail, p), []).append(i)
+        icoords = numpy.zeros((ipoints.npoints, self.ndims))
+        for (tail, p), ii in groups.items():
+          icoords[ioffsets[ii,numpy.newaxis] + numpy.arange(p.npoints)] = transform.apply(tail, p.coords)
+        elems.append(numpy.repeat(ielems, numpy.diff(ioffsets)))
+        coords.append(icoords)
+    elems = numpy.concatenate(elems)
+    scale = 2**20 # quantization of local coordinates, which lie in [0,1]
+    keys = numpy.rint(numpy.clip(numpy.concatenate(coords), 0, 1) * scale).astype(numpy.int64) @ (scale+1)**numpy.arange(self.ndims, dtype=numpy.int64)
+    order = numpy.lexsort([keys, elems])
+    isnew = numpy.ones(len(order), dtype=bool)
+    isnew[1:] = numpy.not_equal(numpy.diff(elems[order]), 0) | numpy.not_equal(numpy.diff(keys[order]), 0)
+    nodes = numpy.empty(len(order), dtype=int)
+    nodes[order] = numpy.cumsum(isnew) - 1
+    flatnodes, anodes, bnodes = numpy.split(nodes, [points.npoints, points.npoints + (len(nodes) - points.npoints) // 2])
+    valid = numpy.greater_equal(elems[points.npoints:], 0).reshape(2, -1).all(axis=0)
+    if self.ndims and len(self):
+      valid &= numpy.repeat(seamless, numpy.diff(ioffsets))
+    anodes = anodes[valid]
+    bnodes = bnodes[valid]
+    labels = numpy.arange(isnew.sum())
+    while True:
+      alabels = labels[anodes]
+      blabels = labels[bnodes]
+      if numpy.equal(alabels, blabels).all():
+        break
+      minlabels = numpy.minimum(alabels, blabels)
+      numpy.minimum.at(labels, anodes, minlabels)
+      numpy.minimum.at(labels, bnodes, minlabels)
+      labels = labels[labels]
+    return labels[flatnodes]
 
   @util.single_or_multiple
   def integrate_elementwise(self, funcs, *, degree, asfunction=False, ischeme='gauss', arguments=None):
@@ -362,33 +445,33 @@ class Topology(types.Singleton):
     if arguments is None:
       arguments = {}
 
-    levelset = levelset.prepare_eval().simplified
-    refs = []
+    offsets = numpy.cumsum([0, *(ref.nvertices_by_level(maxrefine) for ref in self.references)])
     if leveltopo is None:
-      with log.iter.percentage('trimming', self.references, self.transforms, self.opposites) as items:
-        for ref, trans, opp in items:
-          levels = levelset.eval(_transforms=(trans, opp), _points=ref.getpoints('vertex', maxrefine).coords, **arguments)
-          refs.append(ref.trim(levels, maxrefine=maxrefine, ndivisions=ndivisions))
+      levels = self.sample('vertex', maxrefine).eval(levelset, **arguments) if len(self) else numpy.empty(0)
     else:
+      levelset = levelset.prepare_eval().simplified
       log.info('collecting leveltopo elements')
       bins = [set() for ielem in range(len(self))]
-      for trans in leveltopo.transforms:
-        ielem, tail = self.transforms.index_with_tail(trans)
+      ielems, tails = self.transforms.index_with_tail_many(leveltopo.transforms)
+      if numpy.equal(ielems, -1).any():
+        raise ValueError('leveltopo is not a refinement of this topology')
+      for ielem, tail in zip(ielems, tails):
         bins[ielem].add(tail)
+      levels = numpy.empty(offsets[-1])
       fcache = cache.WrapperCache()
-      with log.iter.percentage('trimming', self.references, self.transforms, bins) as items:
-        for ref, trans, ctransforms in items:
-          levels = numpy.empty(ref.nvertices_by_level(maxrefine))
+      with log.iter.percentage('evaluating levelset', self.references, self.transforms, bins, offsets[:-1]) as items:
+        for ref, trans, ctransforms, offset in items:
           cover = list(fcache[ref.vertex_cover](frozenset(ctransforms), maxrefine))
           # confirm cover and greedily optimize order
-          mask = numpy.ones(len(levels), dtype=bool)
+          mask = numpy.ones(ref.nvertices_by_level(maxrefine), dtype=bool)
           while mask.any():
             imax = numpy.argmax([mask[indices].sum() for tail, points, indices in cover])
             tail, points, indices = cover.pop(imax)
-            levels[indices] = levelset.eval(_transforms=(trans + tail,), _points=points, **arguments)
+            levels[offset+indices] = levelset.eval(_transforms=(trans + tail,), _points=points, **arguments)
             mask[indices] = False
-          refs.append(ref.trim(levels, maxrefine=maxrefine, ndivisions=ndivisions))
       log.debug('cache', fcache.stats)
+
+    refs = _trim_elements(self.references, numpy.arange(len(self)), levels, offsets, maxrefine, ndivisions)
     return SubsetTopology(self, refs, newboundary=name)
 
   def subset(self, topo, newboundary=None, strict=False):
@@ -498,6 +581,108 @@ class Topology(types.Singleton):
     selected = types.frozenarray(tuple(i for i, index in enumerate(sample.index) if isactive[index].any()), dtype=int)
     return self[selected]
 
+  @log.withcontext
+  def partition(self, geom, nparts, *, arguments=None):
+    '''Partition the elements by recursive coordinate bisection.
+
+    The element centroids, as computed from ``geom``, are recursively split
+    in two along the direction of largest extent, with the numbers of elements
+    on either side proportional to the numbers of parts that remain to be
+    formed. The resulting parts are balanced to within one element and
+    geometrically compact, which makes them suitable for splitting assembly
+    over several processes, as well as for improving cache locality by
+    processing the parts one after another.
+
+    >>> from . import mesh
+    >>> domain, geom = mesh.rectilinear([4,4])
+    >>> [len(part.topo) for part in domain.partition(geom, 3)]
+    [5, 5, 6]
+
+    Args
+    ----
+    geom : 1-dimensional :class:`nutils.function.Array`
+        Geometry function.
+    nparts : :class:`int`
+        Number of parts, at most the number of elements.
+    arguments : :class:`dict` (default: None)
+        Arguments for function evaluation.
+
+    Returns
+    -------
+    :class:`tuple` of :class:`Partition`
+    '''
+
+    if not 1 <= nparts <= len(self):
+      raise ValueError('cannot partition {} elements into {} parts'.format(len(self), nparts))
+    centroids = self._centroids(geom, arguments)
+    parts = numpy.empty(len(self), dtype=int)
+    stack = [(numpy.arange(len(self)), 0, nparts)]
+    while stack:
+      ielems, ipart, n = stack.pop()
+      if n == 1:
+        parts[ielems] = ipart
+        continue
+      x = centroids[ielems]
+      order = numpy.argsort(x[:,numpy.argmax(x.max(axis=0) - x.min(axis=0))], kind='stable')
+      nleft = n // 2
+      isplit = len(ielems) * nleft // n
+      stack.append((ielems[order[isplit:]], ipart+nleft, n-nleft))
+      stack.append((ielems[order[:isplit]], ipart, nleft))
+    order = numpy.argsort(parts, kind='stable')
+    return tuple(Partition(self, types.frozenarray(ielems, copy=False)) for ielems in numpy.split(order, numpy.cumsum(numpy.bincount(parts, minlength=nparts))[:-1]))
+
+  def reordered(self, geom, *, arguments=None):
+    '''Reorder the elements along a space-filling curve.
+
+    The elements are sorted by the position of their centroids along a
+    Z-order curve, such that consecutive elements are close together. This
+    improves memory locality of evaluation and assembly for topologies of
+    which the element order is arbitrary, such as meshes that are read from
+    file. The reordered topology does not retain boundaries or groups, which
+    remain available through the original topology. Bases should likewise be
+    formed on the original topology; their numbering can be improved via
+    :meth:`nutils.function.Basis.reordered`.
+
+    Args
+    ----
+    geom : 1-dimensional :class:`nutils.function.Array`
+        Geometry function.
+    arguments : :class:`dict` (default: None)
+        Arguments for function evaluation.
+
+    Returns
+    -------
+    :class:`Topology`
+    '''
+
+    if len(self) == 0:
+      return self
+    centroids = self._centroids(geom, arguments)
+    # Quantize the centroids to integers of nbits bits per dimension and
+    # interleave the bits of all dimensions to form the Z-order keys. The
+    # number of dimensions is that of the geometry, which exceeds that of the
+    # topology for embedded manifolds.
+    nbits = 63 // max(centroids.shape[1], 1)
+    lower = centroids.min(axis=0)
+    scale = (2**nbits - 1) / numpy.maximum(centroids.max(axis=0) - lower, numpy.finfo(float).tiny)
+    quantized = ((centroids - lower) * scale).astype(numpy.uint64)
+    keys = numpy.zeros(len(self), dtype=numpy.uint64)
+    for ibit in range(nbits):
+      for idim in range(centroids.shape[1]):
+        keys |= ((quantized[:,idim] >> numpy.uint64(ibit)) & numpy.uint64(1)) << numpy.uint64(ibit * centroids.shape[1] + idim)
+    return self[types.frozenarray(numpy.argsort(keys, kind='stable'), copy=False)]
+
+  def _centroids(self, geom, arguments):
+    '''Return the element centroids as a ``len(self)`` x ``geom.size`` array,
+    approximated by the mean of the first order Gauss points.'''
+
+    geom = function.asarray(geom)
+    if geom.ndim == 0:
+      geom = geom[_]
+    sample = self.sample('gauss', 1)
+    npoints = numpy.array([points.npoints for points in sample.points])
+    return numpy.add.reduceat(sample.eval(geom, **arguments or {}), numpy.cumsum(npoints)-npoints, axis=0) / npoints[:,_]
+
   @log.withcontext
   def locate(self, geom, coords, *, tol, ischeme='vertex', scale=1, eps=0, maxiter=100, arguments=None, weights=None):
     '''Create a sample based on physical coordinates.
@@ -557,53 +742,102 @@ class Topology(types.Singleton):
       coords = coords[...,_]
     if not geom.shape == coords.shape[1:] == (self.ndims,):
       raise Exception('invalid geometry or point shape for {}D topology'.format(self.ndims))
-    bboxsample = self.sample(*element.parse_legacy_ischeme(ischeme))
-    vertices = map(bboxsample.eval(geom, **arguments or {}).__getitem__, map(bboxsample.getindex, range(len(self))))
-    bboxes = numpy.array([numpy.mean(v,axis=0) * (1-scale) + numpy.array([numpy.min(v,axis=0), numpy.max(v,axis=0)]) * scale
-      for v in vertices]) # nelems x {min,max} x ndims
-    vref = element.getsimplex(0)
-    ielems = parallel.shempty(len(coords), dtype=int)
-    xis = parallel.shempty((len(coords),len(geom)), dtype=float)
-    J = function.localgradient(geom, self.ndims)
-    geom_J = function.Tuple((geom, J)).prepare_eval().simplified
-    with parallel.ctxrange('locating', len(coords)) as ipoints:
-      for ipoint in ipoints:
-        coord = coords[ipoint]
-        ielemcandidates, = numpy.logical_and(numpy.greater_equal(coord, bboxes[:,0,:]), numpy.less_equal(coord, bboxes[:,1,:])).all(axis=-1).nonzero()
-        for ielem in sorted(ielemcandidates, key=lambda i: numpy.linalg.norm(bboxes[i].mean(0)-coord)):
-          converged = False
-          ref = self.references[ielem]
-          p = ref.getpoints('gauss', 1)
-          xi = p.coords
-          w = p.weights
-          xi = (numpy.dot(w,xi) / w.sum())[_] if len(xi) > 1 else xi.copy()
-          for iiter in range(maxiter):
-            coord_xi, J_xi = geom_J.eval(_transforms=(self.transforms[ielem], self.opposites[ielem]), _points=xi, **arguments or {})
-            err = numpy.linalg.norm(coord - coord_xi)
-            if err < tol:
-              converged = True
-              break
-            if iiter and err > prev_err:
-              break
-            prev_err = err
-            xi += numpy.linalg.solve(J_xi, coord - coord_xi)
-          if converged and ref.inside(xi[0], eps=eps):
-            ielems[ipoint] = ielem
-            xis[ipoint], = xi
-            break
-        else:
-          raise LocateError('failed to locate point: {}'.format(coord))
+    arguments = types.frozendict[types.strictstr,types.frozenarray](arguments or {})
+    ipoints, icandidates = self._bboxgrid(geom, ischeme, scale, arguments).candidates(coords)
+    ielems = numpy.full(len(coords), -1)
+    xis = parallel.shempty((len(coords),self.ndims), dtype=float)
+    geom_J = self._geom_J(geom)
+    self._locate_candidates(geom_J, coords, ipoints, icandidates, ielems, xis, tol=tol, eps=eps, maxiter=maxiter, arguments=arguments)
+    missing, = numpy.less(ielems, 0).nonzero()
+    if len(missing):
+      raise LocateError('failed to locate point: {}'.format(coords[missing[0]]))
     return self._sample(ielems, xis, weights)
 
+  def _geom_J(self, geom):
+    J = function.localgradient(geom, self.ndims)
+    return function.Tuple((geom, J)).prepare_eval().simplified
+
+  def _locate_candidates(self, geom_J, coords, ipoints, icandidates, ielems, xis, *, xi0=None, tol, eps, maxiter, arguments):
+    '''Try to locate points in candidate elements.
+
+    Points and candidate elements are given as pairs ``ipoints`` and
+    ``icandidates``, sorted by point in order of preference. In every round
+    the first remaining candidate of every point is tried, with all points that
+    share a candidate element solved simultaneously. For points that are
+    found, ``ielems`` and ``xis`` are updated in place; ``xis`` should reside
+    in shared memory. Optional initial coordinates ``xi0`` are given per pair,
+    with NaN values signifying the element's centroid.'''
+
+    while len(ipoints):
+      first = numpy.ones(len(ipoints), dtype=bool)
+      first[1:] = numpy.not_equal(ipoints[1:], ipoints[:-1])
+      trypoints = ipoints[first]
+      tryelems = icandidates[first]
+      tryxi0 = None if xi0 is None else xi0[first]
+      order = numpy.argsort(tryelems, kind='stable')
+      uelems, splits = numpy.unique(tryelems[order], return_index=True)
+      groups = numpy.split(order, splits[1:])
+      found = parallel.shzeros(len(trypoints), dtype=bool)
+      with parallel.ctxrange('locating', len(uelems)) as iuelems:
+        for iuelem in iuelems:
+          w = groups[iuelem]
+          found[w], xis[trypoints[w]] = self._newton(geom_J, uelems[iuelem], coords[trypoints[w]], None if tryxi0 is None else tryxi0[w], tol=tol, eps=eps, maxiter=maxiter, arguments=arguments)
+      ielems[trypoints[found]] = tryelems[found]
+      keep = ~first & numpy.less(ielems[ipoints], 0)
+      ipoints = ipoints[keep]
+      icandidates = icandidates[keep]
+      if xi0 is not None:
+        xi0 = xi0[keep]
+
+  @types.apply_annotations
+  def _bboxgrid(self, geom:function.asarray, ischeme:str, scale:float, arguments:types.frozendict[types.strictstr,types.frozenarray]):
+    bboxsample = self.sample(*element.parse_legacy_ischeme(ischeme))
+    index = numpy.concatenate(bboxsample.index) if len(self) else numpy.zeros(0, dtype=int)
+    vertices = bboxsample.eval(geom, **arguments)[index] # npoints x ndims, in element order
+    offsets = numpy.cumsum([0]+[p.npoints for p in bboxsample.points])[:-1]
+    if len(self):
+      center = numpy.add.reduceat(vertices, offsets) / numpy.diff([*offsets, len(vertices)])[:,_]
+      bboxes = numpy.array([numpy.minimum.reduceat(vertices, offsets), numpy.maximum.reduceat(vertices, offsets)]).swapaxes(0, 1)
+      bboxes = center[:,_] * (1-scale) + bboxes * scale # nelems x {min,max} x ndims
+    else:
+      bboxes = numpy.zeros((0,2,len(geom)))
+    return _BBoxGrid(bboxes)
+
+  def _newton(self, geom_J, ielem, coords, xi=None, *, tol, eps, maxiter, arguments):
+    '''Find the local coordinates of ``coords`` in element ``ielem``.
+
+    Runs a Newton iteration on all points simultaneously, starting from ``xi``
+    or, if absent or NaN, the element's centroid. Returns a boolean mask of points
+    that were found inside the element and the array of local coordinates.'''
+
+    ref = self.references[ielem]
+    p = ref.getpoints('gauss', 1)
+    centroid = numpy.dot(p.weights, p.coords) / p.weights.sum()
+    xi = numpy.repeat(centroid[_], len(coords), axis=0) if xi is None else numpy.where(numpy.isnan(xi), centroid, xi)
+    converged = numpy.zeros(len(coords), dtype=bool)
+    prev_err = numpy.full(len(coords), numpy.inf)
+    active = numpy.arange(len(coords))
+    for iiter in range(maxiter):
+      coord_xi, J_xi = geom_J.eval(_transforms=(self.transforms[ielem], self.opposites[ielem]), _points=xi[active], **arguments)
+      delta = coords[active] - coord_xi
+      err = numpy.linalg.norm(delta, axis=1)
+      converged[active] = err < tol
+      proceed = ~converged[active] & numpy.less_equal(err, prev_err[active]) # stop iterating points that converged or diverge
+      prev_err[active] = err
+      active = active[proceed]
+      if not len(active):
+        break
+      J_xi = numpy.broadcast_to(J_xi, (len(proceed), self.ndims, self.ndims))[proceed]
+      xi[active] += numpy.linalg.solve(J_xi, delta[proceed][...,_])[...,0]
+    found = numpy.array([c and ref.inside(x, eps=eps) for c, x in zip(converged, xi)], dtype=bool)
+    return found, xi
+
   def _sample(self, ielems, coords, weights=None):
-    uielems = numpy.unique(ielems)
-    points_ = []
-    index = []
-    for ielem in uielems:
-      w, = numpy.equal(ielems, ielem).nonzero()
-      points_.append(points.CoordsPoints(coords[w]) if weights is None
-                else points.CoordsWeightsPoints(coords[w], weights[w]))
-      index.append(w)
+    order = numpy.argsort(ielems, kind='stable')
+    uielems, splits = numpy.unique(ielems[order], return_index=True)
+    index = numpy.split(order, splits[1:]) if len(order) else []
+    points_ = [points.CoordsPoints(coords[w]) if weights is None
+          else points.CoordsWeightsPoints(coords[w], weights[w]) for w in index]
     transforms = self.transforms[uielems],
     if len(self.transforms) == 0 or self.opposites != self.transforms:
       transforms += self.opposites[uielems],
@@ -636,64 +870,109 @@ class Topology(types.Singleton):
       The boundary of this topology.
     '''
 
-    references = []
-    selection = []
-    iglobaledgeiter = itertools.count()
-    refs_touched = False
-    for ielem, (ioppelems, elemref, elemtrans) in enumerate(zip(self.connectivity, self.references, self.transforms)):
-      for (edgetrans, edgeref), ioppelem, iglobaledge in zip(elemref.edges, ioppelems, iglobaledgeiter):
-        if edgeref:
-          if ioppelem == -1:
-            references.append(edgeref)
-            selection.append(iglobaledge)
-          else:
-            ioppedge = self.connectivity[ioppelem].index(ielem)
-            ref = edgeref - self.references[ioppelem].edge_refs[ioppedge]
-            if ref:
-              references.append(ref)
-              selection.append(iglobaledge)
-              refs_touched = True
-    selection = types.frozenarray(selection, int)
-    if refs_touched:
-      references = References.from_iter(references, self.ndims-1)
+    ielems, ioppelems, ioppedges, iedgerefs, edgerefs = self._connected_edges()
+    nonempty = numpy.array([bool(ref) for ref in edgerefs], dtype=bool)[iedgerefs]
+    # Edges without an opposite are boundary edges, and edges with an opposite
+    # of the same reference are not. Only the remaining edges, which occur in
+    # trimmed topologies, require reference arithmetic.
+    hasopp = numpy.not_equal(ioppelems, -1)
+    selection, = numpy.where(nonempty & ~hasopp)
+    touched = {}
+    for iedge in numpy.where(nonempty & hasopp & numpy.not_equal(iedgerefs, iedgerefs[ioppedges]))[0]:
+      ref = edgerefs[iedgerefs[iedge]] - edgerefs[iedgerefs[ioppedges[iedge]]]
+      if ref:
+        touched[iedge] = ref
+    if touched:
+      selection = numpy.union1d(selection, numpy.fromiter(touched, dtype=int, count=len(touched)))
+      references = References.from_iter([touched.get(iedge) or edgerefs[iedgerefs[iedge]] for iedge in selection], self.ndims-1)
     else:
       references = self.references.edges[selection]
+    selection = types.frozenarray(selection, int)
     transforms = self.transforms.edges(self.references)[selection]
     return Topology(references, transforms, transforms)
 
   @property
   @log.withcontext
   def interfaces(self):
-    references = []
-    selection = []
-    oppselection = []
-    iglobaledgeiter = itertools.count()
-    refs_touched = False
+    ielems, ioppelems, ioppedges, iedgerefs, edgerefs = self._connected_edges()
+    nonempty = numpy.array([bool(ref) for ref in edgerefs], dtype=bool)[iedgerefs]
+    selection, = numpy.where(nonempty & numpy.greater(ioppelems, -1) & numpy.less(ioppelems, ielems))
+    oppselection = ioppedges[selection]
+    # Interfaces between edges of the same reference are taken as-is. Only
+    # the remaining pairs, which occur in trimmed topologies, require
+    # reference arithmetic.
+    touched = {}
+    keep = numpy.ones(len(selection), dtype=bool)
+    for i in numpy.where(numpy.not_equal(iedgerefs[selection], iedgerefs[oppselection]))[0]:
+      edgeref = edgerefs[iedgerefs[selection[i]]]
+      oppedgeref = edgerefs[iedgerefs[oppselection[i]]]
+      ref = oppedgeref and edgeref & oppedgeref
+      if not ref:
+        keep[i] = False
+      elif ref != edgeref:
+        touched[i] = ref
+    if not keep.all():
+      selection = selection[keep]
+      oppselection = oppselection[keep]
+      renumber = numpy.cumsum(keep) - 1
+      touched = {renumber[i]: ref for i, ref in touched.items()}
+    if touched:
+      references = References.from_iter([touched.get(i) or edgerefs[iedgerefs[iedge]] for i, iedge in enumerate(selection)], self.ndims-1)
+    else:
+      references = self.references.edges[selection]
     edges = self.transforms.edges(self.references)
-    if self.references.isuniform:
-      _nedges = self.references[0].nedges
-      offset = lambda ielem: ielem * _nedges
+    return Topology(references, edges[types.frozenarray(selection, int)], edges[types.frozenarray(oppselection, int)])
+
+  def _connected_edges(self):
+    '''Edges of all elements, flattened, with their opposites.
+
+    Returns
+    -------
+    ielems : :class:`numpy.ndarray` of :class:`int`\\s
+        The element index per edge.
+    ioppelems : :class:`numpy.ndarray` of :class:`int`\\s
+        The opposing element index per edge, or ``-1`` if there is none.
+    ioppedges : :class:`numpy.ndarray` of :class:`int`\\s
+        The flat index of the opposing edge per edge, or ``-1`` if there is
+        none.
+    iedgerefs : :class:`numpy.ndarray` of :class:`int`\\s
+        The index in ``edgerefs`` of the edge reference per edge.
+    edgerefs : :class:`list` of :class:`nutils.element.Reference`\\s
+        The unique edge references.
+    '''
+
+    connectivity = self.connectivity
+    if isinstance(connectivity, (numpy.ndarray, types.frozenarray)) and connectivity.ndim == 2:
+      nedges = numpy.full(len(connectivity), connectivity.shape[1])
+      ioppelems = numpy.asarray(connectivity).ravel()
     else:
-      offset = numpy.cumsum([0]+list(ref.nedges for ref in self.references)).__getitem__
-    for ielem, (ioppelems, elemref, elemtrans) in enumerate(zip(self.connectivity, self.references, self.transforms)):
-      for (edgetrans, edgeref), ioppelem, iglobaledge in zip(elemref.edges, ioppelems, iglobaledgeiter):
-        if edgeref and -1 < ioppelem < ielem:
-          ioppedge = self.connectivity[ioppelem].index(ielem)
-          oppedgetrans, oppedgeref = self.references[ioppelem].edges[ioppedge]
-          ref = oppedgeref and edgeref & oppedgeref
-          if ref:
-            references.append(ref)
-            selection.append(iglobaledge)
-            oppselection.append(offset(ioppelem)+ioppedge)
-            if ref != edgeref:
-              refs_touched = True
-    selection = types.frozenarray(selection, int)
-    oppselection = types.frozenarray(oppselection, int)
-    if refs_touched:
-      references = References.from_iter(references, self.ndims-1)
+      nedges = numpy.array([len(ioppelems) for ioppelems in connectivity], dtype=int)
+      ioppelems = numpy.concatenate([numpy.zeros(0, dtype=int), *connectivity]).astype(int)
+    offsets = numpy.concatenate([[0], numpy.cumsum(nedges)])
+    ielems = numpy.repeat(numpy.arange(len(nedges)), nedges)
+    # The opposing edge is the first edge of the opposing element that refers
+    # back, which is found by sorting the edges by element pair.
+    hasopp, = numpy.where(numpy.greater_equal(ioppelems, 0))
+    pairs = ielems[hasopp] * len(nedges) + ioppelems[hasopp]
+    order = numpy.argsort(pairs, kind='stable')
+    index = numpy.searchsorted(pairs, ioppelems[hasopp] * len(nedges) + ielems[hasopp], sorter=order)
+    if numpy.greater_equal(index, len(pairs)).any() or numpy.not_equal(pairs[order[numpy.minimum(index, len(pairs)-1)]], ioppelems[hasopp] * len(nedges) + ielems[hasopp]).any():
+      raise ValueError('connectivity is not symmetric')
+    ioppedges = numpy.full(len(ioppelems), -1)
+    ioppedges[hasopp] = hasopp[order[index]]
+    # Edge references are numbered per unique element reference.
+    if self.references.isuniform:
+      refs = [self.references[0]] if len(self) else []
+      irefs = numpy.zeros(len(self), dtype=int)
     else:
-      references = self.references.edges[selection]
-    return Topology(references, edges[selection], edges[oppselection])
+      unique = {}
+      irefs = numpy.array([unique.setdefault(ref, len(unique)) for ref in self.references], dtype=int)
+      refs = list(unique)
+    edgerefs = {}
+    refedges = [numpy.array([edgerefs.setdefault(edgeref, len(edgerefs)) for edgeref in ref.edge_refs], dtype=int) for ref in refs]
+    refoffsets = numpy.concatenate([[0], numpy.cumsum([len(iedgerefs) for iedgerefs in refedges])])
+    iedgerefs = numpy.concatenate([numpy.zeros(0, dtype=int), *refedges])[refoffsets[irefs][ielems] + numpy.arange(len(ielems)) - offsets[ielems]]
+    return ielems, ioppelems, ioppedges, iedgerefs, list(edgerefs)
 
   def basis_spline(self, degree):
     assert degree == 1
@@ -762,6 +1041,269 @@ stricttopology = types.strict[Topology]
 class LocateError(Exception):
   pass
 
+class _BBoxGrid(types.Singleton):
+  '''Uniform grid index over element bounding boxes.
+
+  The grid partitions the union of all bounding boxes in cells of roughly the
+  average element size, and stores for every cell the elements whose bounding
+  boxes intersect it in compressed row format. This reduces the search for
+  candidate elements of a point from a test against all bounding boxes to a
+  test against the few bounding boxes associated with its cell.
+
+  Args
+  ----
+  bboxes : :class:`float` array
+      Bounding boxes of shape ``nelems x 2 x ndims``, where the second axis
+      holds the minimum and maximum coordinates, respectively.
+  '''
+
+  __slots__ = 'bboxes', 'lower', 'upper', 'spacing', 'shape', 'offsets', 'ielems'
+
+  @types.apply_annotations
+  def __init__(self, bboxes:types.frozenarray[float]):
+    nelems, _two, ndims = bboxes.shape
+    self.bboxes = bboxes
+    self.lower = bboxes[:,0].min(axis=0) if nelems else numpy.zeros(ndims)
+    self.upper = bboxes[:,1].max(axis=0) if nelems else numpy.zeros(ndims)
+    extent = self.upper - self.lower
+    size = (bboxes[:,1] - bboxes[:,0]).mean(axis=0) if nelems else extent
+    shape = numpy.ones(ndims, dtype=int)
+    valid = numpy.greater(size, 0) & numpy.greater(extent, 0)
+    shape[valid] = numpy.ceil(extent[valid] / size[valid])
+    ncells = numpy.prod(shape, dtype=float)
+    if ncells > 4 * nelems: # limit memory for strongly anisotropic elements
+      shape = numpy.maximum((shape * (4 * nelems / ncells)**(1/ndims)).astype(int), 1)
+    self.shape = tuple(shape.tolist())
+    self.spacing = numpy.where(valid, extent / shape, 1)
+    lo = self._cellindex(bboxes[:,0])
+    hi = self._cellindex(bboxes[:,1]) + 1
+    ncovered = numpy.prod(hi - lo, axis=1)
+    ielems = numpy.arange(nelems).repeat(ncovered)
+    ilocal = numeric.ranges(numpy.zeros_like(ncovered), ncovered) # flat index in the cells covered by ielems
+    cellindex = numpy.empty((len(ielems), ndims), dtype=int)
+    for idim in reversed(range(ndims)):
+      ilocal, cellindex[:,idim] = divmod(ilocal, (hi - lo)[ielems,idim])
+    icells = numpy.ravel_multi_index((lo[ielems] + cellindex).T, self.shape)
+    order = numpy.argsort(icells, kind='stable')
+    self.ielems = types.frozenarray(ielems[order], copy=False)
+    self.offsets = types.frozenarray(numpy.cumsum([0, *numpy.bincount(icells, minlength=numpy.prod(self.shape))]), copy=False)
+    super().__init__()
+
+  def _cellindex(self, coords):
+    index = numpy.floor((coords - self.lower) / self.spacing).astype(int)
+    return numpy.minimum(numpy.maximum(index, 0), numpy.array(self.shape)-1)
+
+  def candidates(self, coords):
+    '''Find elements of which the bounding box contains a point.
+
+    Returns a pair of integer arrays of equal length, holding point indices
+    and element indices, respectively. Pairs are sorted by point, and for every
+    point by increasing distance to the bounding box center.'''
+
+    inside = numpy.greater_equal(coords, self.lower).all(axis=1) & numpy.less_equal(coords, self.upper).all(axis=1)
+    ipoints, = inside.nonzero()
+    icells = numpy.ravel_multi_index(self._cellindex(coords[ipoints]).T, self.shape)
+    starts = numpy.take(self.offsets, icells)
+    stops = numpy.take(self.offsets, icells+1)
+    ipoints = ipoints.repeat(stops - starts)
+    ielems = numpy.take(self.ielems, numeric.ranges(starts, stops))
+    index = self.select(coords, ipoints, ielems)
+    return ipoints[index], ielems[index]
+
+  def contains(self, coords, ielems):
+    '''Test if the bounding boxes of ``ielems`` contain ``coords``.'''
+
+    bboxes = numpy.take(self.bboxes, ielems, axis=0)
+    return numpy.greater_equal(coords, bboxes[:,0]).all(axis=1) & numpy.less_equal(coords, bboxes[:,1]).all(axis=1)
+
+  def select(self, coords, ipoints, ielems, rank=None):
+    '''Select and sort pairs of points and elements.
+
+    Returns the indices of pairs of point indices ``ipoints`` and element
+    indices ``ielems`` for which the bounding box contains the point, sorted by
+    point, by the optional ``rank``, and by increasing distance to the
+    bounding box center.'''
+
+    index, = self.contains(coords[ipoints], ielems).nonzero()
+    dist = numpy.linalg.norm(numpy.take(self.bboxes, ielems[index], axis=0).mean(axis=1) - coords[ipoints[index]], axis=1)
+    order = numpy.lexsort([dist, ipoints[index]] if rank is None else [dist, rank[index], ipoints[index]])
+    return index[order]
+
+class Partition:
+  '''Part of a partitioned topology.
+
+  A partition, as formed by :func:`Topology.partition`, combines a subset of
+  the elements of a topology with the means to assemble on it independently
+  of other partitions. Functions are evaluated on the subtopology
+  :attr:`topo` as they are on the full topology. Bases can be restricted to
+  the functions that are supported on the partition using :meth:`localize`,
+  such that the partition's contributions to vectors and matrices can be
+  assembled locally and scattered into the global system afterwards.
+
+  >>> from . import mesh
+  >>> domain, geom = mesh.rectilinear([4,4])
+  >>> basis = domain.basis('std', degree=1)
+  >>> part = domain.partition(geom, 2)[0]
+  >>> dofs, localbasis = part.localize(basis)
+  >>> res = numpy.zeros(len(basis))
+  >>> res[dofs] += part.topo.integrate(localbasis, degree=2)
+
+  Args
+  ----
+  topo : :class:`Topology`
+      The partitioned topology.
+  ielems : :class:`int` array
+      Sorted indices of the elements of ``topo`` that form the partition.
+
+  Attributes
+  ----------
+  topo : :class:`Topology`
+      Subtopology formed by the elements of the partition.
+  ielems : :class:`nutils.types.frozenarray`
+      Sorted indices of the elements in the partitioned topology.
+  '''
+
+  def __init__(self, topo, ielems):
+    self.topo = topo[ielems]
+    self.ielems = ielems
+
+  def localize(self, basis):
+    '''Restrict a basis to the functions that are supported on the partition.
+
+    Args
+    ----
+    basis : :class:`nutils.function.Basis`
+        Basis defined on the partitioned topology.
+
+    Returns
+    -------
+    dofs : :class:`nutils.types.frozenarray`
+        Local-to-global dof map: the sorted global indices of the basis
+        functions that are supported on the partition.
+    localbasis : :class:`nutils.function.Array`
+        The selected basis functions, numbered locally.
+    '''
+
+    dofs = types.frozenarray(basis.get_dofs(self.ielems), copy=False)
+    return dofs, function.take(basis, dofs, axis=0)
+
+class Locator:
+  '''Point locator for repeated searches.
+
+  The locator offers the functionality of :func:`Topology.locate` for
+  applications that locate a moving set of points many times, such as probes
+  or particles in a transient simulation. The bounding box index is built
+  once, and every search starts from the elements and local coordinates in
+  which the points were found the last time. Points that have left their
+  element are searched for first in the neighbouring elements, if the topology
+  provides connectivity, and finally in all candidate elements as in
+  :func:`Topology.locate`. Points are matched to those of the previous search
+  by index, provided that their number did not change.
+
+  >>> from . import mesh
+  >>> domain, geom = mesh.unitsquare(nelems=3, etype='mixed')
+  >>> locator = Locator(domain, geom, tol=1e-12)
+  >>> sample = locator.locate([[.9, .4]])
+  >>> sample.eval(geom).tolist()
+  [[0.9, 0.4]]
+
+  Args
+  ----
+  topo : :class:`Topology`
+      Topology to locate points in.
+  geom : 1-dimensional :class:`nutils.function.Array`
+      Geometry function of length ``ndims``.
+  tol : :class:`float`
+      Maximum allowed distance between original and located coordinate.
+  ischeme : :class:`str` (default: "vertex")
+      Sample points used to determine bounding boxes.
+  scale : :class:`float` (default: 1)
+      Bounding box amplification factor.
+  eps : :class:`float` (default: 0)
+      Epsilon radius around element within which a point is considered to be
+      inside.
+  maxiter : :class:`int` (default: 100)
+      Maximum allowed number of Newton iterations.
+  arguments : :class:`dict` (default: None)
+      Arguments for function evaluation.
+  '''
+
+  def __init__(self, topo, geom, *, tol, ischeme='vertex', scale=1, eps=0, maxiter=100, arguments=None):
+    geom = function.asarray(geom)
+    self._isscalar = geom.ndim == 0
+    if self._isscalar:
+      geom = geom[_]
+    if geom.shape != (topo.ndims,):
+      raise Exception('invalid geometry shape for {}D topology'.format(topo.ndims))
+    self.topo = topo
+    self.geom = geom
+    arguments = types.frozendict[types.strictstr,types.frozenarray](arguments or {})
+    self._grid = topo._bboxgrid(geom, ischeme, scale, arguments)
+    self._geom_J = topo._geom_J(geom)
+    self._kwargs = dict(tol=tol, eps=eps, maxiter=maxiter, arguments=arguments)
+    self._ielems = None
+    self._xis = None
+
+  def locate(self, coords, *, weights=None):
+    '''Create a sample based on physical coordinates.
+
+    Args
+    ----
+    coords : 2-dimensional :class:`float` array
+        Array of coordinates with ``ndims`` columns.
+    weights : :class:`float` array (default: None)
+        Optional weights, in case ``coords`` are quadrature points.
+
+    Returns
+    -------
+    located : :class:`nutils.sample.Sample`
+    '''
+
+    coords = numpy.asarray(coords, dtype=float)
+    if self._isscalar:
+      coords = coords[...,_]
+    if coords.shape[1:] != (self.topo.ndims,):
+      raise Exception('invalid point shape for {}D topology'.format(self.topo.ndims))
+    ielems = numpy.full(len(coords), -1)
+    xis = parallel.shempty((len(coords),self.topo.ndims), dtype=float)
+    if self._ielems is not None and len(self._ielems) == len(coords):
+      # Candidates are ranked such that the previous element is tried first,
+      # starting from the previous local coordinates, followed by neighbouring
+      # elements and finally all other elements.
+      ipoints = numpy.arange(len(coords))
+      nbpoints, nbelems = self._neighbours(ipoints, self._ielems)
+      gpoints, gelems = self._grid.candidates(coords)
+      ipoints = numpy.concatenate([ipoints, nbpoints, gpoints])
+      icandidates = numpy.concatenate([self._ielems, nbelems, gelems])
+      rank = numpy.repeat([0, 1, 2], [len(coords), len(nbpoints), len(gpoints)])
+      xi0 = numpy.full((len(ipoints), self.topo.ndims), numpy.nan)
+      xi0[:len(coords)] = self._xis
+      keep = numpy.unique(ipoints[len(coords):] * len(self.topo) + icandidates[len(coords):], return_index=True)[1] + len(coords) # remove duplicates, favouring neighbours
+      keep = numpy.concatenate([numpy.arange(len(coords)), keep]) # a failed warm start is followed by a retry from the centroid
+      index = keep[self._grid.select(coords, ipoints[keep], icandidates[keep], rank=rank[keep])]
+      self.topo._locate_candidates(self._geom_J, coords, ipoints[index], icandidates[index], ielems, xis, xi0=xi0[index], **self._kwargs)
+    else:
+      ipoints, icandidates = self._grid.candidates(coords)
+      self.topo._locate_candidates(self._geom_J, coords, ipoints, icandidates, ielems, xis, **self._kwargs)
+    missing, = numpy.less(ielems, 0).nonzero()
+    if len(missing):
+      raise LocateError('failed to locate point: {}'.format(coords[missing[0]]))
+    self._ielems = ielems
+    self._xis = numpy.array(xis)
+    return self.topo._sample(ielems, xis, weights)
+
+  def _neighbours(self, ipoints, iprev):
+    try:
+      connectivity = self.topo.connectivity
+    except AttributeError:
+      return numpy.zeros((2,0), dtype=int)
+    uprev, inverse = numpy.unique(iprev, return_inverse=True)
+    neighbours = [numpy.unique(connectivity[i]) for i in uprev]
+    neighbours = [n[n >= 0] for n in neighbours]
+    counts = numpy.array([len(n) for n in neighbours], dtype=int)
+    icandidates = numpy.concatenate([neighbours[i] for i in inverse]) if len(inverse) else numpy.zeros(0, dtype=int)
+    return ipoints.repeat(counts[inverse]), icandidates
+
 class WithGroupsTopology(Topology):
   'item topology'
 
@@ -959,6 +1501,20 @@ class StructuredTopology(Topology):
     dimaxes = (axis for axis in self.axes if axis.isdim)
     return tuple(idim for idim, axis in enumerate(dimaxes) if axis.isdim and axis.isperiodic)
 
+  def _conforming_labels(self, points, degree):
+    # The bezier points of all elements form a structured lattice with
+    # `degree-1` intervals per element in every direction. The lattice is not
+    # wrapped in periodic directions, such that points on the periodic seam
+    # remain distinct.
+    if degree < 2 or not self.ndims:
+      return super()._conforming_labels(points, degree)
+    n = degree - 1
+    elemcoords = numpy.unravel_index(numpy.arange(len(self)), self.shape)
+    pointcoords = numpy.unravel_index(numpy.arange(degree**self.ndims), (degree,)*self.ndims)
+    latticeshape = [nelems*n + 1 for nelems in self.shape]
+    latticecoords = [ielems[:,numpy.newaxis]*n + ipoints for ielems, ipoints in zip(elemcoords, pointcoords)]
+    return numpy.ravel_multi_index(latticecoords, latticeshape).ravel()
+
   @property
   def connectivity(self):
     connectivity = numpy.empty(self.shape+(self.ndims,2), dtype=int)
@@ -1420,14 +1976,35 @@ class UnionTopology(Topology):
     ndims = self._topos[0].ndims
     assert all(topo.ndims == ndims for topo in self._topos)
 
-    references = []
-    selections = [[] for topo in topos]
-    for trans, indices in util.gather((trans, (itopo, itrans)) for itopo, topo in enumerate(self._topos) for itrans, trans in enumerate(topo.transforms)):
-      itopo0, itrans0 = indices[0]
-      selections[itopo0].append(itrans0)
-      if len(indices) == 1:
-        references.append(self._topos[itopo0].references[itrans0])
-      else:
+    # Elements are identified by integer keys: their indices in a common base
+    # topology if all topologies share one, otherwise by hashing transforms.
+    bases = [topo.basetopo if isinstance(topo, SubsetTopology) else topo for topo in self._topos]
+    if all(base == bases[0] for base in bases[1:]):
+      keys = [topo._indices if isinstance(topo, SubsetTopology) else numpy.arange(len(topo)) for topo in self._topos]
+    else:
+      ids = {}
+      keys = [numpy.fromiter((ids.setdefault(trans, len(ids)) for trans in topo.transforms), dtype=int, count=len(topo)) for topo in self._topos]
+    offsets = numpy.cumsum([0, *map(len, self._topos)])
+    keys = numpy.concatenate([numpy.empty(0, dtype=int), *keys])
+    ukeys, first, inverse, counts = numpy.unique(keys, return_index=True, return_inverse=True, return_counts=True)
+
+    # Every element is taken from the first topology that contains it.
+    keep = numpy.zeros(len(keys), dtype=bool)
+    keep[first] = True
+    selections = tuple(types.frozenarray(keep[start:stop].nonzero()[0], copy=False) for start, stop in zip(offsets[:-1], offsets[1:]))
+    references = References.empty(ndims)
+    for topo, selection in zip(self._topos, selections):
+      references = references.chain(topo.references.take(selection))
+
+    # Only elements that occur more than once require a union of references.
+    overlap, = numpy.greater(counts, 1)[inverse].nonzero()
+    if len(overlap):
+      overlap = overlap[numpy.argsort(inverse[overlap], kind='stable')]
+      renumber = numpy.cumsum(keep) - 1
+      references = list(references)
+      for group in numpy.split(overlap, numpy.cumsum(counts[counts > 1])[:-1]):
+        itopos = numpy.searchsorted(offsets, group, side='right') - 1
+        indices = tuple(zip(itopos.tolist(), (group - offsets[itopos]).tolist()))
         refs = [self._topos[itopo].references[itrans] for itopo, itrans in indices]
         while len(refs) > 1: # sweep all possible unions until a single reference is left
           nrefs = len(refs)
@@ -1444,12 +2021,12 @@ class UnionTopology(Topology):
                 break
             iref += 1
           assert len(refs) < nrefs, 'incompatible elements in union'
-        references.append(refs[0])
+        references[renumber[group[0]]] = refs[0]
         assert len(set(self._topos[itopo].opposites[itrans] for itopo, itrans in indices)) == 1
-    selections = tuple(map(types.frozenarray[int], selections))
+      references = References.from_iter(references, ndims)
 
     super().__init__(
-      References.from_iter(references, ndims),
+      references,
       transformseq.chain((topo.transforms[selection] for topo, selection in zip(topos, selections)), ndims),
       transformseq.chain((topo.opposites[selection] for topo, selection in zip(topos, selections)), ndims))
 
@@ -1521,6 +2098,60 @@ class SubsetTopology(Topology):
   def getitem(self, item):
     return self.basetopo.getitem(item).subset(self, strict=False)
 
+  def retrim(self, levelset, maxrefine, ndivisions=8, *, arguments=None):
+    '''Trim the base topology along a levelset that moved since the last trim.
+
+    Rather than trimming all elements of the base topology, the levelset is
+    evaluated only in elements that were cut by the previous levelset, and
+    subsequently in neighbours of elements that are cut by or changed sides of
+    the new levelset, until no further changes are found. All other elements
+    retain their references. This makes the cost of retrimming scale with the
+    size of the interface rather than that of the mesh, under the assumption
+    that the interface moves continuously: interfaces that emerge away from
+    the previous interface are not found.
+
+    Args
+    ----
+    levelset : :class:`nutils.function.Array`
+        The new levelset. The positive part is retained.
+    maxrefine : :class:`int`
+        The number of refinements used for the trimming, which should match
+        the value used to create this topology.
+    ndivisions : :class:`int` (default: 8)
+        The number of bisections used to locate the cut along element edges.
+    arguments : :class:`dict` (default: None)
+        Optional arguments for function evaluation.
+
+    Returns
+    -------
+    :class:`SubsetTopology`
+        The trimmed base topology.
+    '''
+
+    if arguments is None:
+      arguments = {}
+
+    baserefs = self.basetopo.references
+    connectivity = self.basetopo.connectivity
+    state = numpy.array([1 if ref == baseref else -1 if not ref else 0 for ref, baseref in zip(self.refs, baserefs)], dtype=int) # kept, dropped or cut
+    refs = list(self.refs)
+    visited = numpy.zeros(len(refs), dtype=bool)
+    front = numpy.equal(state, 0).nonzero()[0]
+    while len(front):
+      visited[front] = True
+      references = baserefs.take(front)
+      offsets = numpy.cumsum([0, *(ref.nvertices_by_level(maxrefine) for ref in references)])
+      levels = Topology(references, self.basetopo.transforms[front], self.basetopo.opposites[front]).sample('vertex', maxrefine).eval(levelset, **arguments)
+      for ielem, ref in zip(front, _trim_elements(baserefs, front, levels, offsets, maxrefine, ndivisions)):
+        refs[ielem] = ref
+      newstate = numpy.where(numpy.greater_equal(numpy.minimum.reduceat(levels, offsets[:-1]), 0), 1,
+        numpy.where(numpy.less_equal(numpy.maximum.reduceat(levels, offsets[:-1]), 0), -1, 0))
+      spread = front[numpy.equal(newstate, 0) | numpy.not_equal(newstate, state[front])]
+      neighbours = numpy.unique(numpy.concatenate([numpy.empty(0, dtype=int), *(connectivity[ielem] for ielem in spread)]).astype(int))
+      neighbours = neighbours[numpy.greater_equal(neighbours, 0)]
+      front = neighbours[~visited[neighbours]]
+    return SubsetTopology(self.basetopo, refs, newboundary=self.newboundary if isinstance(self.newboundary, str) else 'trimmed')
+
   def __rsub__(self, other):
     if self.basetopo == other:
       refs = [baseref - ref for baseref, ref in zip(self.basetopo.references, self.refs)]
@@ -1703,20 +2334,16 @@ class HierarchicalTopology(Topology):
     itemtopo = self.basetopo.getitem(item)
     itemindices_per_level = []
     for baseindices, baselevel, itemlevel in zip(self._indices_per_level, self.basetopo.refine_iter, itemtopo.refine_iter):
-      itemindices = []
-      itemindex = itemlevel.transforms.index
-      for basetrans in map(baselevel.transforms.__getitem__, baseindices):
-        try:
-          itemindices.append(itemindex(basetrans))
-        except ValueError:
-          pass
-      itemindices_per_level.append(numpy.unique(numpy.array(itemindices, dtype=int)))
+      itemindices, tails = itemlevel.transforms.index_with_tail_many(list(map(baselevel.transforms.__getitem__, baseindices)))
+      itemindices_per_level.append(numpy.unique(itemindices[[tail == () for tail in tails]]))
     return HierarchicalTopology(itemtopo, itemindices_per_level)
 
   def refined_by(self, refine):
     refine = tuple(refine)
     if not all(map(numeric.isint, refine)):
-      refine = tuple(self.transforms.index_with_tail(item)[0] for item in refine)
+      refine, tails = self.transforms.index_with_tail_many(refine)
+      if numpy.equal(refine, -1).any():
+        raise ValueError('element not in topology')
     refine = numpy.unique(numpy.array(refine, dtype=int))
     splits = numpy.searchsorted(refine, self._offsets, side='left')
     indices_per_level = list(map(list, self._indices_per_level))+[[]]
@@ -1724,10 +2351,7 @@ class HierarchicalTopology(Topology):
     for ilevel, (start, stop) in enumerate(zip(splits[:-1], splits[1:])):
       coarse, fine = fine, fine.refined
       coarse_indices = tuple(map(indices_per_level[ilevel].pop, reversed(refine[start:stop]-self._offsets[ilevel])))
-      coarse_transforms = map(coarse.transforms.__getitem__, coarse_indices)
-      coarse_references = map(coarse.references.__getitem__, coarse_indices)
-      fine_transforms = (trans+(ctrans,) for trans, ref in zip(coarse_transforms, coarse_references) for ctrans, cref in ref.children if cref)
-      indices_per_level[ilevel+1].extend(map(fine.transforms.index, fine_transforms))
+      indices_per_level[ilevel+1].extend(self._refined_indices(coarse, fine, coarse_indices))
     if not indices_per_level[-1]:
       indices_per_level.pop(-1)
     return HierarchicalTopology(self.basetopo, ([numpy.unique(numpy.array(i, dtype=int)) for i in indices_per_level]))
@@ -1738,12 +2362,20 @@ class HierarchicalTopology(Topology):
     fine = self.basetopo
     for coarse_indices in self._indices_per_level:
       coarse, fine = fine, fine.refined
-      coarse_transforms = map(coarse.transforms.__getitem__, coarse_indices)
-      coarse_references = map(coarse.references.__getitem__, coarse_indices)
-      fine_transforms = (trans+(ctrans,) for trans, ref in zip(coarse_transforms, coarse_references) for ctrans, cref in ref.children if cref)
-      refined_indices_per_level.append(numpy.unique(numpy.fromiter(map(fine.transforms.index, fine_transforms), dtype=int)))
+      refined_indices_per_level.append(numpy.unique(self._refined_indices(coarse, fine, coarse_indices)))
     return HierarchicalTopology(self.basetopo, refined_indices_per_level)
 
+  @staticmethod
+  def _refined_indices(coarse, fine, coarse_indices):
+    # Indices in `fine` of the nonempty children of elements `coarse_indices`.
+    coarse_transforms = map(coarse.transforms.__getitem__, coarse_indices)
+    coarse_references = map(coarse.references.__getitem__, coarse_indices)
+    fine_transforms = [trans+(ctrans,) for trans, ref in zip(coarse_transforms, coarse_references) for ctrans, cref in ref.children if cref]
+    fine_indices, tails = fine.transforms.index_with_tail_many(fine_transforms)
+    if any(tail != () for tail in tails):
+      raise ValueError('refined element not in refined topology')
+    return fine_indices
+
   @property
   @log.withcontext
   def boundary(self):
@@ -1752,17 +2384,9 @@ class HierarchicalTopology(Topology):
     basebtopo = self.basetopo.boundary
     bindices_per_level = []
     for indices, level, blevel in zip(self._indices_per_level, self.basetopo.refine_iter, basebtopo.refine_iter):
-      bindex = blevel.transforms.index
-      bindices = []
-      for index in indices:
-        for etrans, eref in level.references[index].edges:
-          if eref:
-            trans = level.transforms[index]+(etrans,)
-            try:
-              bindices.append(bindex(trans))
-            except ValueError:
-              pass
-      bindices = numpy.array(bindices, dtype=int)
+      btransforms = [level.transforms[index]+(etrans,) for index in indices for etrans, eref in level.references[index].edges if eref]
+      bindices, tails = blevel.transforms.index_with_tail_many(btransforms)
+      bindices = bindices[[tail == () for tail in tails]]
       if len(bindices) > 1:
         bindices.sort()
         assert not numpy.equal(bindices[1:], bindices[:-1]).any()
@@ -1860,10 +2484,10 @@ class HierarchicalTopology(Topology):
     with log.iter.fraction('level', self.levels[::-1], self._indices_per_level[::-1]) as items:
       for topo, touchielems_i in items:
 
-        topo_index_with_tail = topo.transforms.index_with_tail
-        mapped_prev_ielems = [topo_index_with_tail(prev_transforms[j])[0] for j in prev_ielems]
-        map_indices.insert(0, dict(zip(prev_ielems, mapped_prev_ielems)))
-        nontouchielems_i = numpy.unique(numpy.array(mapped_prev_ielems, dtype=int))
+        mapped_prev_ielems, tails = topo.transforms.index_with_tail_many([prev_transforms[j] for j in prev_ielems])
+        assert not numpy.equal(mapped_prev_ielems, -1).any()
+        map_indices.insert(0, (numpy.asarray(prev_ielems, dtype=int), mapped_prev_ielems))
+        nontouchielems_i = numpy.unique(mapped_prev_ielems)
         prev_ielems = ielems_i = numpy.unique(numpy.concatenate([numpy.asarray(touchielems_i, dtype=int), nontouchielems_i], axis=0))
         prev_transforms = topo.transforms
 
@@ -1875,77 +2499,170 @@ class HierarchicalTopology(Topology):
         # Basis functions with (partial) support in this hierarchical topology.
         partsuppdofs_i = numpy.union1d(touchdofs_i, basis_i.get_dofs(numpy.setdiff1d(ielems_i, touchielems_i, assume_unique=True)))
         # Mask of basis functions in `partsuppdofs_i` with strict support in this hierarchical topology.
-        partsuppdofs_supported_i = numpy.array([numeric.sorted_contains(ielems_i, basis_i.get_support(dof)).all() for dof in partsuppdofs_i], dtype=bool)
+        outside_i = numpy.setdiff1d(basis_i.get_support(partsuppdofs_i), ielems_i, assume_unique=True)
+        partsuppdofs_supported_i = ~numeric.sorted_contains(basis_i.get_dofs(outside_i), partsuppdofs_i)
         ubasis_active.insert(0, numpy.intersect1d(touchdofs_i, partsuppdofs_i[partsuppdofs_supported_i], assume_unique=True))
         ubasis_passive.insert(0, partsuppdofs_i[~partsuppdofs_supported_i])
 
     *offsets, ndofs = numpy.cumsum([0, *map(len, ubasis_active)])
 
     # 2. construct hierarchical polynomials
+    #
+    # The hierarchical polynomials of an element are fully determined by the
+    # coefficients of its ancestors, the active and passive states of their
+    # dofs and the transforms between them, limited to the levels that
+    # actually contribute. Elements that share all of these are grouped and
+    # their polynomials are constructed only once.
     hbasis_dofs = []
     hbasis_coeffs = []
     projectcache = {}
+    prefixcache = {}
+    polycache = {}
+    coeffcache = [{} for h in range(len(ubases))]
+    uniquecoeffs = {}
 
     for ilevel, (level, indices) in enumerate(zip(self.levels, self._indices_per_level)):
-      for ilocal in indices:
 
-        hbasis_trans = transform.canonical(level.transforms[ilocal])
-        tail = hbasis_trans[len(hbasis_trans)-ilevel:]
-        trans_dofs = []
-        trans_coeffs = []
+      # element indices of all ancestors, from coarse to fine
+      local_indices = [numpy.asarray(indices, dtype=int)]
+      for keys, values in reversed(map_indices[:ilevel]):
+        local_indices.insert(0, values[numeric.sorted_index(keys, local_indices[0])])
+
+      # dofs of all ancestors with their active (bit 0) and passive (bit 1)
+      # states, concatenated over the elements
+      dofstate = []
+      hmin = numpy.full(len(indices), ilevel if not truncated else 0)
+      for h, ilocals in enumerate(local_indices):
+        elemoffsets, mydofs = ubases[h]._get_elemdofs(ilocals)
+        imyactive = numpy.asarray(numeric.sorted_index(ubasis_active[h], mydofs, missing=-1))
+        state = numpy.greater_equal(imyactive, 0).astype(numpy.uint8) + 2 * numpy.asarray(numeric.sorted_contains(ubasis_passive[h], mydofs), dtype=numpy.uint8)
+        dofstate.append((elemoffsets, imyactive, state))
+        # lowest contributing level: the first level with active dofs for a
+        # classical basis, the last level without passive dofs for a truncated one
+        count = numpy.concatenate([[0], numpy.cumsum(state & (2 if truncated else 1))])[elemoffsets]
+        if truncated:
+          hmin[numpy.equal(count[1:], count[:-1])] = h
+        else:
+          hmin[numpy.greater(count[1:], count[:-1]) & numpy.equal(hmin, ilevel)] = h
+
+      for i, ilocal in enumerate(local_indices[-1]):
+
+        h0 = hmin[i]
+        key = []
+        for h, (elemoffsets, imyactive, state) in enumerate(dofstate[h0:], start=h0):
+          ielem = local_indices[h][i]
+          try:
+            mypoly = coeffcache[h][ielem]
+          except KeyError:
+            mypoly = ubases[h].get_coefficients(ielem)
+            mypoly = coeffcache[h][ielem] = uniquecoeffs.setdefault(mypoly, mypoly)
+          key.append(mypoly)
+          key.append(state[elemoffsets[i]:elemoffsets[i+1]].tobytes())
+        if h0 < ilevel:
+          hbasis_trans = transform.canonical(level.transforms[ilocal])
+          key.append(hbasis_trans[len(hbasis_trans)-ilevel+h0:])
+        key = tuple(key)
+
+        try:
+          selections, coeffs = polycache[key]
+        except KeyError:
+          tail = key[-1] if h0 < ilevel else ()
+          polys = key[0:2*(ilevel-h0+1):2]
+          states = key[1:2*(ilevel-h0+1):2]
+          if not truncated:
+            selections, coeffs = self._classical_polys(tail, polys, states, prefixcache)
+          else:
+            selections, coeffs = self._truncated_polys(tail, polys, states, truncation_tolerance, projectcache)
+          coeffs = types.frozenarray(numeric.poly_concatenate(tuple(coeffs)), copy=False)
+          polycache[key] = selections, coeffs
+
+        hbasis_dofs.append(numpy.concatenate([offsets[h0+h] + dofstate[h0+h][1][dofstate[h0+h][0][i]+selection] for h, selection in selections]))
+        hbasis_coeffs.append(coeffs)
+
+    return function.PlainBasis(hbasis_coeffs, hbasis_dofs, ndofs, self.f_index, self.f_coords)
+
+  def _classical_polys(self, tail, polys, states, cache):
+    '''Classical hierarchical polynomials of an element.
+
+    Args
+    ----
+    tail : :class:`tuple` of transform items
+        The transforms from every level to the next, from coarse to fine.
+    polys : :class:`tuple` of arrays
+        The coefficients of the element and its ancestors, from coarse to
+        fine, starting at the coarsest contributing level.
+    states : :class:`tuple` of :class:`bytes`
+        Per level the states of the element dofs: bit 0 is set for active and
+        bit 1 for passive dofs.
+    cache : :class:`dict`
+        Cache for the polynomials of the ancestors, which are shared by all
+        their descendants.
+
+    Returns
+    -------
+    selections : :class:`list` of (:class:`int`, array of :class:`int`\\s) pairs
+        Per contributing level the positions of the selected element dofs.
+    coeffs : :class:`list` of arrays
+        The coefficients of the selected dofs, to be concatenated.
+    '''
 
-        local_indices = [ilocal]
-        for m in reversed(map_indices[:ilevel]):
-          ilocal = m[ilocal]
-          local_indices.insert(0, ilocal)
+    key = tail, polys, states
+    try:
+      return cache[key]
+    except KeyError:
+      pass
 
-        if not truncated: # classical hierarchical basis
+    if tail: # loop from coarse to fine
+      selections, coeffs = self._classical_polys(tail[:-1], polys[:-1], states[:-1], cache)
+      if coeffs:
+        coeffs = [tail[-1].transform_poly(numeric.poly_concatenate(tuple(coeffs)) if len(coeffs) > 1 else coeffs[0])]
+    else:
+      selections, coeffs = [], []
 
-          for h, ilocal in enumerate(local_indices): # loop from coarse to fine
-            mydofs = ubases[h].get_dofs(ilocal)
+    myactive = numpy.equal(numpy.frombuffer(states[-1], dtype=numpy.uint8) & 1, 1)
+    if myactive.any():
+      selections = [*selections, (len(tail), numpy.where(myactive)[0])]
+      coeffs = [*coeffs, polys[-1][myactive]]
 
-            imyactive = numeric.sorted_index(ubasis_active[h], mydofs, missing=-1)
-            myactive = numpy.greater_equal(imyactive, 0)
-            if myactive.any():
-              trans_dofs.append(offsets[h]+imyactive[myactive])
-              mypoly = ubases[h].get_coefficients(ilocal)
-              trans_coeffs.append(mypoly[myactive])
+    cache[key] = selections, coeffs
+    return selections, coeffs
 
-            if h < len(tail):
-              trans_coeffs = [tail[h].transform_poly(c) for c in trans_coeffs]
+  def _truncated_polys(self, tail, polys, states, truncation_tolerance, projectcache):
+    '''Truncated hierarchical polynomials of an element.
 
-        else: # truncated hierarchical basis
+    Arguments and return values are as for :meth:`_classical_polys`, with
+    ``projectcache`` holding the least-squares projection matrix per
+    coefficient array.
+    '''
 
-          for h, ilocal in reversed(tuple(enumerate(local_indices))): # loop from fine to coarse
-            mydofs = ubases[h].get_dofs(ilocal)
-            mypoly = ubases[h].get_coefficients(ilocal)
+    selections = []
+    trans_coeffs = []
 
-            truncpoly = mypoly if h == len(tail) \
-              else numpy.tensordot(numpy.tensordot(tail[h].transform_poly(mypoly), project[...,mypassive], self.ndims), truncpoly[mypassive], 1)
+    for h in reversed(range(len(polys))): # loop from fine to coarse
+      mypoly = polys[h]
+      mystate = numpy.frombuffer(states[h], dtype=numpy.uint8)
 
-            imyactive = numeric.sorted_index(ubasis_active[h], mydofs, missing=-1)
-            myactive = numpy.greater_equal(imyactive, 0) & numpy.greater(abs(truncpoly), truncation_tolerance).any(axis=tuple(range(1,truncpoly.ndim)))
-            if myactive.any():
-              trans_dofs.append(offsets[h]+imyactive[myactive])
-              trans_coeffs.append(truncpoly[myactive])
+      truncpoly = mypoly if h == len(tail) \
+        else numpy.tensordot(numpy.tensordot(tail[h].transform_poly(mypoly), project[...,mypassive], self.ndims), truncpoly[mypassive], 1)
 
-            mypassive = numeric.sorted_contains(ubasis_passive[h], mydofs)
-            if not mypassive.any():
-              break
+      myactive = numpy.equal(mystate & 1, 1) & numpy.greater(abs(truncpoly), truncation_tolerance).any(axis=tuple(range(1,truncpoly.ndim)))
+      if myactive.any():
+        selections.append((h, numpy.where(myactive)[0]))
+        trans_coeffs.append(truncpoly[myactive])
 
-            try: # construct least-squares projection matrix
-              project = projectcache[mypoly]
-            except KeyError:
-              P = mypoly.reshape(len(mypoly), -1)
-              U, S, V = numpy.linalg.svd(P) # (U * S).dot(V[:len(S)]) == P
-              project = (V.T[:,:len(S)] / S).dot(U.T).reshape(mypoly.shape[1:]+mypoly.shape[:1])
-              projectcache[mypoly] = project
+      mypassive = numpy.equal(mystate & 2, 2)
+      if not mypassive.any():
+        break
 
-        # add the dofs and coefficients to the hierarchical basis
-        hbasis_dofs.append(numpy.concatenate(trans_dofs))
-        hbasis_coeffs.append(numeric.poly_concatenate(tuple(trans_coeffs)))
+      try: # construct least-squares projection matrix
+        project = projectcache[mypoly]
+      except KeyError:
+        P = mypoly.reshape(len(mypoly), -1)
+        U, S, V = numpy.linalg.svd(P) # (U * S).dot(V[:len(S)]) == P
+        project = (V.T[:,:len(S)] / S).dot(U.T).reshape(mypoly.shape[1:]+mypoly.shape[:1])
+        projectcache[mypoly] = project
 
-    return function.PlainBasis(hbasis_coeffs, hbasis_dofs, ndofs, self.f_index, self.f_coords)
+    return selections, trans_coeffs
 
 class ProductTopology(Topology):
   'product topology'
@@ -2330,4 +3047,31 @@ class MultipatchTopology(Topology):
 
     return MultipatchTopology(Patch(patch.topo.refined, patch.verts, patch.boundaries) for patch in self.patches)
 
+def _trim_elements(references, ielems, levels, offsets, maxrefine, ndivisions):
+  '''Return the trimmed references of elements ``ielems``.
+
+  The levels at the vertices of ``references[ielems[i]]`` are given by
+  ``levels[offsets[i]:offsets[i+1]]``.
+  '''
+
+  # Elements that lie entirely on one side of the levelset are kept or
+  # dropped in bulk. The remaining elements are trimmed once for every unique
+  # combination of reference and vertex levels, which is common for planar
+  # cuts through structured grids, distributed over parallel processes.
+  refs = list(map(references.__getitem__, ielems))
+  if not refs:
+    return refs
+  keep = numpy.greater_equal(numpy.minimum.reduceat(levels, offsets[:-1]), 0)
+  drop = ~keep & numpy.less_equal(numpy.maximum.reduceat(levels, offsets[:-1]), 0)
+  for i in drop.nonzero()[0]:
+    refs[i] = refs[i].empty
+  patterns = {}
+  for i in (~keep & ~drop).nonzero()[0]:
+    patterns.setdefault((refs[i], levels[offsets[i]:offsets[i+1]].tobytes()), []).append(i)
+  trimmed = parallel.map(lambda indices: refs[indices[0]].trim(levels[offsets[indices[0]]:offsets[indices[0]+1]], maxrefine=maxrefine, ndivisions=ndivisions), patterns.values(), name='trimming')
+  for indices, ref in zip(patterns.values(), trimmed):
+    for i in indices:
+      refs[i] = ref
+  return refs
+
 # vim:sw=2:sts=2:et
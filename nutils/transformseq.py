@@ -22,7 +22,7 @@
 
 from . import types, numeric, util, transform, element
 from .elementseq import References
-import abc, itertools, operator, numpy
+import abc, itertools, operator, functools, numpy
 
 class Transforms(types.Singleton):
   '''Abstract base class for a sequence of :class:`~nutils.transform.TransformItem` tuples.
@@ -156,6 +156,55 @@ class Transforms(types.Singleton):
 
     raise NotImplementedError
 
+  def index_with_tail_many(self, transforms):
+    '''Return the indices and tails of a sequence of transforms.
+
+    Batched version of :meth:`index_with_tail`. Rather than raising an
+    exception, transforms that are not found are marked by index ``-1`` and
+    tail ``None``.
+
+    Parameters
+    ----------
+    transforms : sequence of :class:`tuple`\\s of :class:`nutils.transform.TransformItem` objects
+        The transforms to find up to a possibly empty tail.
+
+    Returns
+    -------
+    indices : one-dimensional array of :class:`int`\\s
+        The index of every transform without tail in this sequence, or ``-1``
+        if the transform is not found.
+    tails : :class:`list` of :class:`tuple`\\s of :class:`nutils.transform.TransformItem` objects
+        The tail of every transform, or ``None`` if the transform is not
+        found.
+
+    Example
+    -------
+
+    Consider the following plain sequence of two shift transforms:
+
+    >>> from nutils.transform import Shift, Scale
+    >>> transforms = PlainTransforms([(Shift([0.]),), (Shift([1.]),)], fromdims=1)
+
+    Calling :meth:`index_with_tail_many` with the second transform, an unknown
+    transform and the first transform with an additional scale gives:
+
+    >>> indices, tails = transforms.index_with_tail_many([(Shift([1.]),), (Shift([2.]),), (Shift([0.]), Scale(0.5, [0.]))])
+    >>> indices
+    array([ 1, -1,  0])
+    >>> tails
+    [(), None, (Scale([0]+0.5*x),)]
+    '''
+
+    indices = numpy.empty(len(transforms), dtype=int)
+    tails = []
+    for i, trans in enumerate(transforms):
+      try:
+        indices[i], tail = self.index_with_tail(trans)
+      except ValueError:
+        indices[i], tail = -1, None
+      tails.append(tail)
+    return indices, tails
+
   def __iter__(self):
     '''Implement ``iter(self)``.'''
 
@@ -328,6 +377,9 @@ class EmptyTransforms(Transforms):
   def index_with_tail(self, trans):
     raise ValueError
 
+  def index_with_tail_many(self, transforms):
+    return numpy.full(len(transforms), -1, dtype=int), [None]*len(transforms)
+
   def index(self, trans):
     raise ValueError
 
@@ -353,7 +405,7 @@ class PlainTransforms(Transforms):
       The number of dimensions all ``transforms`` map from.
   '''
 
-  __slots__ = '_transforms', '_sorted', '_indices'
+  __slots__ = '_transforms', '_itemcodes', '_keys', '_lengths', '_indices'
 
   @types.apply_annotations
   def __init__(self, transforms:types.tuple[transform.canonical], fromdims:types.strictint):
@@ -361,11 +413,16 @@ class PlainTransforms(Transforms):
     if not (transforms_fromdims <= {fromdims}):
       raise ValueError('expected transforms with fromdims={}, but got {}'.format(fromdims, transforms_fromdims))
     self._transforms = transforms
-    self._sorted = numpy.empty([len(self._transforms)], dtype=object)
-    for i, trans in enumerate(self._transforms):
-      self._sorted[i] = tuple(map(id, trans))
-    self._indices = numpy.argsort(self._sorted)
-    self._sorted = self._sorted[self._indices]
+    # Every transform is stored as a fixed width byte string of big-endian
+    # integer codes, one per transform item and padded with zeros. Sorting
+    # these strings sorts the transforms lexicographically by item, such that
+    # any transform can be found with a single `numpy.searchsorted`.
+    self._itemcodes = {}
+    nitems = max(map(len, transforms), default=0)
+    keys = numpy.array([b''.join(self._itemcodes.setdefault(id(item), (len(self._itemcodes)+1).to_bytes(4, 'big')) for item in trans) for trans in transforms], dtype='S{}'.format(max(4*nitems, 1)))
+    self._indices = numpy.argsort(keys, kind='stable')
+    self._keys = keys[self._indices]
+    self._lengths = numpy.array([len(transforms[i]) for i in self._indices], dtype=int)
     super().__init__(fromdims)
 
   def __iter__(self):
@@ -379,17 +436,34 @@ class PlainTransforms(Transforms):
   def __len__(self):
     return len(self._transforms)
 
+  def _getkey(self, trans):
+    return b''.join(self._itemcodes.get(id(item), b'\xff\xff\xff\xff') for item in trans[:self._keys.itemsize//4])
+
   def index_with_tail(self, trans):
     trans, orig_trans = transform.promote(trans, self.fromdims), trans
-    transid_array = numpy.empty((), dtype=object)
-    transid_array[()] = transid = tuple(map(id, trans))
-    i = numpy.searchsorted(self._sorted, transid_array, side='right') - 1
-    if i < 0:
-      raise ValueError('{!r} not in sequence of transforms'.format(orig_trans))
-    match = self._sorted[i]
-    if transid[:len(match)] != match:
-      raise ValueError('{!r} not in sequence of transforms'.format(orig_trans))
-    return self._indices[i], trans[len(match):]
+    key = self._getkey(trans)
+    # The match, if any, is the last transform that does not exceed trans.
+    i = numpy.searchsorted(self._keys, key, side='right') - 1
+    if i >= 0:
+      n = self._lengths[i]
+      if n <= len(trans) and key[:4*n] == self._keys[i].ljust(4*n, b'\0'):
+        return self._indices[i], trans[n:]
+    raise ValueError('{!r} not in sequence of transforms'.format(orig_trans))
+
+  def index_with_tail_many(self, transforms):
+    transforms = [transform.promote(trans, self.fromdims) for trans in transforms]
+    keys = [self._getkey(trans) for trans in transforms]
+    # Like index_with_tail, but with a single searchsorted for all transforms.
+    found = numpy.searchsorted(self._keys, numpy.array(keys, dtype=self._keys.dtype), side='right') - 1
+    indices = numpy.full(len(transforms), -1, dtype=int)
+    tails = [None]*len(transforms)
+    for j, (i, key, trans) in enumerate(zip(found.tolist(), keys, transforms)):
+      if i >= 0:
+        n = self._lengths[i]
+        if n <= len(trans) and key[:4*n] == self._keys[i].ljust(4*n, b'\0'):
+          indices[j] = self._indices[i]
+          tails[j] = trans[n:]
+    return indices, tails
 
 class IdentifierTransforms(Transforms):
   '''A sequence of :class:`nutils.transform.Identifier` singletons.
@@ -516,6 +590,12 @@ class PIntAxis(EdgeAxis):
   def map(self, index):
     return self.i + ((index + (not self.side)) % len(self))
 
+@functools.lru_cache(4096)
+def _shift(offset):
+  # Shift transform for a tuple of integer offsets, cached to avoid repeated
+  # construction for transforms that share an element on the unrefined level.
+  return transform.Shift(types.frozenarray(offset, dtype=float))
+
 class StructuredTransforms(Transforms):
   '''Transforms sequence for :class:`~nutils.topology.StructuredTopology`.
 
@@ -530,6 +610,7 @@ class StructuredTransforms(Transforms):
   '''
 
   __slots__ = '_root', '_axes', '_nrefine', '_etransforms', '_ctransforms', '_cindices'
+  __cache__ = '_sortedcoords'
 
   @types.apply_annotations
   def __init__(self, root:transform.stricttransformitem, axes:types.tuple[types.strict[Axis]], nrefine:types.strictint):
@@ -552,24 +633,62 @@ class StructuredTransforms(Transforms):
 
     super().__init__(sum(axis.isdim for axis in self._axes))
 
+  def _coords(self, indices):
+    '''Return the coordinates on the nrefined level of transforms ``indices``.'''
+
+    coords = numpy.empty(indices.shape+(len(self._axes),), dtype=int)
+    for idim, axis in reversed(tuple(enumerate(self._axes))):
+      indices, rem = divmod(indices, len(axis))
+      coords[...,idim] = axis.map(rem)
+    return coords
+
+  @property
+  def _sortedcoords(self):
+    # Per axis the sorted coordinates on the nrefined level and the
+    # corresponding indices, for vectorized lookups of coordinates.
+    sortedcoords = []
+    for axis in self._axes:
+      coords = numpy.broadcast_to(axis.map(numpy.arange(len(axis))), (len(axis),))
+      order = numpy.argsort(coords, kind='stable')
+      sortedcoords.append((coords[order], order))
+    return tuple(sortedcoords)
+
+  def _index_coords(self, coords):
+    '''Return the indices of ``coords`` on the nrefined level, or -1 if absent.'''
+
+    indices = numpy.zeros(coords.shape[:-1], dtype=int)
+    found = numpy.ones(coords.shape[:-1], dtype=bool)
+    for axiscoords, (sortedcoords, order) in zip(numpy.moveaxis(coords, -1, 0), self._sortedcoords):
+      if not len(order):
+        return numpy.full(coords.shape[:-1], -1, dtype=int)
+      i = numpy.minimum(numpy.searchsorted(sortedcoords, axiscoords), len(order)-1)
+      found &= numpy.equal(sortedcoords[i], axiscoords)
+      indices = indices*len(order) + order[i]
+    return numpy.where(found, indices, -1)
+
+  def _fromcoords(self, coords):
+    # The shift is formed by the coordinates on the unrefined level, the child
+    # transforms by the binary digits of the remainder.
+    trans0 = _shift(tuple(coord >> self._nrefine for coord in coords))
+    ctransforms = tuple(self._ctransforms[tuple((coord >> i) & 1 for coord in coords)] for i in reversed(range(self._nrefine)))
+    return (self._root, trans0, *ctransforms, *self._etransforms)
+
+  def __iter__(self):
+    for start in range(0, len(self), 1024):
+      for coords in self._coords(numpy.arange(start, min(start+1024, len(self)))).tolist():
+        yield self._fromcoords(coords)
+
   def __getitem__(self, index):
     if not numeric.isint(index):
       return super().__getitem__(index)
     index = numeric.normdim(len(self), index)
-    # Decompose index into indices per dimension on the nrefined level.
-    indices = []
+    # Decompose index into coordinates per dimension on the nrefined level.
+    coords = []
     for axis in reversed(self._axes):
       index, rem = divmod(index, len(axis))
-      indices.insert(0, axis.map(rem))
+      coords.insert(0, axis.map(rem))
     assert index == 0
-    # Create transform.
-    ctransforms = []
-    indices = numpy.asarray(indices, dtype=int)
-    for i in range(self._nrefine):
-      indices, r = divmod(indices, self._ctransforms.shape)
-      ctransforms.insert(0, self._ctransforms[tuple(r)])
-    trans0 = transform.Shift(types.frozenarray(indices, dtype=float, copy=False))
-    return (self._root, trans0, *ctransforms, *self._etransforms)
+    return self._fromcoords(coords)
 
   def __len__(self):
     return util.product(map(len, self._axes))
@@ -584,19 +703,19 @@ class StructuredTransforms(Transforms):
 
     if not isinstance(shift, transform.Shift) or len(shift.offset) != len(self._axes) or not numpy.equal(shift.offset.astype(int), shift.offset).all():
       raise ValueError
-    indices = numpy.array(shift.offset, dtype=int)
+    coords = numpy.array(shift.offset, dtype=int)
 
     # Match child transforms.
     for item in tail[:self._nrefine]:
       try:
-        indices = indices*2 + self._cindices[item]
+        coords = coords*2 + self._cindices[item]
       except KeyError:
         raise ValueError
 
     # Check index boundaries and flatten.
     flatindex = 0
-    for index, axis in zip(indices, self._axes):
-      flatindex = flatindex*len(axis) + axis.unmap(index)
+    for coord, axis in zip(coords.tolist(), self._axes):
+      flatindex = flatindex*len(axis) + axis.unmap(coord)
 
     # Promote the remainder and match the edge transforms.
     tail = transform.promote(tail[self._nrefine:], self.fromdims)
@@ -606,6 +725,51 @@ class StructuredTransforms(Transforms):
 
     return flatindex, tail
 
+  def index_with_tail_many(self, transforms):
+    ndims = len(self._axes)
+    nhead = 2 + self._nrefine + len(self._etransforms)
+    childcodes = {t: i for i, t in enumerate(self._ctransforms.flat)}
+    shiftoffsets = {}
+    candidates = []
+    offsets = []
+    children = []
+    tails = [None]*len(transforms)
+    # Decompose every transform into an integer shift and child codes, such
+    # that the coordinates are combined and looked up for all transforms at
+    # once. Only the matching of the remaining items is done per transform.
+    for i, trans in enumerate(transforms):
+      if len(trans) < nhead or trans[0] != self._root:
+        continue
+      shift = trans[1]
+      try:
+        offset = shiftoffsets[shift]
+      except KeyError:
+        offset = shiftoffsets[shift] = tuple(map(int, shift.offset)) if isinstance(shift, transform.Shift) and len(shift.offset) == ndims and numpy.equal(shift.offset.astype(int), shift.offset).all() else None
+      if offset is None:
+        continue
+      tail = transform.uppermost(trans[2:])
+      try:
+        ichildren = [childcodes[item] for item in tail[:self._nrefine]]
+      except KeyError:
+        continue
+      tail = transform.promote(tail[self._nrefine:], self.fromdims)
+      if tail[:len(self._etransforms)] != self._etransforms:
+        continue
+      candidates.append(i)
+      offsets.append(offset)
+      children.append(ichildren)
+      tails[i] = tail[len(self._etransforms):]
+    indices = numpy.full(len(transforms), -1, dtype=int)
+    if candidates:
+      childbits = numpy.array(list(numpy.ndindex(self._ctransforms.shape)), dtype=int)
+      coords = numpy.array(offsets, dtype=int) << self._nrefine
+      for ilevel, ichildren in enumerate(numpy.array(children, dtype=int).reshape(len(candidates), self._nrefine).T):
+        coords |= childbits[ichildren] << (self._nrefine-1-ilevel)
+      indices[candidates] = self._index_coords(coords)
+      for i in numpy.equal(indices, -1).nonzero()[0]:
+        tails[i] = None
+    return indices, tails
+
 class MaskedTransforms(Transforms):
   '''An order preserving subset of another :class:`Transforms` object.
 
@@ -645,6 +809,16 @@ class MaskedTransforms(Transforms):
     else:
       return int(index), tail
 
+  def index_with_tail_many(self, transforms):
+    if not len(self._indices):
+      return numpy.full(len(transforms), -1, dtype=int), [None]*len(transforms)
+    parent_indices, tails = self._parent.index_with_tail_many(transforms)
+    indices = numpy.minimum(numpy.searchsorted(self._indices, parent_indices), len(self._indices)-1)
+    found = numpy.equal(self._indices[indices], parent_indices)
+    for i in (~found).nonzero()[0]:
+      tails[i] = None
+    return numpy.where(found, indices, -1), tails
+
 class ReorderedTransforms(Transforms):
   '''A reordered :class:`Transforms` object.
 
@@ -685,6 +859,12 @@ class ReorderedTransforms(Transforms):
     parent_index, tail = self._parent.index_with_tail(trans)
     return int(self._rindices[parent_index]), tail
 
+  def index_with_tail_many(self, transforms):
+    if not len(self._indices):
+      return numpy.full(len(transforms), -1, dtype=int), [None]*len(transforms)
+    parent_indices, tails = self._parent.index_with_tail_many(transforms)
+    return numpy.where(numpy.equal(parent_indices, -1), -1, self._rindices[parent_indices]), tails
+
 class DerivedTransforms(Transforms):
   '''A sequence of derived transforms.
 
@@ -752,6 +932,25 @@ class DerivedTransforms(Transforms):
     iderived = self._derived_transforms(self._parent_references[iparent]).index(tail[0])
     return self._offsets[iparent]+iderived, tail[1:]
 
+  def index_with_tail_many(self, transforms):
+    parent_indices, tails = self._parent.index_with_tail_many(transforms)
+    indices = numpy.full(len(transforms), -1, dtype=int)
+    for i, (iparent, tail) in enumerate(zip(parent_indices.tolist(), tails)):
+      tails[i] = None
+      if not tail:
+        continue
+      if self.fromdims == self._parent.fromdims:
+        tail = transform.uppermost(tail)
+      else:
+        tail = transform.canonical(tail)
+      try:
+        iderived = self._derived_transforms(self._parent_references[iparent]).index(tail[0])
+      except ValueError:
+        continue
+      indices[i] = self._offsets[iparent]+iderived
+      tails[i] = tail[1:]
+    return indices, tails
+
 class UniformDerivedTransforms(Transforms):
   '''A sequence of refined transforms from a uniform sequence of references.
 
@@ -808,6 +1007,25 @@ class UniformDerivedTransforms(Transforms):
     iderived = self._derived_transforms.index(tail[0])
     return iparent*len(self._derived_transforms) + iderived, tail[1:]
 
+  def index_with_tail_many(self, transforms):
+    parent_indices, tails = self._parent.index_with_tail_many(transforms)
+    indices = numpy.full(len(transforms), -1, dtype=int)
+    for i, (iparent, tail) in enumerate(zip(parent_indices.tolist(), tails)):
+      tails[i] = None
+      if not tail:
+        continue
+      if self.fromdims == self._parent.fromdims:
+        tail = transform.uppermost(tail)
+      else:
+        tail = transform.canonical(tail)
+      try:
+        iderived = self._derived_transforms.index(tail[0])
+      except ValueError:
+        continue
+      indices[i] = iparent*len(self._derived_transforms) + iderived
+      tails[i] = tail[1:]
+    return indices, tails
+
 class ProductTransforms(Transforms):
   '''The product of two :class:`Transforms` objects.
 
@@ -919,6 +1137,22 @@ class ChainedTransforms(Transforms):
       offset += len(item)
     raise ValueError
 
+  def index_with_tail_many(self, transforms):
+    indices = numpy.full(len(transforms), -1, dtype=int)
+    tails = [None]*len(transforms)
+    # Every item receives only the transforms not found by previous items.
+    pending = numpy.arange(len(transforms))
+    for item, offset in zip(self._items, self._offsets):
+      item_indices, item_tails = item.index_with_tail_many([transforms[i] for i in pending])
+      found = numpy.not_equal(item_indices, -1)
+      indices[pending[found]] = item_indices[found] + offset
+      for i, tail in zip(pending[found], itertools.compress(item_tails, found)):
+        tails[i] = tail
+      pending = pending[~found]
+      if not len(pending):
+        break
+    return indices, tails
+
   def refined(self, references):
     return chain((item.refined(references[start:stop]) for item, start, stop in zip(self._items, self._offsets[:-1], self._offsets[1:])), self.fromdims)
 
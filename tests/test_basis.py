@@ -84,6 +84,93 @@ class sparsity(TestCase):
 for ndim in 1, 2:
   sparsity(ndim=ndim)
 
+@parametrize
+class hierarchical(TestCase):
+
+  # Compare the hierarchical bases against the definitions of Giannelli et
+  # al., evaluated function by function on the finest level.
+
+  def setUp(self):
+    super().setUp()
+    domain, self.geom = mesh.rectilinear([3,3], periodic=[0] if self.periodic else [])
+    domain = domain.refined_by([0,1,4])
+    self.domain = domain.refined_by([domain.transforms.index(trans) for trans in domain.levels[1][:6].transforms if trans in domain.transforms])
+    self.assertEqual(len(self.domain.levels), 3)
+
+  def reference(self, truncated):
+    levels = self.domain.levels
+    ubases = [level.basis(self.btype, degree=self.degree) for level in levels]
+    # elements of every level that are covered by the hierarchical topology on this level or finer
+    covered = [set() for level in levels]
+    for ilevel, indices in enumerate(self.domain._indices_per_level):
+      for ielem in indices:
+        for h in range(ilevel+1):
+          covered[h].add(levels[h].transforms.index_with_tail(levels[ilevel].transforms[ielem])[0])
+    supports = []
+    for ubasis, level in zip(ubases, levels):
+      support = [set() for i in range(len(ubasis))]
+      for ielem in range(len(level)):
+        for dof in ubasis.get_dofs(ielem):
+          support[dof].add(ielem)
+      supports.append(support)
+    smpl = levels[-1].sample('gauss', 2*self.degree)
+    values = [smpl.eval(ubasis) for ubasis in ubases]
+    columns = []
+    for h, (indices, support) in enumerate(zip(self.domain._indices_per_level, supports)):
+      for dof, supp in enumerate(support):
+        if not supp & set(indices) or not supp <= covered[h]:
+          continue
+        coeffs = numpy.zeros(len(ubases[h]))
+        coeffs[dof] = 1
+        l = h
+        if truncated:
+          for l in range(h+1, len(levels)):
+            coeffs = numpy.linalg.lstsq(values[l], values[l-1].dot(coeffs), rcond=None)[0]
+            coeffs[[supp <= covered[l] for supp in supports[l]]] = 0
+        columns.append(values[l].dot(coeffs))
+    return smpl, numpy.array(columns).T
+
+  def test_classical(self):
+    smpl, desired = self.reference(truncated=False)
+    self.assertAllAlmostEqual(smpl.eval(self.domain.basis('h-'+self.btype, degree=self.degree)), desired, places=10)
+
+  def test_truncated(self):
+    smpl, desired = self.reference(truncated=True)
+    self.assertAllAlmostEqual(smpl.eval(self.domain.basis('th-'+self.btype, degree=self.degree)), desired, places=10)
+
+for btype in 'std', 'spline':
+  for degree in 1, 2:
+    for periodic in False, True:
+      hierarchical(btype=btype, degree=degree, periodic=periodic)
+
+@parametrize
+class reordered(TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.domain, self.geom = mesh.unitsquare(6, etype=self.etype)
+    basis = self.domain.basis('std', degree=self.degree)
+    self.shuffled = basis.reordered(numpy.random.RandomState(0).permutation(len(basis)))
+    self.basis = self.shuffled.reordered()
+
+  def bandwidth(self, basis):
+    i, j = self.domain.integrate(function.outer(basis), degree=2*self.degree).export('dense').nonzero()
+    return abs(i-j).max()
+
+  def test_permutation(self):
+    self.assertEqual(sorted(self.basis._order), list(range(len(self.shuffled))))
+
+  def test_bandwidth(self):
+    self.assertLess(self.bandwidth(self.basis), self.bandwidth(self.shuffled) / 2)
+
+  def test_values(self):
+    values, shuffled = self.domain.sample('gauss', 2).eval([self.basis, self.shuffled])
+    self.assertAllEqual(values, shuffled[:,self.basis._order])
+
+for etype in 'square', 'triangle', 'mixed':
+  for degree in 1, 2:
+    reordered(etype=etype, degree=degree)
+
 @parametrize
 class structured(basisTest):
 
@@ -165,6 +252,33 @@ class structured(basisTest):
 structured(product=False)
 structured(product=True)
 
+@parametrize
+class structured_incidence(TestCase):
+
+  # Compare the vectorized element to dof incidence and support unions of
+  # structured bases against the element- and dof-wise definitions.
+
+  def setUp(self):
+    super().setUp()
+    domain, geom = mesh.rectilinear([4,3], periodic=self.periodic)
+    self.basis = domain.basis(self.btype, degree=self.degree)
+    self.assertIsInstance(self.basis, function.StructuredBasis)
+    self.ielems = numpy.random.RandomState(0).choice(len(domain), 7)
+
+  def test_get_elemdofs(self):
+    offsets, dofs = self.basis._get_elemdofs(self.ielems)
+    self.assertEqual([dofs[i:j].tolist() for i, j in zip(offsets[:-1], offsets[1:])], [self.basis.get_dofs(ielem).tolist() for ielem in self.ielems])
+
+  def test_get_support_union(self):
+    for dofs in [0], [len(self.basis)-1], numpy.random.RandomState(0).choice(len(self.basis), 5):
+      with self.subTest(dofs=dofs):
+        self.assertEqual(self.basis.get_support(numpy.array(dofs)).tolist(), sorted(set().union(*(self.basis.get_support(dof).tolist() for dof in dofs))))
+
+for btype in 'std', 'spline':
+  for degree in 1, 2, 3:
+    for periodic in [], [0], [1], [0,1]:
+      structured_incidence(btype=btype, degree=degree, periodic=periodic)
+
 @parametrize
 class structured_line(basisTest):
 
@@ -1,5 +1,5 @@
-from nutils import testing, export
-import os, tempfile, pathlib, treelog
+from nutils import testing, export, numeric
+import os, tempfile, pathlib, treelog, xml.etree.ElementTree
 import numpy
 
 class mplfigure(testing.TestCase):
@@ -162,3 +162,175 @@ vtk(ndims=3, xtype='f4', ptype='i1', pshape=(3,))
 vtk(ndims=2, xtype='f4', ptype='i1', pshape=(2,2))
 vtk(ndims=3, xtype='f4', ptype='i1', pshape=(3,3))
 vtk(ndims=3, xtype='f4', ctype='i1', cshape=())
+
+class vtu(testing.TestCase):
+
+  dtypes = dict(Int8='i1', UInt8='u1', Int16='i2', UInt16='u2', Int32='i4', UInt32='u4', Int64='i8', UInt64='u8', Float32='f4', Float64='f8')
+
+  def setUp(self):
+    super().setUp()
+    self.outdir = pathlib.Path(self.enter_context(tempfile.TemporaryDirectory()))
+    self.enter_context(treelog.set(treelog.DataLog(str(self.outdir))))
+
+  def read(self, name):
+    with (self.outdir/name).open('rb') as f:
+      data = f.read()
+    head, sep, appended = data.partition(b'<AppendedData encoding="raw">\n_')
+    self.assertTrue(sep)
+    self.assertTrue(appended.endswith(b'\n</AppendedData>\n</VTKFile>\n'))
+    root = xml.etree.ElementTree.fromstring(head + b'</VTKFile>')
+    self.assertEqual(root.get('type'), 'UnstructuredGrid')
+    byteorder = {'LittleEndian': '<', 'BigEndian': '>'}[root.get('byte_order')]
+    piece, = root.iter('Piece')
+    arrays = {}
+    for section in piece:
+      for item in section:
+        dtype = numpy.dtype(byteorder + self.dtypes[item.get('type')])
+        offset = int(item.get('offset'))
+        nbytes, = numpy.frombuffer(appended, dtype=byteorder+'u8', count=1, offset=offset)
+        array = numpy.frombuffer(appended, dtype=dtype, count=int(nbytes)//dtype.itemsize, offset=offset+8)
+        if 'NumberOfComponents' in item.attrib:
+          array = array.reshape(-1, int(item.get('NumberOfComponents')))
+        arrays[section.tag, item.get('Name')] = array
+    return int(piece.get('NumberOfPoints')), int(piece.get('NumberOfCells')), arrays
+
+  def test_simplex(self):
+    x = numpy.array([[0,0],[0,1],[1,0],[1,1]], dtype=float)
+    tri = numpy.array([[0,1,2],[1,2,3]])
+    export.vtu('test', tri, x, p=numpy.arange(4, dtype='>i2'), c=numpy.array([1.5,2.5], dtype=numpy.float32), v=x, b=numpy.array([True,False]))
+    npoints, ncells, arrays = self.read('test.vtu')
+    self.assertEqual((npoints, ncells), (4, 2))
+    self.assertAllEqual(arrays['Points', None], numpy.concatenate([x, numpy.zeros((4,1))], axis=1))
+    self.assertAllEqual(arrays['Cells', 'connectivity'], tri.ravel())
+    self.assertAllEqual(arrays['Cells', 'offsets'], [3, 6])
+    self.assertAllEqual(arrays['Cells', 'types'], [5, 5])
+    self.assertAllEqual(arrays['PointData', 'p'], [0,1,2,3])
+    self.assertAllEqual(arrays['PointData', 'v'], x)
+    self.assertAllEqual(arrays['CellData', 'c'], [1.5, 2.5])
+    self.assertAllEqual(arrays['CellData', 'b'], [1, 0])
+
+  def test_quad(self):
+    grid = numpy.arange(8).reshape(2,2,2)
+    export.vtu('test', grid, numpy.zeros((8,3)))
+    npoints, ncells, arrays = self.read('test.vtu')
+    self.assertAllEqual(arrays['Cells', 'connectivity'], [0,2,3,1,4,6,7,5])
+    self.assertAllEqual(arrays['Cells', 'types'], [9, 9])
+
+  def test_lagrange_quad(self):
+    grid = numpy.arange(9).reshape(1,3,3)
+    export.vtu('test', grid, numpy.zeros((9,2)))
+    npoints, ncells, arrays = self.read('test.vtu')
+    self.assertAllEqual(arrays['Cells', 'connectivity'], [0,6,8,2,3,7,5,1,4])
+    self.assertAllEqual(arrays['Cells', 'types'], [70])
+
+  def test_hex(self):
+    grid = numpy.arange(8).reshape(1,2,2,2)
+    export.vtu('test', grid, numpy.zeros((8,3)))
+    npoints, ncells, arrays = self.read('test.vtu')
+    self.assertAllEqual(arrays['Cells', 'connectivity'], [0,4,6,2,1,5,7,3])
+    self.assertAllEqual(arrays['Cells', 'types'], [12])
+
+  def test_lagrange_hex(self):
+    grid = numpy.arange(27).reshape(1,3,3,3)
+    export.vtu('test', grid, numpy.zeros((27,3)))
+    npoints, ncells, arrays = self.read('test.vtu')
+    connectivity = arrays['Cells', 'connectivity']
+    self.assertAllEqual(connectivity[:8], [0,18,24,6,2,20,26,8])
+    self.assertAllEqual(connectivity[8:12], [9,21,15,3])
+    self.assertEqual(connectivity[-1], 13)
+    self.assertAllEqual(numpy.sort(connectivity), numpy.arange(27))
+    self.assertAllEqual(arrays['Cells', 'types'], [72])
+
+  def test_pieces(self):
+    x = numpy.array([[0,0],[0,1],[1,0],[1,1]], dtype=float)
+    for ipiece in range(2):
+      export.vtu('test', numpy.array([[0,1,2]]), x + ipiece, piece=(ipiece, 2), p=numpy.arange(4.))
+    root = xml.etree.ElementTree.parse(str(self.outdir/'test.pvtu')).getroot()
+    self.assertEqual(root.get('type'), 'PUnstructuredGrid')
+    self.assertEqual([piece.get('Source') for piece in root.iter('Piece')], ['test_0.vtu', 'test_1.vtu'])
+    self.assertEqual([array.get('Name') for array in root.iter('PDataArray')], [None, 'p'])
+    for ipiece in range(2):
+      npoints, ncells, arrays = self.read('test_{}.vtu'.format(ipiece))
+      self.assertAllEqual(arrays['Points', None][:,:2], x + ipiece)
+
+  def test_invalid(self):
+    with self.assertRaises(Exception):
+      export.vtu('test', numpy.array([[0,1,2]]), numpy.zeros((4,2)), p=numpy.arange(3))
+    with self.assertRaises(Exception):
+      export.vtu('test', numpy.arange(6).reshape(1,2,3), numpy.zeros((6,2)))
+
+class xdmf(testing.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.outdir = pathlib.Path(self.enter_context(tempfile.TemporaryDirectory()))
+    self.x = numpy.array([[0,0],[0,1],[1,0],[1,1]], dtype=float)
+    self.tri = numpy.array([[0,1,2],[1,2,3]])
+
+  def read(self, name):
+    root = xml.etree.ElementTree.parse(str(self.outdir/(name+'.xdmf'))).getroot()
+    data = (self.outdir/(name+'.bin')).read_bytes()
+    def array(item):
+      dtype = numpy.dtype({'Little': '<', 'Big': '>'}[item.get('Endian')] + {'Char': 'i', 'UChar': 'u', 'Short': 'i', 'UShort': 'u', 'Int': 'i', 'UInt': 'u', 'Float': 'f'}[item.get('NumberType')] + item.get('Precision'))
+      shape = tuple(map(int, item.get('Dimensions').split()))
+      self.assertEqual(item.text, name+'.bin')
+      return numpy.frombuffer(data, dtype=dtype, count=numpy.prod(shape), offset=int(item.get('Seek'))).reshape(shape)
+    steps = []
+    for grid in root.iter('Grid'):
+      if grid.get('GridType') == 'Uniform':
+        cells = array(grid.find('Topology/DataItem'))
+        points = array(grid.find('Geometry/DataItem'))
+        steps.append((float(grid.find('Time').get('Value')), cells, points, {attr.get('Name'): (attr.get('Center'), array(attr.find('DataItem'))) for attr in grid.iter('Attribute')}))
+    return steps
+
+  def test_series(self):
+    u = numpy.zeros(4)
+    with export.xdmf(str(self.outdir/'test'), self.tri, self.x) as series:
+      for t in range(3):
+        u[:] = t
+        series.write(t*.5, u=u, v=self.x*t, c=numpy.array([t,-t], dtype=numpy.int8))
+    steps = self.read('test')
+    self.assertEqual([time for time, cells, points, data in steps], [0, .5, 1])
+    for t, (time, cells, points, data) in enumerate(steps):
+      self.assertAllEqual(cells, self.tri)
+      self.assertAllEqual(points, self.x)
+      self.assertEqual(data['u'][0], 'Node')
+      self.assertAllEqual(data['u'][1], [t]*4)
+      self.assertAllEqual(data['v'][1], self.x*t)
+      self.assertEqual(data['c'][0], 'Cell')
+      self.assertAllEqual(data['c'][1], [t,-t])
+    self.assertEqual((self.outdir/'test.bin').stat().st_size, self.tri.nbytes + self.x.nbytes + 3 * (u.nbytes + self.x.nbytes + 2))
+
+  def test_grid(self):
+    with export.xdmf(str(self.outdir/'test'), numpy.arange(9).reshape(1,3,3), numpy.zeros((9,2))) as series:
+      series.write(0)
+    (time, cells, points, data), = self.read('test')
+    self.assertAllEqual(cells, [[0,3,4,1],[1,4,5,2],[3,6,7,4],[4,7,8,5]])
+
+  def test_pack(self):
+    pack = dict(atol=1e-6, rtol=1e-3, dtype='int16')
+    with export.xdmf(str(self.outdir/'test'), self.tri, self.x, pack=pack) as series:
+      series.write(0, u=numpy.array([0,.1,-2,30]))
+    (time, cells, points, data), = self.read('test')
+    self.assertEqual(data['u'][1].dtype, numpy.int16)
+    self.assertAllAlmostEqual(numeric.unpack(data['u'][1], atol=1e-6, rtol=1e-3), [0,.1,-2,30], places=1)
+    self.assertAllEqual(points, self.x)
+
+  def test_tensors(self):
+    rng = numpy.random.RandomState(0)
+    A2 = rng.uniform(size=(4,2,2))
+    A3 = rng.uniform(size=(4,3,3))
+    S3 = A3 + A3.swapaxes(1,2)
+    with export.xdmf(str(self.outdir/'test'), self.tri, self.x) as series:
+      series.write(0, A2=A2, A3=A3, S3=S3)
+    (time, cells, points, data), = self.read('test')
+    self.assertAllEqual(data['A2'][1], A2.reshape(4,4))
+    self.assertAllEqual(data['A3'][1], A3.reshape(4,9))
+    self.assertAllEqual(data['S3'][1], S3[:,[0,0,0,1,1,2],[0,1,2,1,2,2]])
+    root = xml.etree.ElementTree.parse(str(self.outdir/'test.xdmf')).getroot()
+    self.assertEqual({attr.get('Name'): attr.get('AttributeType') for attr in root.iter('Attribute')}, dict(A2='Matrix', A3='Tensor', S3='Tensor6'))
+
+  def test_invalid(self):
+    with self.assertRaises(Exception):
+      with export.xdmf(str(self.outdir/'test'), self.tri, self.x) as series:
+        series.write(0, u=numpy.arange(3))
@@ -191,6 +191,15 @@ class setoperations(TestCase):
     self.assertEqual(set(union.transforms), set(self.domain.transforms))
     self.assertEqual(set(union.opposites), set(self.domain.opposites))
 
+  def test_union_commonbase(self):
+    x, y = self.geom
+    pos1 = self.domain.trim(x-y, maxrefine=0)
+    pos2 = self.domain.trim(x+y, maxrefine=0)
+    union = topology.UnionTopology([pos1, pos2])
+    self.assertEqual(len(union), len(self.domain)-1)
+    self.assertEqual(set(union.transforms), set(pos1.transforms) | set(pos2.transforms))
+    self.assertAlmostEqual(union.integrate(function.J(self.geom), degree=0), .75)
+
 
 @parametrize
 class cutdomain(TestCase):
@@ -241,6 +250,13 @@ class cutdomain(TestCase):
     self.assertLess(trimerr, self.errtol, 'trim surface tolerance not met')
     self.assertLess(totalerr, self.errtol, 'total surface tolerance not met')
 
+  def test_compressed(self):
+    funcs = [self.geom[0]**i * self.geom[1]**j for i in range(4) for j in range(4-i)]
+    gauss = self.pos.sample('gauss', 3)
+    compressed = self.pos.sample('compressed', 3)
+    self.assertLess(compressed.npoints * 10, gauss.npoints)
+    self.assertAllAlmostEqual(compressed.integrate(funcs), gauss.integrate(funcs), places=14)
+
   def test_locate(self):
     curvegeom = self.geom * (1 + .1 * function.sin(function.norm2(self.geom)*numpy.pi/self.radius)) # interface preserving non-polynomial scaling
     for p in numpy.linspace(.001, .999, 20):
@@ -312,6 +328,36 @@ class leveltopo(TestCase):
       trimtopo = self.domain0.trim(level, maxrefine=1, leveltopo=domain2)
 
 
+@parametrize
+class retrim(TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.domain, self.geom = mesh.rectilinear([numpy.linspace(0,1,9)]*2)
+    self.trimmed = self.domain.trim(self.levelset(.5, .5), maxrefine=self.maxrefine)
+
+  def levelset(self, x0, y0):
+    return function.norm2(self.geom - numpy.array([x0, y0])) - .25
+
+  def check(self, x0, y0):
+    retrimmed = self.trimmed.retrim(self.levelset(x0, y0), maxrefine=self.maxrefine)
+    trimmed = self.domain.trim(self.levelset(x0, y0), maxrefine=self.maxrefine)
+    self.assertEqual(retrimmed.refs, trimmed.refs)
+    self.assertEqual(retrimmed.newboundary, 'trimmed')
+
+  def test_unchanged(self):
+    self.check(.5, .5)
+
+  def test_small_move(self):
+    self.check(.52, .47)
+
+  def test_large_move(self):
+    self.check(.65, .6)
+
+retrim(maxrefine=0)
+retrim(maxrefine=1)
+
+
 class trim_conforming(TestCase):
 
   def setUp(self):
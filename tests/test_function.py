@@ -1167,6 +1167,20 @@ class CommonBasis:
     with self.assertRaises(IndexError):
       self.basis.get_support(numpy.array([[True]*self.checkndofs], dtype=bool))
 
+  def test_elemdofs(self):
+    offsets, dofs = self.basis._elemdofs
+    self.assertEqual(len(offsets), self.checknelems+1)
+    self.assertEqual([dofs[offsets[ielem]:offsets[ielem+1]].tolist() for ielem in range(self.checknelems)], [self.basis.get_dofs(ielem).tolist() for ielem in range(self.checknelems)])
+
+  def test_get_support_elementwise(self):
+    # compare against the support as defined by the dofs of every element
+    elemdofs = [self.basis.get_dofs(ielem) for ielem in range(self.checknelems)]
+    for dof in range(self.checkndofs):
+      self.assertEqual(self.basis.get_support(dof).tolist(), [ielem for ielem, dofs in enumerate(elemdofs) if dof in dofs])
+    for dofs in itertools.combinations(range(self.checkndofs), 2):
+      with self.subTest(dofs):
+        self.assertEqual(self.basis.get_support(numpy.array(dofs)).tolist(), [ielem for ielem, edofs in enumerate(elemdofs) if numpy.in1d(edofs, dofs).any()])
+
   def test_getitem_array(self):
     for mask in itertools.product(*[[False, True]]*self.checkndofs):
       mask = numpy.array(mask, dtype=bool)
@@ -1256,6 +1270,18 @@ class MaskedBasis(CommonBasis, TestCase):
     self.checkndofs = 2
     super().setUp()
 
+class ReorderedBasis(CommonBasis, TestCase):
+
+  def setUp(self):
+    self.checktransforms = transformseq.PlainTransforms([(transform.Identifier(0,k),) for k in 'abcd'], 0)
+    index, coords = self.mk_index_coords(0, self.checktransforms)
+    parent = function.PlainBasis([[1],[2,3],[4,5],[6]], [[0],[2,3],[1,3],[2]], 4, index, coords)
+    self.basis = function.ReorderedBasis(parent, [2,0,3,1])
+    self.checkcoeffs = [[1],[2,3],[4,5],[6]]
+    self.checkdofs = [[1],[0,2],[3,2],[0]]
+    self.checkndofs = 4
+    super().setUp()
+
 class PrunedBasis(CommonBasis, TestCase):
 
   def setUp(self):
@@ -1,5 +1,5 @@
 from nutils import *
-import tempfile, pathlib, os
+import tempfile, pathlib, os, subprocess, sys
 from nutils.testing import *
 
 @parametrize
@@ -104,6 +104,129 @@ for version in 2, 4:
   for degree in 1, 2:
     gmshmanifold(version=version, degree=degree)
 
+class simplex(TestCase):
+
+  def setUp(self):
+    super().setUp()
+    n = 4
+    simplices = numpy.concatenate([numpy.take([i*(n+1)+j, i*(n+1)+j+1, (i+1)*(n+1)+j, (i+1)*(n+1)+j+1], [[0,1,2],[1,2,3]] if i%2==j%2 else [[0,1,3],[0,2,3]], axis=0) for i in range(n) for j in range(n)])
+    coords = numpy.array([[i, j] for i in range(n+1) for j in range(n+1)], dtype=float)
+    nodes = numpy.sort(simplices, axis=1)
+    center = coords[nodes].mean(axis=1)
+    btags = {'bottom': [], 'iface': []}
+    for ielem, elemcoords in enumerate(coords[nodes]):
+      for iedge in range(3):
+        edgecoords = numpy.delete(elemcoords, iedge, axis=0)
+        if (edgecoords[:,1] == 0).all():
+          btags['bottom'].append((ielem, iedge))
+        if (edgecoords[:,0] == 2).all() and center[ielem,0] < 2:
+          btags['iface'].append((ielem, iedge))
+    self.domain, self.geom = mesh.simplex(nodes=nodes, cnodes=nodes, coords=coords,
+      tags=dict(left=numpy.where(center[:,0] < 2)[0], right=numpy.where(center[:,0] > 2)[0]),
+      btags=btags, ptags=dict(center=[2*(n+1)+2]))
+
+  def test_length(self):
+    for name, topo, exact_length in (('bottom', self.domain.boundary['bottom'], 4),
+                                     ('iface', self.domain.interfaces['iface'], 4),
+                                     ('leftbottom', self.domain['left'].boundary['bottom'], 2),
+                                     ('leftiface', self.domain['left'].boundary['iface'], 4),
+                                     ('rightiface', self.domain['right'].boundary['iface'], 4)):
+      with self.subTest(name):
+        length = topo.integrate(function.J(self.geom), degree=0)
+        self.assertAllAlmostEqual(length, exact_length, places=14)
+
+  def test_opposite(self):
+    for name, topo in (('iface', self.domain.interfaces['iface']),
+                       ('leftiface', self.domain['left'].boundary['iface']),
+                       ('rightiface', self.domain['right'].boundary['iface'])):
+      with self.subTest(name):
+        x1, x2 = topo.sample('uniform', 2).eval([self.geom, function.opposite(self.geom)])
+        self.assertAllAlmostEqual(x1[:,0], 2, places=14)
+        self.assertAllAlmostEqual(x1, x2, places=14)
+
+  def test_normal(self):
+    for name, topo, nx in ('left', self.domain['left'], 1), ('right', self.domain['right'], -1):
+      with self.subTest(name):
+        n = topo.boundary['iface'].sample('uniform', 2).eval(self.geom.normal())
+        self.assertAllAlmostEqual(n, [[nx, 0]]*len(n), places=14)
+
+  def test_points(self):
+    for name, topo, npoints in ('all', self.domain, 4), ('left', self.domain['left'], 2), ('right', self.domain['right'], 2):
+      with self.subTest(name):
+        x = topo.points['center'].sample('gauss', 1).eval(self.geom)
+        self.assertEqual(len(x), npoints)
+        self.assertAllAlmostEqual(x, numpy.full((npoints, 2), 2), places=14)
+
+class match_edges(TestCase):
+
+  def setUp(self):
+    super().setUp()
+    n = 4
+    simplices = numpy.concatenate([numpy.take([i*(n+1)+j, i*(n+1)+j+1, (i+1)*(n+1)+j, (i+1)*(n+1)+j+1], [[0,1,2],[1,2,3]] if i%2==j%2 else [[0,1,3],[0,2,3]], axis=0) for i in range(n) for j in range(n)])
+    self.vnodes = numpy.sort(simplices, axis=1)
+    self.nnodes = (n+1)**2
+    # the edges of every element, in the order of mesh.simplex
+    self.edges = {tuple(numpy.delete(nodes, iedge)): (ielem, iedge) for ielem, nodes in enumerate(self.vnodes) for iedge in range(3)}
+
+  def test_all(self):
+    edgenodes = numpy.array(list(self.edges))
+    self.assertEqual(mesh._match_edges(self.vnodes, edgenodes[:,::-1], self.nnodes).tolist(), [list(self.edges[tuple(nodes)]) for nodes in edgenodes])
+
+  def test_duplicates(self):
+    edgenodes = numpy.array([[0,1],[1,0],[5,6],[0,1],[6,5],[10,5]])
+    self.assertEqual(mesh._match_edges(self.vnodes, edgenodes, self.nnodes).tolist(), [list(self.edges[0,1]), list(self.edges[5,6]), list(self.edges[5,10])])
+
+  def test_missing(self):
+    edgenodes = numpy.array([[0,1],[0,24]])
+    self.assertEqual(mesh._match_edges(self.vnodes, edgenodes, self.nnodes).tolist(), [list(self.edges[0,1]), [-1,-1]])
+
+@parametrize
+class checkpoint(TestCase):
+
+  def setUp(self):
+    super().setUp()
+    if self.variant == 'structured':
+      self.domain, self.geom = mesh.rectilinear([numpy.linspace(0, 1, 5), numpy.linspace(0, 1, 4)])
+    elif self.variant == 'simplex':
+      self.domain, self.geom = mesh.unitsquare(4, 'triangle')
+    elif self.variant == 'hierarchical':
+      domain, self.geom = mesh.rectilinear([numpy.linspace(0, 1, 5)]*2)
+      self.domain = domain.refined_by([0, 5, 6]).refined_by([1, 2])
+    elif self.variant == 'trimmed':
+      domain, self.geom = mesh.rectilinear([numpy.linspace(0, 1, 5)]*2)
+      self.domain = domain.trim(.9**2 - (self.geom**2).sum(), maxrefine=2)
+    tmpdir = tempfile.TemporaryDirectory()
+    self.addCleanup(tmpdir.cleanup)
+    self.path = pathlib.Path(tmpdir.name)/'mesh.ckpt'
+    mesh.save(self.path, self.domain, self.geom, minsize=16)
+
+  def test_roundtrip(self):
+    domain, geom = mesh.load(self.path)
+    self.assertEqual(len(domain), len(self.domain))
+    self.assertEqual(list(domain.transforms), list(self.domain.transforms))
+    self.assertEqual(list(domain.references), list(self.domain.references))
+    self.assertEqual(geom, self.geom)
+
+  def test_integrate(self):
+    domain, geom = mesh.load(self.path)
+    for name, topo1, topo2 in ('volume', self.domain, domain), ('boundary', self.domain.boundary, domain.boundary):
+      with self.subTest(name):
+        self.assertAllAlmostEqual(topo2.integrate(function.J(geom), degree=1), topo1.integrate(function.J(self.geom), degree=1), places=14)
+
+  def test_subprocess(self):
+    script = 'from nutils import *\ndomain, geom = mesh.load({!r})\nprint(repr(domain.integrate(function.J(geom), degree=1)))'.format(str(self.path))
+    volume = subprocess.run([sys.executable, '-c', script], stdout=subprocess.PIPE, check=True).stdout
+    self.assertAlmostEqual(float(volume), self.domain.integrate(function.J(self.geom), degree=1), places=14)
+
+  def test_invalid(self):
+    with open(self.path, 'r+b') as f:
+      f.write(b'X')
+    with self.assertRaises(ValueError):
+      mesh.load(self.path)
+
+for variant in 'structured', 'simplex', 'hierarchical', 'trimmed':
+  checkpoint(variant=variant)
+
 @parametrize
 class rectilinear(TestCase):
 
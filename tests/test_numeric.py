@@ -68,6 +68,14 @@ pack('int8', atol=2e-6, rtol=2e-1, nbits=8)
 pack('int16', atol=2e-15, rtol=2e-3, nbits=16)
 pack('int32', atol=2e-96, rtol=2e-7, nbits=32)
 
+class ranges(TestCase):
+
+  def test(self):
+    self.assertEqual(numeric.ranges([1,5,4,0], [3,8,4,1]).tolist(), [1,2,5,6,7,0])
+
+  def test_empty(self):
+    self.assertEqual(numeric.ranges([], []).tolist(), [])
+
 class sorted_index(TestCase):
 
   def test_None(self):
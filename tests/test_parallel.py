@@ -1,4 +1,4 @@
-import unittest, os, multiprocessing, time, sys, warnings as _builtin_warnings
+import unittest, os, multiprocessing, time, sys, numpy, warnings as _builtin_warnings
 from nutils import parallel, testing, warnings
 
 canfork = hasattr(os, 'fork')
@@ -58,3 +58,39 @@ class Test(testing.TestCase):
         a[i] = 1
         time.sleep(.01)
     self.assertEqual(a.tolist(), [1]*len(a))
+
+  def test_map(self):
+    count = parallel.shzeros([32], dtype=int)
+    def func(i):
+      count[i] += 1
+      time.sleep(.01)
+      return i, os.getpid()
+    results = parallel.map(func, range(32))
+    self.assertEqual([i for i, pid in results], list(range(32)))
+    self.assertEqual(len(set(pid for i, pid in results)), 3 if canfork else 1)
+    self.assertEqual(count.tolist(), [1]*32)
+
+  @unittest.skipIf(not canfork, 'fork is not available on this system')
+  def test_map_failinchild(self):
+    # The failing child is whichever child first calls func, so the failure
+    # is repeated to cover both orders in which the main process collects the
+    # (large, hence blocking) results of the children.
+    mainpid = os.getpid()
+    for attempt in range(4):
+      failpid = multiprocessing.RawValue('i', 0)
+      lock = multiprocessing.Lock()
+      def func(i):
+        pid = os.getpid()
+        if pid != mainpid:
+          with lock:
+            if not failpid.value:
+              failpid.value = pid
+          if pid == failpid.value:
+            1/0
+        time.sleep(.01)
+        return numpy.zeros(2**20)
+      with self.subTest(attempt=attempt), self.assertRaisesRegex(Exception, 'fork failed in 1 out of 3 processes'):
+        parallel.map(func, range(12))
+
+  def test_map_empty(self):
+    self.assertEqual(parallel.map(lambda i: i, []), [])
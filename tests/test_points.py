@@ -1,5 +1,6 @@
 from nutils import *
 from nutils.testing import *
+import math
 
 class gauss(TestCase):
 
@@ -46,6 +47,39 @@ class gauss(TestCase):
       points = tet.getpoints('gauss', degree)
       self.assertLess(abs(points.weights.sum()-1/6), 2e-15)
 
+  def test_triangle_highdegree(self):
+    tri = element.getsimplex(2)
+    npoints = 16, 19, 25, 28, 33, 37, 42, 51, 55, 60, 67, 73, 82, 121, 144
+    for degree, n in enumerate(npoints, start=8):
+      with self.subTest(degree=degree):
+        points = tri.getpoints('gauss', degree)
+        self.assertEqual(points.npoints, n)
+        self._check_simplex(points, degree)
+
+  def test_tetrahedron_highdegree(self):
+    tet = element.getsimplex(3)
+    npoints = 61, 96, 121, 160, 175, 512
+    for degree, n in enumerate(npoints, start=9):
+      with self.subTest(degree=degree):
+        points = tet.getpoints('gauss', degree)
+        self.assertEqual(points.npoints, n)
+        self._check_simplex(points, degree)
+
+  def test_conical(self):
+    for ndims in 1, 2, 3:
+      for degree in range(0, 9, 3):
+        with self.subTest(ndims=ndims, degree=degree):
+          self._check_simplex(points.CoordsWeightsPoints(*points.conical(ndims, degree)), degree)
+
+  def _check_simplex(self, points, degree):
+    self.assertTrue(numpy.greater(points.weights, 0).all())
+    self.assertTrue(numpy.greater(points.coords, 0).all() and numpy.less(points.coords.sum(1), 1).all())
+    for powers in numpy.ndindex(*(degree+1,)*points.ndims):
+      if sum(powers) <= degree:
+        moment = points.weights @ numpy.prod(points.coords**powers, axis=1)
+        exact = numpy.prod([math.factorial(p) for p in powers], dtype=float) / math.factorial(sum(powers)+points.ndims)
+        self.assertAlmostEqual(moment, exact, places=14)
+
 class bezier(TestCase):
 
   def test_line(self):
@@ -63,6 +97,7 @@ class bezier(TestCase):
       self.assertEqual(bezier.npoints, n**2)
       self.assertEqual(len(bezier.tri), 2*(n-1)**2)
       self.assertEqual(len(bezier.hull), 4*(n-1))
+      self.assertAllAlmostEqual(bezier.coords[bezier.grid], numpy.stack(numpy.meshgrid(*[numpy.linspace(0, 1, n)]*2, indexing='ij'), axis=-1))
 
   def test_hexahedron(self):
     hex = element.getsimplex(1)**3
@@ -142,10 +177,10 @@ class trimmed(TestCase):
     super().setUp()
     quad = element.getsimplex(1)**2
     levels = numeric.overlapping(numpy.arange(-1, 16, 2), n=5) # linear ramp cutting at x + y == .125
-    trimmed = quad.trim(levels.ravel(), maxrefine=2, ndivisions=16)
-    self.bezier = trimmed.getpoints('bezier', 5)
-    self.gauss = trimmed.getpoints('gauss', 3)
-    self.uniform = trimmed.getpoints('uniform', 3)
+    self.trimmed = quad.trim(levels.ravel(), maxrefine=2, ndivisions=16)
+    self.bezier = self.trimmed.getpoints('bezier', 5)
+    self.gauss = self.trimmed.getpoints('gauss', 3)
+    self.uniform = self.trimmed.getpoints('uniform', 3)
 
   def test_type(self):
     for pnt in self.bezier, self.gauss, self.uniform:
@@ -169,6 +204,23 @@ class trimmed(TestCase):
     self.assertIn(types.frozenarray([.0625,.0625]), self.bezier.coords)
     self.assertIn(types.frozenarray([.125,0.]), self.bezier.coords)
 
+  def test_compressed(self):
+    for degree in range(1, 7):
+      with self.subTest(degree=degree):
+        compressed = self.trimmed.getpoints('compressed', degree)
+        self.assertIs(self.trimmed.getpoints('compressed', degree), compressed)
+        self.assertLessEqual(compressed.npoints, (degree+1)*(degree+2)//2)
+        self.assertTrue(numpy.greater(compressed.weights, 0).all())
+        gauss = self.trimmed.getpoints('gauss', degree)
+        for i in range(degree+1):
+          for j in range(degree+1-i):
+            moment = lambda pnt: pnt.weights @ (pnt.coords[:,0]**i * pnt.coords[:,1]**j)
+            self.assertAlmostEqual(moment(compressed), moment(gauss), places=14)
+
+  def test_compress_invalid(self):
+    with self.assertRaises(ValueError):
+      points.compress(element.getsimplex(2).getpoints('gauss', 3), 3)
+
   def test_tri(self):
     self.assertEqual(len(self.bezier.tri), 34)
 
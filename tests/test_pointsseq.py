@@ -5,6 +5,8 @@ import unittest, numpy, itertools, operator, functools
 line = nutils.element.LineReference().getpoints('bezier', 2)
 square = line*line
 triangle = nutils.element.TriangleReference().getpoints('bezier', 2)
+nopoints = nutils.points.CoordsPoints(numpy.zeros((0, 2)))
+noweightedpoints = nutils.points.CoordsWeightsPoints(numpy.zeros((0, 2)), numpy.zeros((0,)))
 
 class Common:
 
@@ -20,6 +22,13 @@ class Common:
   def test_iter(self):
     self.assertEqual(tuple(self.seq), tuple(self.check))
 
+  def test_offsets(self):
+    self.assertAllEqual(self.seq.offsets, numpy.cumsum([0]+[p.npoints for p in self.check]))
+
+  def test_coords(self):
+    desired = numpy.concatenate([p.coords for p in self.check]) if self.check else numpy.zeros((0, self.checkndims))
+    self.assertAllEqual(self.seq.coords, desired)
+
   def _op_or_meth(self, op, name):
     for name, func in (op, functools.partial(getattr(operator, op), self.seq)), (name, getattr(self.seq, name)):
       with self.subTest(name):
@@ -177,6 +186,14 @@ class Uniform(TestCase, Common, TriHull):
     self.checkndims = 2
     super().setUp()
 
+class UniformNoPoints(TestCase, Common):
+
+  def setUp(self):
+    self.seq = nutils.pointsseq._Uniform(nopoints, 3)
+    self.check = [nopoints]*3
+    self.checkndims = 2
+    super().setUp()
+
 class Take(TestCase, Common, TriHull):
 
   def setUp(self):
@@ -201,6 +218,14 @@ class Repeat(TestCase, Common, TriHull):
     self.checkndims = 2
     super().setUp()
 
+class RepeatNoPoints(TestCase, Common):
+
+  def setUp(self):
+    self.seq = nutils.pointsseq._Repeat(nutils.pointsseq._Plain((nopoints, noweightedpoints), 2), 2)
+    self.check = [nopoints, noweightedpoints]*2
+    self.checkndims = 2
+    super().setUp()
+
 class Product(TestCase, Common):
 
   def setUp(self):
@@ -1,6 +1,7 @@
 from nutils import *
 import random, itertools, functools
 from nutils.testing import *
+_ = numpy.newaxis
 
 class rectilinear(TestCase):
 
@@ -15,6 +16,17 @@ class rectilinear(TestCase):
     area = self.gauss2.integrate(1)
     self.assertLess(abs(area-2), 1e-15)
 
+  def test_integrate_dense(self):
+    basis = self.domain.basis('std', degree=1)
+    for nprocs in 1, 2:
+      with self.subTest(nprocs=nprocs), parallel.maxprocs(nprocs):
+        area, mass, vec, mat = self.gauss2.integrate([function.asarray(1), basis, self.geom, function.outer(basis)])
+        self.assertEqual(numpy.shape(area), ())
+        self.assertAlmostEqual(area, 2, places=14)
+        self.assertAllAlmostEqual(vec, [2, 1], places=14)
+        self.assertAllAlmostEqual(mass, [.25, .25, .5, .5, .25, .25], places=14)
+        self.assertAllAlmostEqual(mat.export('dense').sum(1), mass, places=14)
+
   def test_integral(self):
     area = self.gauss2.integral(function.asarray(1)).eval()
     self.assertLess(abs(area-2), 1e-15)
@@ -23,6 +35,86 @@ class rectilinear(TestCase):
     x = self.bezier3.eval(self.geom)
     self.assertEqual(x.shape, (self.bezier3.npoints,)+self.geom.shape)
 
+  def test_eval_blocks(self):
+    basis = self.domain.basis('std', degree=1)
+    x, b = self.bezier2.eval([self.geom, basis])
+    self.assertAllAlmostEqual(x, self.bezier2.allcoords + numpy.repeat([[0,0],[1,0]], 4, axis=0))
+    self.assertAllAlmostEqual(b.sum(1), 1)
+    self.assertAllAlmostEqual(b @ numpy.arange(len(basis)), self.bezier2.eval(basis.dot(numpy.arange(len(basis)))))
+
+  def test_eval_customindex(self):
+    custom = sample.Sample.new(self.bezier2.transforms, self.bezier2.points, (self.bezier2.getindex(1), self.bezier2.getindex(0)))
+    self.assertAllAlmostEqual(custom.eval(self.geom), self.bezier2.eval(self.geom)[numpy.argsort(numpy.concatenate(custom.index))])
+
+  def test_customindex_tri_hull_allcoords(self):
+    custom = sample.Sample.new(self.bezier3.transforms, self.bezier3.points, (self.bezier3.getindex(1)[::-1], self.bezier3.getindex(0)))
+    self.assertAllEqual(custom.tri, numpy.concatenate([custom.getindex(ielem).take(points.tri) for ielem, points in enumerate(custom.points)]))
+    self.assertAllEqual(custom.hull, numpy.concatenate([custom.getindex(ielem).take(points.hull) for ielem, points in enumerate(custom.points)]))
+    for ielem, points in enumerate(custom.points):
+      self.assertAllEqual(custom.allcoords[custom.getindex(ielem)], points.coords)
+    self.assertEqual(custom.subset(numpy.arange(18) == 0).nelems, 1)
+    self.assertEqual(custom.subset(numpy.arange(18) == 0).transforms[0][0], custom.transforms[0][1])
+
+  def test_conforming(self):
+    conforming = self.domain.sample('bezier', 3, conforming=True)
+    self.assertEqual(conforming.npoints, 15)
+    self.assertEqual(len(conforming.tri), 16)
+    self.assertEqual(len(conforming.hull), 12)
+    basis = self.domain.basis('discont', degree=1)
+    x, b = conforming.eval([self.geom, basis])
+    flatindex = numpy.concatenate(conforming.index)
+    self.assertAllAlmostEqual(x[flatindex], self.bezier3.eval(self.geom))
+    self.assertAllAlmostEqual(b[flatindex[:9]], self.bezier3.eval(basis)[:9])
+    self.assertAllEqual(conforming.eval(conforming.asfunction(x)), x)
+    self.assertAllEqual(conforming.eval(function.asarray(1.)), numpy.ones(15))
+    self.assertAllEqual(conforming.eval(function.zeros([2])), numpy.zeros([15,2]))
+
+  def test_flatindex(self):
+    index = self.bezier2.getindex(1), self.bezier2.getindex(0)
+    custom = sample.Sample.new(self.bezier2.transforms, self.bezier2.points, index)
+    self.assertIs(sample.Sample.new(self.bezier2.transforms, self.bezier2.points, numpy.concatenate(index)), custom)
+    self.assertAllEqual(custom.getindex(0), index[0])
+    self.assertEqual(len(custom.index), 2)
+    with self.assertRaises(ValueError):
+      sample.Sample.new(self.bezier2.transforms, self.bezier2.points, index[:1])
+    with self.assertRaises(ValueError):
+      sample.Sample.new(self.bezier2.transforms, self.bezier2.points, numpy.arange(7))
+
+  def test_eval_chunks(self):
+    basis = self.domain.basis('std', degree=1)
+    conforming = self.domain.sample('bezier', 3, conforming=True)
+    for smpl in self.bezier3, conforming:
+      x, b = smpl.eval([self.geom, basis])
+      for chunksize in 1, 10, 100:
+        with self.subTest(conforming=smpl is conforming, chunksize=chunksize):
+          chunks = list(smpl.eval_chunks([self.geom, basis, function.asarray(1.)], chunksize=chunksize))
+          self.assertEqual(len(chunks), 1 if chunksize == 100 else 2)
+          index = numpy.concatenate([numpy.arange(smpl.npoints)[index] for index, values in chunks])
+          self.assertAllEqual(numpy.sort(index), numpy.arange(smpl.npoints))
+          self.assertAllAlmostEqual(numpy.concatenate([values[0] for index, values in chunks]), x[index])
+          self.assertAllAlmostEqual(numpy.concatenate([values[1] for index, values in chunks]), b[index])
+          self.assertAllEqual(numpy.concatenate([values[2] for index, values in chunks]), numpy.ones(smpl.npoints))
+    index, values = next(self.bezier3.eval_chunks(self.geom, chunksize=9))
+    self.assertEqual(index, slice(0, 9))
+    self.assertAllAlmostEqual(values, self.bezier3.eval(self.geom)[:9])
+    with self.assertRaises(ValueError):
+      self.bezier3.eval_chunks(self.geom, chunksize=0)
+
+  def test_eval_samples(self):
+    basis = self.domain.basis('std', degree=1)
+    located = self.domain.locate(self.geom, [[.5,.5],[1.5,.5]], tol=1e-12), self.domain.locate(self.geom, [[.25,.75]], tol=1e-12)
+    samples = self.bezier2, self.gauss2, self.domain.sample('bezier', 3, conforming=True), *located
+    for smpl, (x, b, c) in zip(samples, sample.eval_samples(samples, [self.geom, basis, function.asarray(1.)])):
+      self.assertAllAlmostEqual(x, smpl.eval(self.geom))
+      self.assertAllAlmostEqual(b, smpl.eval(basis))
+      self.assertAllEqual(c, numpy.ones(smpl.npoints))
+    x0, x1 = sample.eval_samples(located, self.geom)
+    self.assertAllAlmostEqual(x0, [[.5,.5],[1.5,.5]])
+    self.assertAllAlmostEqual(x1, [[.25,.75]])
+    self.assertEqual(sample.eval_samples([], self.geom), [])
+    with self.assertRaises(ValueError):
+      sample.eval_samples([self.gauss2, self.domain.boundary.sample('gauss', 2)], self.geom)
+
   def test_tri(self):
     self.assertEqual(len(self.bezier2.tri), 4)
     self.assertEqual(len(self.bezier3.tri), 16)
@@ -31,6 +123,13 @@ class rectilinear(TestCase):
     self.assertEqual(len(self.bezier2.hull), 8)
     self.assertEqual(len(self.bezier3.hull), 16)
 
+  def test_grid(self):
+    grid = self.bezier3.grid
+    self.assertEqual(grid.shape, (2,3,3))
+    x = self.bezier3.eval(self.geom)[grid]
+    self.assertAllAlmostEqual(x[...,0], [[[0]*3,[.5]*3,[1]*3], [[1]*3,[1.5]*3,[2]*3]])
+    self.assertAllAlmostEqual(x[...,1], [[[0,.5,1]]*3]*2)
+
   def test_subset(self):
     subset1 = self.bezier2.subset(numpy.eye(8)[0])
     subset2 = self.bezier2.subset(numpy.eye(8)[1])
@@ -89,3 +188,53 @@ class integral(TestCase):
     array = empty.eval().export('dense')
     self.assertEqual(array.shape, shape)
     self.assertAllEqual(array.flat, 0)
+
+@parametrize
+class bilinear(TestCase):
+
+  def setUp(self):
+    super().setUp()
+    domain, geom = mesh.rectilinear([numpy.linspace(0, 1, 3)]*self.ndims)
+    self.geom = geom + .1 * function.sin(2 * geom[::-1])
+    self.domain = domain.refined if self.refined else domain
+    self.basis = self.domain.basis(self.btype, degree=self.degree)
+    self.sample = self.domain.sample('gauss', 2*self.degree)
+    self.mass = 1 + self.geom.sum()
+    self.stiffness = function.eye(self.ndims) + self.geom[:,_] * self.geom[_,:]
+
+  def _check(self, mass, stiffness):
+    integrand = 0
+    if mass is not None:
+      integrand += function.outer(self.basis) * mass
+    if stiffness is not None:
+      dbasis = self.basis.grad(self.geom)
+      integrand += (dbasis[:,_,:,_] * dbasis[_,:,_,:] * (stiffness if stiffness.ndim else stiffness * function.eye(self.ndims))).sum([2,3])
+    self.assertAllAlmostEqual(
+      self.sample.integrate_bilinear(self.basis, self.geom, mass=mass, stiffness=stiffness).export('dense'),
+      self.sample.integrate(integrand * function.J(self.geom)).export('dense'),
+      places=13)
+
+  def test_mass(self):
+    self._check(self.mass, None)
+
+  def test_stiffness(self):
+    self._check(None, self.stiffness)
+
+  def test_scalar_stiffness(self):
+    self._check(None, function.asarray(2.))
+
+  def test_mass_stiffness(self):
+    self._check(self.mass, self.stiffness)
+
+  def test_invalid(self):
+    with self.assertRaises(ValueError):
+      self.sample.integrate_bilinear(self.basis, self.geom)
+    with self.assertRaises(ValueError):
+      self.sample.integrate_bilinear(self.basis, self.geom, mass=self.geom)
+
+for ndims in 1, 2, 3:
+  for degree in 1, 2, 3:
+    bilinear(ndims=ndims, btype='spline', degree=degree, refined=False)
+bilinear(ndims=2, btype='std', degree=2, refined=False)
+bilinear(ndims=2, btype='spline', degree=2, refined=True)
+bilinear(ndims=2, btype='discont', degree=2, refined=False)
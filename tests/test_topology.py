@@ -384,6 +384,12 @@ class locate(TestCase):
     located = sample.eval(self.geom)
     self.assertAllAlmostEqual(located, target)
 
+  def test_multiple(self):
+    target = numpy.random.RandomState(0).uniform(size=(50,2)) * (.2, .7) + (0, .3)
+    sample = self.domain.locate(self.geom, target, eps=1e-15, tol=1e-12)
+    located = sample.eval(self.geom)
+    self.assertAllAlmostEqual(located, target)
+
   def test_invalidargs(self):
     target = numpy.array([(.2,), (.1,), (0,)])
     with self.assertRaises(Exception):
@@ -411,6 +417,262 @@ for etype in 'square', 'triangle', 'mixed':
     locate(etype=etype, mode=mode, tol=1e-12)
 
 
+@parametrize
+class locator(TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.domain, geom = mesh.unitsquare(4, etype=self.etype)
+    self.geom = function.sin(geom * numpy.pi / 2)
+    self.locator = topology.Locator(self.domain, self.geom, eps=1e-15, tol=1e-12)
+
+  def test_moving(self):
+    target = numpy.random.RandomState(0).uniform(size=(20,2))
+    for i in range(4):
+      sample = self.locator.locate(target)
+      self.assertAllAlmostEqual(sample.eval(self.geom), target)
+      target = (target + numpy.random.RandomState(i).uniform(-.1, .1, size=target.shape)).clip(.01, .99)
+
+  def test_resize(self):
+    for n in 5, 3:
+      target = numpy.random.RandomState(n).uniform(size=(n,2))
+      sample = self.locator.locate(target)
+      self.assertAllAlmostEqual(sample.eval(self.geom), target)
+
+  def test_weights(self):
+    target = numpy.random.RandomState(0).uniform(size=(5,2))
+    weights = numpy.arange(1, 6, dtype=float)
+    self.locator.locate(target)
+    sample = self.locator.locate(target, weights=weights)
+    self.assertAlmostEqual(sample.integrate(self.geom[0]), weights.dot(target[:,0]))
+
+  def test_invalidpoint(self):
+    self.locator.locate([(.5,.5)])
+    with self.assertRaises(topology.LocateError):
+      self.locator.locate([(.5,1.1)])
+
+for etype in 'square', 'triangle', 'mixed':
+  locator(etype=etype)
+
+@parametrize
+class connected_edges(TestCase):
+
+  # Compare the boundary and interfaces of the generic topology, which are
+  # formed from the flattened edges, against an element by element baseline.
+
+  def setUp(self):
+    super().setUp()
+    domain, geom = mesh.rectilinear([numpy.linspace(0, 1, 7)]*2)
+    if self.variant == 'trimmed':
+      domain = domain.trim(function.norm2(geom-.5)-.3, maxrefine=2)
+    elif self.variant == 'holes':
+      domain = topology.SubsetTopology(domain, [ref.empty if i in (8, 9, 15, 27) else ref for i, ref in enumerate(domain.references)])
+    elif self.variant == 'trimmedholes':
+      trimmed = domain.trim(function.norm2(geom-.5)-.3, maxrefine=2)
+      domain = topology.SubsetTopology(domain, [ref.empty if i % 5 == 2 else ref for i, ref in enumerate(trimmed.refs)])
+    self.domain = topology.ConnectedTopology(domain.references, domain.transforms, domain.opposites, domain.connectivity)
+
+  def test_connected_edges(self):
+    ielems, ioppelems, ioppedges, iedgerefs, edgerefs = self.domain._connected_edges()
+    offsets = numpy.cumsum([0]+[ref.nedges for ref in self.domain.references])
+    iedge = 0
+    for ielem, (ioppelems_, ref) in enumerate(zip(self.domain.connectivity, self.domain.references)):
+      for edgeref, ioppelem in zip(ref.edge_refs, ioppelems_):
+        self.assertEqual(ielems[iedge], ielem)
+        self.assertEqual(ioppelems[iedge], ioppelem)
+        self.assertEqual(ioppedges[iedge], -1 if ioppelem == -1 else offsets[ioppelem] + list(self.domain.connectivity[ioppelem]).index(ielem))
+        self.assertEqual(edgerefs[iedgerefs[iedge]], edgeref)
+        iedge += 1
+    self.assertEqual(iedge, len(ielems))
+
+  def test_boundary(self):
+    transforms = []
+    references = []
+    edges = self.domain.transforms.edges(self.domain.references)
+    iedge = 0
+    for ielem, (ioppelems, ref) in enumerate(zip(self.domain.connectivity, self.domain.references)):
+      for edgeref, ioppelem in zip(ref.edge_refs, ioppelems):
+        if edgeref:
+          if ioppelem != -1:
+            edgeref = edgeref - self.domain.references[ioppelem].edge_refs[list(self.domain.connectivity[ioppelem]).index(ielem)]
+          if edgeref:
+            transforms.append(edges[iedge])
+            references.append(edgeref)
+        iedge += 1
+    boundary = self.domain.boundary
+    self.assertEqual(list(boundary.transforms), transforms)
+    self.assertEqual(list(boundary.references), references)
+
+  def test_interfaces(self):
+    transforms = []
+    opposites = []
+    references = []
+    edges = self.domain.transforms.edges(self.domain.references)
+    offsets = numpy.cumsum([0]+[ref.nedges for ref in self.domain.references])
+    iedge = 0
+    for ielem, (ioppelems, ref) in enumerate(zip(self.domain.connectivity, self.domain.references)):
+      for edgeref, ioppelem in zip(ref.edge_refs, ioppelems):
+        if edgeref and -1 < ioppelem < ielem:
+          ioppedge = list(self.domain.connectivity[ioppelem]).index(ielem)
+          oppedgeref = self.domain.references[ioppelem].edge_refs[ioppedge]
+          edgeref = oppedgeref and edgeref & oppedgeref
+          if edgeref:
+            transforms.append(edges[iedge])
+            opposites.append(edges[offsets[ioppelem]+ioppedge])
+            references.append(edgeref)
+        iedge += 1
+    interfaces = self.domain.interfaces
+    self.assertEqual(list(interfaces.transforms), transforms)
+    self.assertEqual(list(interfaces.opposites), opposites)
+    self.assertEqual(list(interfaces.references), references)
+
+for variant in 'plain', 'trimmed', 'holes', 'trimmedholes':
+  connected_edges(variant=variant)
+
+@parametrize
+class partition(TestCase):
+
+  def setUp(self):
+    super().setUp()
+    if self.etype == 'hierarchical':
+      domain, self.geom = mesh.rectilinear([numpy.linspace(0, 1, 5)]*2)
+      self.domain = domain.refined_by([0, 5, 6])
+    else:
+      self.domain, self.geom = mesh.unitsquare(4, etype=self.etype)
+    self.parts = self.domain.partition(self.geom, self.nparts)
+
+  def test_cover(self):
+    self.assertEqual(len(self.parts), self.nparts)
+    self.assertEqual(sorted(numpy.concatenate([part.ielems for part in self.parts])), list(range(len(self.domain))))
+    sizes = [len(part.topo) for part in self.parts]
+    self.assertLessEqual(max(sizes) - min(sizes), 1)
+    for part in self.parts:
+      self.assertEqual(list(part.topo.transforms), [self.domain.transforms[ielem] for ielem in part.ielems])
+
+  def test_assemble(self):
+    basis = self.domain.basis('h-std' if self.etype == 'hierarchical' else 'std', degree=1)
+    def assemble(part):
+      dofs, localbasis = part.localize(basis)
+      vec, mat = part.topo.integrate([localbasis * self.geom[0], function.outer(localbasis)], degree=2)
+      return dofs, vec, mat.export('dense')
+    vec = numpy.zeros(len(basis))
+    mat = numpy.zeros((len(basis), len(basis)))
+    with parallel.maxprocs(2):
+      for dofs, localvec, localmat in parallel.map(assemble, self.parts):
+        vec[dofs] += localvec
+        mat[numpy.ix_(dofs, dofs)] += localmat
+    globalvec, globalmat = self.domain.integrate([basis * self.geom[0], function.outer(basis)], degree=2)
+    self.assertAllAlmostEqual(vec, globalvec, places=14)
+    self.assertAllAlmostEqual(mat, globalmat.export('dense'), places=14)
+
+  def test_invalid(self):
+    for nparts in 0, len(self.domain)+1:
+      with self.subTest(nparts), self.assertRaises(ValueError):
+        self.domain.partition(self.geom, nparts)
+
+for etype in 'square', 'triangle', 'mixed', 'hierarchical':
+  for nparts in 1, 3:
+    partition(etype=etype, nparts=nparts)
+
+@parametrize
+class reordered(TestCase):
+
+  def setUp(self):
+    super().setUp()
+    if self.etype == 'hierarchical':
+      domain, self.geom = mesh.rectilinear([numpy.linspace(0, 1, 9)]*2)
+      self.domain = domain.refined_by([0, 9, 10])
+    else:
+      self.domain, self.geom = mesh.unitsquare(8, etype=self.etype)
+    self.reordered = self.domain.reordered(self.geom)
+
+  def test_elements(self):
+    self.assertEqual(len(self.reordered), len(self.domain))
+    self.assertEqual(set(self.reordered.transforms), set(self.domain.transforms))
+    self.assertAlmostEqual(self.reordered.integrate(function.J(self.geom), degree=1), self.domain.integrate(function.J(self.geom), degree=1), places=14)
+
+  def test_independent_of_order(self):
+    shuffled = self.domain[numpy.random.RandomState(0).permutation(len(self.domain))]
+    self.assertEqual(list(shuffled.reordered(self.geom).transforms), list(self.reordered.transforms))
+
+  def test_locality(self):
+    pathlength = lambda topo: numpy.linalg.norm(numpy.diff(topo.elem_mean(self.geom, degree=1), axis=0), axis=1).sum()
+    shuffled = self.domain[numpy.random.RandomState(0).permutation(len(self.domain))]
+    self.assertLess(pathlength(self.reordered), pathlength(shuffled) / 2)
+
+  @parametrize.enable_if(lambda etype, **params: etype == 'square')
+  def test_embedded(self):
+    domain, geom = mesh.rectilinear([numpy.linspace(0, 1, 9)]*3)
+    boundary = domain.boundary
+    shuffled = boundary[numpy.random.RandomState(0).permutation(len(boundary))]
+    self.assertEqual(list(shuffled.reordered(geom).transforms), list(boundary.reordered(geom).transforms))
+
+  def test_empty(self):
+    empty = self.domain.trim(-self.geom[0]-10, maxrefine=0)
+    self.assertEqual(len(empty), 0)
+    self.assertIs(empty.reordered(self.geom), empty)
+
+for etype in 'square', 'triangle', 'mixed', 'hierarchical':
+  reordered(etype=etype)
+
+@parametrize
+class conforming(TestCase):
+
+  def setUp(self):
+    super().setUp()
+    if self.etype == 'hierarchical':
+      domain, self.geom = mesh.rectilinear([numpy.linspace(0, 1, 3)]*2)
+      self.domain = domain.refined_by([0])
+    elif self.etype == 'cube':
+      self.domain, self.geom = mesh.rectilinear([numpy.linspace(0, 1, 3)]*3)
+    else:
+      self.domain, self.geom = mesh.unitsquare(2, etype=self.etype)
+    self.bezier = self.domain.sample('bezier', 3)
+    self.conforming = self.domain.sample('bezier', 3, conforming=True)
+    self.x = self.conforming.eval(self.geom)
+
+  def test_unique(self):
+    self.assertEqual(len(numpy.unique(self.x.round(10), axis=0)), self.conforming.npoints)
+    self.assertLess(self.conforming.npoints, self.bezier.npoints)
+
+  def test_index(self):
+    self.assertAllAlmostEqual(self.x[numpy.concatenate(self.conforming.index)], self.bezier.eval(self.geom))
+
+  def test_tri(self):
+    self.assertAllEqual(numpy.unique(self.conforming.tri), numpy.arange(self.conforming.npoints))
+
+  def test_hull(self):
+    onboundary = numpy.equal(self.x, 0) | numpy.equal(self.x, 1)
+    self.assertEqual(onboundary[self.conforming.hull].any(axis=2).all(), self.etype != 'hierarchical')
+
+  def test_invalid(self):
+    with self.assertRaises(ValueError):
+      self.domain.sample('gauss', 3, conforming=True)
+
+  @parametrize.enable_if(lambda etype, **params: etype in ('square', 'cube'))
+  def test_structured(self):
+    for domain in self.domain, self.domain.boundary['left'], mesh.rectilinear([3,2], periodic=[0])[0]:
+      with self.subTest(domain=domain):
+        points = domain.sample('bezier', 3).points
+        self.assertAllEqual(domain._conforming_index(points, 3), topology.Topology._conforming_index(domain, points, 3))
+
+  @parametrize.enable_if(lambda etype, **params: etype in ('square', 'hierarchical'))
+  def test_periodic(self):
+    domain, geom = mesh.rectilinear([3,4], periodic=[0])
+    if self.etype == 'hierarchical':
+      domain = domain.refined_by([0])
+    bezier = domain.sample('bezier', 3)
+    conforming = domain.sample('bezier', 3, conforming=True)
+    x = conforming.eval(geom)
+    self.assertAllAlmostEqual(x[numpy.concatenate(conforming.index)], bezier.eval(geom))
+    self.assertLess(conforming.npoints, bezier.npoints)
+    a, b, c = x[conforming.tri].swapaxes(0, 1)
+    self.assertAlmostEqual(abs(numpy.cross(b-a, c-a)).sum() / 2, 12)
+
+for etype in 'square', 'triangle', 'mixed', 'hierarchical', 'cube':
+  conforming(etype=etype)
+
+
 @parametrize
 class hierarchical(TestCase, TopologyAssertions):
 
@@ -81,6 +81,27 @@ class Common:
       with self.assertRaises(ValueError):
         self.seq.index_with_tail(trans)
 
+  def test_index_with_tail_many(self):
+    transforms = list(self.checkmissing)
+    for trans, ref in zip(self.check, self.checkrefs):
+      transforms.append(trans)
+      transforms.extend(trans+(ctrans,) for ctrans in ref.child_transforms)
+      if self.checkfromdims > 0:
+        transforms.extend(nutils.transform.canonical(trans+(etrans,)) for etrans in ref.edge_transforms)
+    indices, tails = self.seq.index_with_tail_many(transforms)
+    self.assertEqual(len(indices), len(transforms))
+    self.assertEqual(len(tails), len(transforms))
+    for trans, index, tail in zip(transforms, indices, tails):
+      if self.seq.contains_with_tail(trans):
+        self.assertEqual((index, tail), self.seq.index_with_tail(trans))
+      else:
+        self.assertEqual((index, tail), (-1, None))
+
+  def test_index_with_tail_many_empty(self):
+    indices, tails = self.seq.index_with_tail_many([])
+    self.assertEqual(indices.shape, (0,))
+    self.assertEqual(tails, [])
+
   def test_index(self):
     for i, trans in enumerate(self.check):
       self.assertEqual(self.seq.index(trans), i)
@@ -94,6 +115,15 @@ class Common:
         with self.assertRaises(ValueError):
           self.seq.index(trans+(ctrans,))
 
+  def test_index_roundtrip(self):
+    transforms = list(self.seq)
+    self.assertEqual(transforms, list(self.check))
+    self.assertEqual([self.seq.index(trans) for trans in transforms], list(range(len(transforms))))
+    indices, tails = self.seq.index_with_tail_many(transforms + list(self.checkmissing))
+    self.assertEqual(indices.tolist(), list(range(len(transforms))) + [-1]*len(self.checkmissing))
+    self.assertEqual(tails, [()]*len(transforms) + [None]*len(self.checkmissing))
+    self.assertEqual([self.seq.contains(trans) for trans in transforms + list(self.checkmissing)], [True]*len(transforms) + [False]*len(self.checkmissing))
+
   def test_contains_with_tail(self):
     for i, (trans, ref) in enumerate(zip(self.check, self.checkrefs)):
       self.assertEqual(self.seq.index_with_tail(trans), (i, ()))
@@ -160,6 +190,7 @@ s12 = nutils.transform.Shift([1.,2.])
 s13 = nutils.transform.Shift([1.,3.])
 
 c00,c01,c10,c11 = square.child_transforms
+te0,te1,te2,te3 = square.edge_transforms
 
 class EmptyTransforms(TestCase, Common, Edges):
   def setUp(self):
@@ -188,6 +219,15 @@ class PlainTransforms2D(TestCase, Common, Edges):
     self.checkrefs = References.from_iter((square,square,triangle,triangle), 2)
     self.checkfromdims = 2
 
+class PlainTransformsRefined(TestCase, Common, Edges):
+  def setUp(self):
+    super().setUp()
+    self.seq = nutils.transformseq.PlainTransforms([(x2,s00,c00),(x2,s00,c11),(x2,s01),(x2,s10,c01)], fromdims=2)
+    self.check = (x2,s00,c00),(x2,s00,c11),(x2,s01),(x2,s10,c01)
+    self.checkmissing = (x2,s00),(x2,s00,c01),(x2,s00,c10),(x2,s02),(x2,s10),(x2,s10,c00),(x2,s10,c11),(l2,s00,c00),(r2,s01)
+    self.checkrefs = References.uniform(square, 4)
+    self.checkfromdims = 2
+
 class MaskedTransforms(TestCase, Common, Edges):
   def setUp(self):
     super().setUp()
@@ -197,6 +237,15 @@ class MaskedTransforms(TestCase, Common, Edges):
     self.checkrefs = References.from_iter((square,triangle), 2)
     self.checkfromdims = 2
 
+class MaskedTransformsEmpty(TestCase, Common, Edges):
+  def setUp(self):
+    super().setUp()
+    self.seq = nutils.transformseq.MaskedTransforms(nutils.transformseq.PlainTransforms([(x2,s00),(x2,s01),(x2,s10),(x2,s11)], fromdims=2), numpy.array([], dtype=int))
+    self.check = ()
+    self.checkmissing = (l2,s00),(x2,s00),(x2,s01),(x2,s11),(r2,s00)
+    self.checkrefs = References.empty(2)
+    self.checkfromdims = 2
+
 class ReorderedTransforms(TestCase, Common, Edges):
   def setUp(self):
     super().setUp()
@@ -206,6 +255,15 @@ class ReorderedTransforms(TestCase, Common, Edges):
     self.checkrefs = References.uniform(square, 4)
     self.checkfromdims = 2
 
+class ReorderedTransformsEmpty(TestCase, Common, Edges):
+  def setUp(self):
+    super().setUp()
+    self.seq = nutils.transformseq.ReorderedTransforms(nutils.transformseq.PlainTransforms([], fromdims=2), numpy.array([], dtype=int))
+    self.check = ()
+    self.checkmissing = (l2,s00),(x2,s00),(r2,s00)
+    self.checkrefs = References.empty(2)
+    self.checkfromdims = 2
+
 class DerivedTransforms(TestCase, Common, Edges):
   def setUp(self):
     super().setUp()
@@ -305,6 +363,24 @@ class StructuredTransforms1DPeriodicInterfacesRight(TestCase, Common):
     self.checkrefs = References.uniform(point, 3)
     self.checkfromdims = 0
 
+class StructuredTransforms1DPeriodicInterfacesRefined(TestCase, Common):
+  def setUp(self):
+    super().setUp()
+    self.seq = nutils.transformseq.StructuredTransforms(x1, [nutils.transformseq.PIntAxis(0,4,0,False)], 1)
+    self.check = (x1,s0,c1,e1),(x1,s1,c0,e1),(x1,s1,c1,e1),(x1,s0,c0,e1)
+    self.checkmissing = (x1,s0,c0,e0),(x1,s0,c1,e0),(x1,s1,c1,e0),(x1,s2,c0,e1),(x1,s0,e1),(l1,s0,c1,e1)
+    self.checkrefs = References.uniform(point, 4)
+    self.checkfromdims = 0
+
+class StructuredTransforms2DPeriodicInterfaces(TestCase, Common):
+  def setUp(self):
+    super().setUp()
+    self.seq = nutils.transformseq.StructuredTransforms(x2, [nutils.transformseq.PIntAxis(0,2,0,True),nutils.transformseq.DimAxis(0,2,True)], 0)
+    self.check = (x2,s00,te0),(x2,s01,te0),(x2,s10,te0),(x2,s11,te0)
+    self.checkmissing = (x2,s00,te1),(x2,s01,te2),(x2,s02,te0),(x2,s12,te0),(l2,s00,te0)
+    self.checkrefs = References.uniform(line, 4)
+    self.checkfromdims = 1
+
 class StructuredTransforms2D(TestCase, Common, Edges):
   def setUp(self):
     super().setUp()